@@ -4,13 +4,16 @@ from functools import lru_cache
 
 DEFAULT_CONFIG_PATH = os.environ.get("GCLICK_CONFIG_FILE", "config/config.yaml")
 
+# Loader da libyaml (C) quando disponível; mesma semântica do safe_load
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 @lru_cache(maxsize=1)
 def load_config(path: str = None) -> dict:
     path = path or DEFAULT_CONFIG_PATH
     if not os.path.exists(path):
         raise FileNotFoundError(f"Config não encontrada em {path}")
     with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
+        data = yaml.load(f, Loader=_YAML_LOADER) or {}
     # Overrides simples via env (exemplo)
     categoria_env = os.getenv("GCLICK_CATEGORIA")
     if categoria_env:
@@ -1,4 +1,5 @@
 from datetime import date, timedelta, datetime
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 import logging
 
@@ -25,6 +26,25 @@ def obter_data_atual_brt() -> date:
         return date.today()
 
 
+@lru_cache(maxsize=4096)
+def _parse_data_venc(dv: str) -> Optional[date]:
+    """
+    Converte dataVencimento (YYYY-MM-DD) em date, uma vez por string distinta.
+
+    Muitas tarefas compartilham o mesmo vencimento, então o cache evita
+    repetir o parse. fromisoformat (C) cobre o formato canônico; strptime
+    fica como fallback para dia/mês sem zero à esquerda.
+    """
+    try:
+        return date.fromisoformat(dv)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(dv, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
 def separar_tarefas_overdue(tarefas: List[Dict[str, Any]], hoje: Optional[date] = None) -> Dict[str, List[Dict[str, Any]]]:
     """
     Separa tarefas entre normais (para notificação) e overdue (para relatório).
@@ -50,9 +70,8 @@ def separar_tarefas_overdue(tarefas: List[Dict[str, Any]], hoje: Optional[date]
             # Tenta parsear da string
             dv = tarefa.get("dataVencimento")
             if dv:
-                try:
-                    dt = datetime.strptime(dv, "%Y-%m-%d").date()
-                except Exception:
+                dt = _parse_data_venc(dv) if isinstance(dv, str) else None
+                if dt is None:
                     # Se não conseguir parsear, considera normal (será ignorada na classificação)
                     normais.append(tarefa)
                     continue
@@ -97,30 +116,29 @@ def classificar_tarefa_individual(tarefa: Dict[str, Any], hoje: date, dias_proxi
         # Tenta parsear da string
         dv = tarefa.get("dataVencimento")
         if dv:
-            try:
-                from datetime import datetime
-                dt = datetime.strptime(dv, "%Y-%m-%d").date()
-            except Exception:
-                return None
+            dt = _parse_data_venc(dv) if isinstance(dv, str) else None
     
     if not dt:
         return None
     
+    # Uma única subtração de datas; o restante são comparações de inteiros
+    delta = (dt - hoje).days
+    
     # Regra de classificação refinada para Sprint 2:
     # - Tarefas com mais de 1 dia de atraso são ignoradas
     # - Tarefas vencidas até 1 dia atrás são incluídas em "vencidas"
     # - Tarefas que vencem hoje são "vence_hoje"
     # - Tarefas que vencem nos próximos X dias são "vence_em_3_dias"
     
-    if dt < hoje - timedelta(days=1):
+    if delta < -1:
         # Mais de 1 dia de atraso - não incluir
         return None
-    elif dt < hoje:
+    elif delta < 0:
         # Até 1 dia de atraso
         return "vencidas"
-    elif dt == hoje:
+    elif delta == 0:
         return "vence_hoje"
-    elif dt <= hoje + timedelta(days=dias_proximos):
+    elif delta <= dias_proximos:
         return "vence_em_3_dias"
         
     return None
@@ -147,16 +165,26 @@ def classificar_por_vencimento(tarefas, hoje: Optional[date] = None, dias_proxim
     vence_hoje = []
     vence_em_3 = []
 
+    # Mesma regra de classificar_tarefa_individual, pré-calculada como tabela
+    # ordinal -> append: ontem, hoje e os próximos dias_proximos dias. Ordinais
+    # fora da tabela (mais de 1 dia de atraso ou além da janela) são ignorados.
+    h_ord = hoje.toordinal()
+    destino = {h_ord - 1: vencidas.append, h_ord: vence_hoje.append}
+    destino.update(dict.fromkeys(range(h_ord + 1, h_ord + dias_proximos + 1), vence_em_3.append))
+    destino_get = destino.get
+    # O custo do laço está em extrair/parsear a data de cada dict; vetorizar só
+    # o balde (NumPy) não compensa a conversão e foi medido mais lento.
     for t in tarefas:
-        classificacao = classificar_tarefa_individual(t, hoje, dias_proximos)
-        
-        if classificacao == "vencidas":
-            vencidas.append(t)
-        elif classificacao == "vence_hoje":
-            vence_hoje.append(t)
-        elif classificacao == "vence_em_3_dias":
-            vence_em_3.append(t)
-        # Se classificacao for None, a tarefa é ignorada
+        dt = t.get("_dt_dataVencimento")
+        if not dt:
+            dv = t.get("dataVencimento")
+            dt = _parse_data_venc(dv) if dv and isinstance(dv, str) else None
+            if dt is None:
+                continue
+
+        adicionar = destino_get(dt.toordinal())
+        if adicionar is not None:
+            adicionar(t)
 
     return {
         "vencidas": vencidas,
@@ -1,18 +1,20 @@
 import os
+import copy
+import sys
 import time
 import json
+import threading
 import logging
+import weakref
 from datetime import date, timedelta
-from collections import defaultdict
-from typing import Dict, List, Any, Tuple, Optional
-
-import yaml
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Callable, Deque, Dict, Iterator, List, Any, Tuple, Optional
 
 # Imports relativos para módulos locais
-from ..gclick.tarefas import listar_tarefas_page, normalizar_tarefa
-from ..gclick.tarefas_detalhes import obter_tarefa_detalhes, resumir_detalhes_para_card # type: ignore
-from ..gclick.responsaveis import listar_responsaveis_tarefa
-from ..teams.webhook import enviar_teams_mensagem
+# gclick.*, teams.webhook e yaml são importados nas funções que os usam: o
+# custo (requests/urllib3/libyaml) só é pago por quem roda o ciclo ou lê config
 from ..storage.state import purge_older_than
 # NOVA API: Idempotência granular
 from ..storage.state import (
@@ -79,6 +81,8 @@ def _cached_listar_tarefas_page(categoria: str, page: int, size: int,
                                 dataVencimentoInicio: str = None,
                                 dataVencimentoFim: str = None):
     """Wrapper com cache para listar_tarefas_page."""
+    from ..gclick.tarefas import listar_tarefas_page
+
     if not HAS_RESILIENCE or not notification_cache:
         return listar_tarefas_page(categoria, page, size, dataVencimentoInicio, dataVencimentoFim)
 
@@ -94,25 +98,36 @@ def _cached_listar_tarefas_page(categoria: str, page: int, size: int,
     return result
 
 
-def _cached_obter_detalhes(task_id: str, *, ttl: int = 600) -> Dict[str, Any]:
-    """Busca detalhes da tarefa com cache (10 min por padrão) e retorna resumo para card."""
-    if not HAS_RESILIENCE or not notification_cache:
-        raw = obter_tarefa_detalhes(task_id)
-        return resumir_detalhes_para_card(raw)
-
-    cache_key = f"detalhes:{task_id}"
-    cached = notification_cache.get(cache_key)
-    if cached is not None:
-        logger.debug("🎯 Cache HIT detalhes %s", task_id)
-        return cached
+def _prefetch_detalhes(task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Resumos de detalhes para os cards de um responsável: cache primeiro, os
+    faltantes em uma única consulta paralela (obter_tarefas_detalhes_batch).
+    Falhas voltam como {} (sem cache), como no laço de envio.
+    """
+    from ..gclick.tarefas_detalhes import obter_tarefas_detalhes_batch, resumir_detalhes_para_card
+
+    usar_cache = HAS_RESILIENCE and notification_cache is not None
+    resumos: Dict[str, Dict[str, Any]] = {}
+    faltantes: List[str] = []
+    for task_id in task_ids:
+        cached = notification_cache.get(f"detalhes:{task_id}") if usar_cache else None
+        if cached is not None:
+            resumos[task_id] = cached
+        else:
+            faltantes.append(task_id)
 
-    raw = obter_tarefa_detalhes(task_id)
-    resumo = resumir_detalhes_para_card(raw)
-    try:
-        notification_cache.set(cache_key, resumo, ttl=ttl)
-    except Exception:
-        logger.debug("Falha ao setar cache detalhes %s", task_id, exc_info=True)
-    return resumo
+    for task_id, raw in obter_tarefas_detalhes_batch(faltantes).items():
+        if not raw:
+            resumos[task_id] = {}
+            continue
+        resumo = resumir_detalhes_para_card(raw)
+        resumos[task_id] = resumo
+        if usar_cache:
+            try:
+                notification_cache.set(f"detalhes:{task_id}", resumo, ttl=600)
+            except Exception:
+                logger.debug("Falha ao setar cache detalhes %s", task_id, exc_info=True)
+    return resumos
 
 
 @resilient(service="teams_bot", check_rate_limit=False)
@@ -147,23 +162,42 @@ def _run_coro_safely(coro):
         return asyncio.run(coro)
 
 
-def _has_conversation(storage, user_id: str) -> bool:
-    """Verifica, de forma tolerante, se há reference salva para o usuário."""
-    if storage is None or not user_id:
-        return False
+def _chaves_do_bucket(bkt_filtrado: Dict[str, List[Tuple[Dict[str, Any], str]]]) -> Tuple[str, ...]:
+    """Achata as chaves de idempotência de todas as tarefas do bucket de um responsável."""
+    return tuple(chave for lista in bkt_filtrado.values() for _tarefa, chave in lista)
+
+
+# Acessor que respondeu na primeira consulta, por instância de storage: as
+# consultas seguintes chamam direto, sem repetir a sondagem por hasattr.
+# Os acessores recebem o storage como argumento para não prendê-lo no cache.
+_ACESSORES_CONVERSA: "weakref.WeakKeyDictionary[Any, Callable[[Any, str], bool]]" = weakref.WeakKeyDictionary()
+
 
+def _acessor_metodo(nome: str, com_default: bool) -> Callable[[Any, str], bool]:
+    if com_default:
+        return lambda storage, user_id: bool(getattr(storage, nome)(user_id, None))
+    return lambda storage, user_id: bool(getattr(storage, nome)(user_id))
+
+
+def _acessor_dict(nome: str) -> Callable[[Any, str], bool]:
+    def _contem(storage, user_id: str) -> bool:
+        raw = getattr(storage, nome)
+        if not isinstance(raw, dict):
+            raise TypeError(f"{nome} deixou de ser dict")
+        return user_id in raw
+    return _contem
+
+
+def _sondar_conversa(storage, user_id: str) -> Tuple[bool, Optional[Callable[[Any, str], bool]]]:
+    """Sondagem tolerante original; devolve também o acessor que produziu a resposta."""
     for method in ("get", "has", "exists", "contains"):
         if hasattr(storage, method):
             fn = getattr(storage, method)
             try:
-                res = fn(user_id)
-                if isinstance(res, bool):
-                    return res
-                return bool(res)
+                return bool(fn(user_id)), _acessor_metodo(method, False)
             except TypeError:
                 try:
-                    res = fn(user_id, None)  # type: ignore
-                    return bool(res)
+                    return bool(fn(user_id, None)), _acessor_metodo(method, True)  # type: ignore
                 except Exception:
                     pass
             except Exception:
@@ -173,8 +207,33 @@ def _has_conversation(storage, user_id: str) -> bool:
         if hasattr(storage, attr):
             raw = getattr(storage, attr)
             if isinstance(raw, dict):
-                return user_id in raw
-    return False
+                return user_id in raw, _acessor_dict(attr)
+    return False, None
+
+
+def _has_conversation(storage, user_id: str) -> bool:
+    """Verifica, de forma tolerante, se há reference salva para o usuário."""
+    if storage is None or not user_id:
+        return False
+
+    try:
+        acessor = _ACESSORES_CONVERSA.get(storage)
+    except TypeError:  # storage sem suporte a weakref/hash: sempre sonda
+        acessor = None
+    if acessor is not None:
+        try:
+            return acessor(storage, user_id)
+        except Exception:
+            # O acessor resolvido falhou agora: refaz a sondagem completa
+            pass
+
+    resultado, acessor = _sondar_conversa(storage, user_id)
+    if acessor is not None:
+        try:
+            _ACESSORES_CONVERSA[storage] = acessor
+        except TypeError:
+            pass
+    return resultado
 
 
 # Métricas (fallbacks)
@@ -194,7 +253,7 @@ try:
     from ..teams.user_mapping import mapear_apelido_para_teams_id, is_test_mode, get_test_user_id
     logging.info("[ENGINE] Mapeador de usuário do Teams disponível")
 except ImportError as e:
-    logging.warning(f"[BOT] Falha ao importar user_mapping: {e}")
+    logging.warning("[BOT] Falha ao importar user_mapping: %s", e)
     def mapear_apelido_para_teams_id(apelido: str):
         return None
     def is_test_mode() -> bool:
@@ -203,7 +262,7 @@ except ImportError as e:
         return ""
 
 
-STATUS_ABERTOS = {"A", "P", "Q", "S"}
+STATUS_ABERTOS = frozenset(map(sys.intern, ("A", "P", "Q", "S")))
 ALERT_ZERO_ABERTOS_TO_TEAMS = os.getenv("ALERT_ZERO_ABERTOS_TO_TEAMS", "false").lower() in ("1", "true", "yes")
 
 STATUS_LABEL_LOCAL = {
@@ -220,6 +279,70 @@ STATUS_LABEL_LOCAL = {
 
 # ====================== Config ======================
 
+# Cópia JSON do YAML ao lado do arquivo (<path>.json): em cold starts o parse
+# JSON (C) substitui o YAML enquanto o sidecar registrar o mesmo mtime/tamanho
+YAML_JSON_CACHE = os.getenv("GCLICK_DISABLE_YAML_CACHE", "false").lower() not in ("true", "1", "yes")
+
+
+def _ler_sidecar_json(cache_path: str, mtime_ns: int, tamanho: int) -> Optional[dict]:
+    try:
+        with open(cache_path, "rb") as f:
+            envelope = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Válido só para a mesma versão exata do YAML: mtime "mais novo" não basta,
+    # pois cp -p / rsync -t / zip restauram o YAML com mtime antigo
+    if (
+        not isinstance(envelope, dict)
+        or envelope.get("mtime_ns") != mtime_ns
+        or envelope.get("size") != tamanho
+        or not isinstance(envelope.get("config"), dict)
+    ):
+        return None
+    return envelope["config"]
+
+
+def _gravar_sidecar_json(cache_path: str, data: dict, mtime_ns: int, tamanho: int) -> None:
+    try:
+        # Só grava se o JSON representa o YAML sem perdas (datas, chaves não-str...)
+        if json.loads(json.dumps(data, ensure_ascii=False)) != data:
+            return
+        serializado = json.dumps({"mtime_ns": mtime_ns, "size": tamanho, "config": data}, ensure_ascii=False)
+        tmp = cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(serializado)
+        os.replace(tmp, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        # Diretório somente leitura (ex.: run-from-package) não é erro
+        logger.debug("Sidecar JSON da config não gravado (%s): %s", cache_path, e)
+
+
+@lru_cache(maxsize=16)
+def _ler_yaml_config_cache(path: str, mtime_ns: int, tamanho: int) -> dict:
+    """YAML parseado uma vez por versão do arquivo (mtime/tamanho na chave). Uso interno: ver _ler_yaml_config."""
+    cache_path = path + ".json"
+    if YAML_JSON_CACHE:
+        data = _ler_sidecar_json(cache_path, mtime_ns, tamanho)
+        if data is not None:
+            logger.info("✅ Config YAML carregada de %s (cache %s)", path, cache_path)
+            return data
+    import yaml
+
+    # Loader da libyaml (C) quando o PyYAML foi compilado com ela; mesma semântica do safe_load
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=loader) or {}
+    logger.info("✅ Config YAML carregada de %s", path)
+    if YAML_JSON_CACHE and isinstance(data, dict):
+        _gravar_sidecar_json(cache_path, data, mtime_ns, tamanho)
+    return data
+
+
+def _ler_yaml_config(path: str, mtime_ns: int, tamanho: int) -> dict:
+    """Cópia da config em cache: quem a altera (listas/dicts aninhados) não contamina os próximos ciclos."""
+    return copy.deepcopy(_ler_yaml_config_cache(path, mtime_ns, tamanho))
+
+
 def load_notifications_config(path="config/notifications.yaml") -> dict:
     default_config = {
         "dias_proximos": 3,
@@ -235,9 +358,9 @@ def load_notifications_config(path="config/notifications.yaml") -> dict:
     yaml_config = {}
     if os.path.exists(path):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                yaml_config = yaml.safe_load(f) or {}
-            logger.info("✅ Config YAML carregada de %s", path)
+            # Ciclos seguintes reaproveitam o parse enquanto o arquivo não mudar
+            st = os.stat(path)
+            yaml_config = _ler_yaml_config(path, st.st_mtime_ns, st.st_size)
         except Exception as e:
             logger.warning("⚠️ Erro ao carregar YAML %s: %s", path, e)
 
@@ -284,76 +407,136 @@ def load_notifications_config(path="config/notifications.yaml") -> dict:
 
 # ================= Classificação Temporal ================
 
+try:
+    from .classification import classificar_tarefa_individual as _classificar_tarefa_individual
+except ImportError:
+    logger.warning("classification.py não disponível, usando lógica interna")
+    _classificar_tarefa_individual = None
+
+
 def classificar(tarefa: Dict[str, Any], hoje: date, dias_proximos: int) -> Optional[str]:
+    if _classificar_tarefa_individual is not None:
+        # classification.py só classifica até 3 dias à frente (janela vence_em_3_dias)
+        return _classificar_tarefa_individual(tarefa, hoje, min(3, dias_proximos))
+
+    dt_txt = tarefa.get("dataVencimento")
+    if not dt_txt:
+        return None
     try:
-        from .classification import classificar_tarefa_individual
-        resultado = classificar_tarefa_individual(tarefa, hoje)
-        if resultado is None:
-            return None
-        if resultado == "vencidas":
-            return "vencidas"
-        if resultado == "vence_hoje":
-            return "vence_hoje"
-        if resultado == "vence_em_3_dias":
-            dt_txt = tarefa.get("dataVencimento")
-            if dt_txt:
-                try:
-                    dt_venc = date.fromisoformat(dt_txt)
-                    if dt_venc <= hoje + timedelta(days=dias_proximos):
-                        return "vence_em_3_dias"
-                except Exception:
-                    pass
-            return None
-        return resultado
-    except ImportError:
-        logger.warning("classification.py não disponível, usando lógica interna")
-        dt_txt = tarefa.get("dataVencimento")
-        if not dt_txt:
-            return None
-        try:
-            dt_venc = date.fromisoformat(dt_txt)
-        except Exception:
-            return None
-        if dt_venc < hoje - timedelta(days=1):
-            return None
-        if dt_venc < hoje:
-            return "vencidas"
-        if dt_venc == hoje:
-            return "vence_hoje"
-        if dt_venc <= hoje + timedelta(days=dias_proximos):
-            return "vence_em_3_dias"
+        dt_venc = date.fromisoformat(dt_txt)
+    except Exception:
+        return None
+    delta = (dt_venc - hoje).days
+    if delta < -1:
         return None
+    if delta < 0:
+        return "vencidas"
+    if delta == 0:
+        return "vence_hoje"
+    if delta <= dias_proximos:
+        return "vence_em_3_dias"
+    return None
 
 
 # ================= Agrupamento por Responsável ================
 
+PREFETCH_RESPONSAVEIS_CONCORRENCIA = 16
+
+
+class _TokenBucket:
+    """
+    Token bucket bloqueante e thread-safe, compartilhado pelas threads do prefetch.
+
+    Limita a taxa de início das requisições no conjunto (não por thread):
+    cada chamada reserva um token e dorme fora do lock até ele estar disponível.
+    """
+
+    def __init__(self, taxa_por_s: float, capacidade: int):
+        self._taxa = taxa_por_s
+        self._capacidade = float(capacidade)
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self) -> None:
+        with self._lock:
+            agora = time.monotonic()
+            self._tokens = min(self._capacidade, self._tokens + (agora - self._ultimo) * self._taxa)
+            self._ultimo = agora
+            self._tokens -= 1.0
+            espera = -self._tokens / self._taxa if self._tokens < 0 else 0.0
+        if espera > 0:
+            time.sleep(espera)
+
+
+def prefetch_responsaveis(
+    tarefa_ids: List[str],
+    max_concurrent: int = PREFETCH_RESPONSAVEIS_CONCORRENCIA,
+    sleep_ms: int = 0,
+    verbose: bool = False
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Busca os responsáveis de todas as tarefas de uma vez, com concorrência limitada.
+
+    Separa o I/O (consultas à API) do processamento: o agrupamento posterior
+    trabalha apenas sobre o mapa retornado. Tarefas cuja consulta falhou
+    ficam fora do mapa.
+    """
+    ids_unicos = list(dict.fromkeys(str(t_id) for t_id in tarefa_ids))
+    if not ids_unicos:
+        return {}
+
+    resultado: Dict[str, List[Dict[str, Any]]] = {}
+    workers = max(1, min(max_concurrent, len(ids_unicos)))
+
+    # sleep_ms vira uma taxa global (1 requisição a cada sleep_ms, rajada inicial
+    # de até `workers`) em vez de uma pausa por thread, que multiplicava a taxa
+    limitador = _TokenBucket(1000.0 / sleep_ms, workers) if sleep_ms > 0 else None
+
+    from ..gclick.responsaveis import listar_responsaveis_tarefa
+
+    def _buscar(t_id: str) -> List[Dict[str, Any]]:
+        if limitador is not None:
+            limitador.aguardar()
+        return listar_responsaveis_tarefa(t_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_buscar, t_id): t_id for t_id in ids_unicos}
+        for future in as_completed(futures):
+            t_id = futures[future]
+            try:
+                resp_list = future.result()
+            except Exception as e:
+                if verbose:
+                    print(f"[WARN] Falha ao buscar responsáveis tarefa={t_id}: {e}")
+                continue
+            if verbose:
+                print(f"[RESP] tarefa={t_id} -> {len(resp_list)} responsável(is).")
+            if isinstance(resp_list, list):
+                resultado[t_id] = resp_list
+    return resultado
+
+
 def agrupar_por_responsavel(
     tarefas_relevantes: List[Dict[str, Any]],
     max_responsaveis_lookup: int = 100,
     sleep_ms: int = 0,
-    verbose: bool = False
+    verbose: bool = False,
+    responsaveis_por_tarefa: Optional[Dict[str, List[Dict[str, Any]]]] = None
 ) -> Dict[str, List[Dict[str, Any]]]:
+    tarefas_consultadas = tarefas_relevantes[:max_responsaveis_lookup]
+    if responsaveis_por_tarefa is None:
+        responsaveis_por_tarefa = prefetch_responsaveis(
+            [t["id"] for t in tarefas_consultadas],
+            sleep_ms=sleep_ms,
+            verbose=verbose
+        )
+
     grupos: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-    consultados = 0
-    for t in tarefas_relevantes:
-        if consultados >= max_responsaveis_lookup:
-            break
-        t_id = str(t["id"])
-        try:
-            resp_list = listar_responsaveis_tarefa(t_id)
-            if verbose:
-                print(f"[RESP] tarefa={t_id} -> {len(resp_list)} responsável(is).")
-            consultados += 1
-            if sleep_ms > 0:
-                time.sleep(sleep_ms / 1000.0)
-            if not isinstance(resp_list, list):
-                continue
-            for r in resp_list:
-                apelido = r.get("apelido") or r.get("nome") or f"resp_{r.get('id')}"
-                grupos[apelido].append(t)
-        except Exception as e:
-            if verbose:
-                print(f"[WARN] Falha ao buscar responsáveis tarefa={t_id}: {e}")
+    for t in tarefas_consultadas:
+        for r in responsaveis_por_tarefa.get(str(t["id"]), ()):
+            apelido = r.get("apelido") or r.get("nome") or f"resp_{r.get('id')}"
+            grupos[apelido].append(t)
     return grupos
 
 
@@ -412,6 +595,69 @@ def formatar_resumo_global(grupos_buckets: Dict[str, Dict[str, List[Dict[str, An
 
 # ===================== Coleta de Tarefas =====================
 
+FULL_SCAN_PREFETCH = 2
+
+
+def _stream_tarefas_pages(
+    categoria: str,
+    inicio_iso: str,
+    fim_iso: str,
+    page_size: int,
+    max_pages: Optional[int],
+    prefetch: int = FULL_SCAN_PREFETCH
+) -> Iterator[Tuple[int, List[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Gera (página, tarefas, meta) em ordem, buscando as próximas páginas em
+    segundo plano enquanto o chamador processa a atual.
+
+    A página 0 é buscada de forma síncrona para descobrir `totalPages`; sem
+    essa informação a paginação segue sequencial até `last`.
+    """
+    def _fetch(page: int):
+        return _cached_listar_tarefas_page(
+            categoria=categoria,
+            page=page,
+            size=page_size,
+            dataVencimentoInicio=inicio_iso,
+            dataVencimentoFim=fim_iso
+        )
+
+    page_tasks, meta = _fetch(0)
+    yield 0, page_tasks, meta
+    if meta.get("last") or (max_pages is not None and max_pages <= 1):
+        return
+
+    total_pages = meta.get("totalPages")
+    if not isinstance(total_pages, int) or total_pages <= 0:
+        page = 1
+        while max_pages is None or page < max_pages:
+            page_tasks, meta = _fetch(page)
+            yield page, page_tasks, meta
+            if meta.get("last"):
+                return
+            page += 1
+        return
+
+    limite = total_pages if max_pages is None else min(total_pages, max_pages)
+    with ThreadPoolExecutor(max_workers=max(1, prefetch)) as executor:
+        pendentes: Deque[Tuple[int, Any]] = deque()
+        proxima = 1
+        while proxima < limite and len(pendentes) < prefetch:
+            pendentes.append((proxima, executor.submit(_fetch, proxima)))
+            proxima += 1
+        while pendentes:
+            page, future = pendentes.popleft()
+            page_tasks, meta = future.result()
+            if proxima < limite:
+                pendentes.append((proxima, executor.submit(_fetch, proxima)))
+                proxima += 1
+            yield page, page_tasks, meta
+            if meta.get("last"):
+                for _, restante in pendentes:
+                    restante.cancel()
+                return
+
+
 def _coletar_tarefas_intervalo(
     categoria: str,
     inicio: date,
@@ -439,25 +685,21 @@ def _coletar_tarefas_intervalo(
         if verbose:
             print("[COLETA] FULL SCAN iniciado...")
         page = 0
-        while True:
-            page_tasks, meta = _cached_listar_tarefas_page(
-                categoria=categoria,
-                page=page,
-                size=page_size,
-                dataVencimentoInicio=inicio.isoformat(),
-                dataVencimentoFim=fim.isoformat()
-            )
+        for pagina, page_tasks, meta in _stream_tarefas_pages(
+            categoria,
+            inicio.isoformat(),
+            fim.isoformat(),
+            page_size,
+            max_pages
+        ):
             tarefas.extend(page_tasks)
             meta_final = meta
             if verbose:
-                print(f"  - page={page} obtidas={len(page_tasks)} last={meta.get('last')}")
-            page += 1
-            if meta.get("last"):
-                break
-            if max_pages is not None and page >= max_pages:
-                if verbose:
-                    print("[COLETA] max_pages atingido, interrompendo full scan.")
-                break
+                print(f"  - page={pagina} obtidas={len(page_tasks)} last={meta.get('last')}")
+            page = pagina + 1
+        if max_pages is not None and page >= max_pages and not meta_final.get("last"):
+            if verbose:
+                print("[COLETA] max_pages atingido, interrompendo full scan.")
         if verbose:
             print(f"[COLETA] FULL SCAN total coletado={len(tarefas)} páginas={page}")
     return tarefas, meta_final
@@ -488,6 +730,9 @@ def run_notification_cycle(
     alertar_se_zero_abertos: bool = True,
     timeout: Optional[int] = None,
 ) -> Dict[str, Any]:
+    from ..gclick.tarefas import normalizar_tarefa
+    from ..teams.webhook import enviar_teams_mensagem, enviar_teams_mensagens
+
     start_ts = time.time()
     if run_id is None:
         run_id = new_run_id('notify')
@@ -539,8 +784,15 @@ def run_notification_cycle(
     if verbose:
         print(f"[DEBUG] Coletadas {len(tarefas)} tarefas (janela {t_inicio} -> {t_fim}) meta={meta}")
 
-    # 2) Filtro de status
-    tarefas_filtradas = [t for t in tarefas if t.get("status") in STATUS_ABERTOS] if apenas_status_abertos else list(tarefas)
+    # 2) Filtro de status (passagem única: filtra e já conta abertos/fechados brutos)
+    total_abertos_brutos = 0
+    tarefas_abertas: List[Dict[str, Any]] = []
+    for t in tarefas:
+        if t.get("status") in STATUS_ABERTOS:
+            total_abertos_brutos += 1
+            tarefas_abertas.append(t)
+    total_fechados_brutos = len(tarefas) - total_abertos_brutos
+    tarefas_filtradas = tarefas_abertas if apenas_status_abertos else list(tarefas)
     if verbose:
         print(f"[DEBUG] Após filtro status abertos={apenas_status_abertos}: {len(tarefas_filtradas)}")
 
@@ -567,36 +819,50 @@ def run_notification_cycle(
 
     # 4) Classificação
     buckets_globais = {"vencidas": [], "vence_hoje": [], "vence_em_3_dias": []}
+    bucket_counts = {"vencidas": 0, "vence_hoje": 0, "vence_em_3_dias": 0}
+    # Classificação calculada uma única vez por tarefa e reutilizada no 5b
+    classificacao_por_tarefa: Dict[str, str] = {}
     for nt in tarefas_para_notificacao:
         cls = classificar(nt, hoje, dias_proximos)
         if cls:
             buckets_globais[cls].append(nt)
+            bucket_counts[cls] += 1
+            classificacao_por_tarefa[str(nt["id"])] = cls
 
     relevantes = buckets_globais["vencidas"] + buckets_globais["vence_hoje"] + buckets_globais["vence_em_3_dias"]
     if verbose:
-        print("[INFO] Classificação:", {k: len(v) for k, v in buckets_globais.items()}, "relevantes=", len(relevantes))
+        print("[INFO] Classificação:", bucket_counts, "relevantes=", len(relevantes))
 
-    # 5) Agrupamento por responsável
+    # 5) Agrupamento por responsável (prefetch concorrente, agrupamento em memória)
+    responsaveis_por_tarefa = prefetch_responsaveis(
+        [t["id"] for t in relevantes[:max_responsaveis_lookup]],
+        sleep_ms=rate_limit_sleep_ms,
+        verbose=verbose
+    )
     grupos_resps = agrupar_por_responsavel(
         relevantes,
         max_responsaveis_lookup=max_responsaveis_lookup,
-        sleep_ms=rate_limit_sleep_ms,
-        verbose=verbose
+        verbose=verbose,
+        responsaveis_por_tarefa=responsaveis_por_tarefa
     )
 
-    # 5b) Reclassificar por responsável
+    # 5b) Reclassificar por responsável (total por responsável contado na mesma passada)
     grupos_buckets: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    totais_por_resp: Dict[str, int] = {}
     for apelido, tarefas_lista in grupos_resps.items():
         b = {"vencidas": [], "vence_hoje": [], "vence_em_3_dias": []}
+        total = 0
         for t in tarefas_lista:
-            cls = classificar(t, hoje, dias_proximos)
+            cls = classificacao_por_tarefa.get(str(t["id"]))
             if cls:
                 b[cls].append(t)
+                total += 1
         grupos_buckets[apelido] = b
+        totais_por_resp[apelido] = total
 
     responsaveis_ordenados = sorted(
         grupos_buckets.items(),
-        key=lambda kv: sum(len(lst) for lst in kv[1].values()),
+        key=lambda kv: totais_por_resp[kv[0]],
         reverse=True
     )[:limite_responsaveis_notificar]
 
@@ -607,8 +873,7 @@ def run_notification_cycle(
     mensagens_enviadas: List[Tuple[str, str, Dict[str, List[Tuple[Dict[str, Any], str]]]]] = []
 
     for apelido, bkt in responsaveis_ordenados:
-        total_resp = sum(len(lst) for lst in bkt.values())
-        if total_resp == 0:
+        if totais_por_resp[apelido] == 0:
             continue
 
         if not repetir_no_mesmo_dia:
@@ -669,124 +934,147 @@ def run_notification_cycle(
             logging.error("❌ Falha ao importar create_task_notification_card: %s", imp_err, exc_info=True)
             create_task_notification_card = None  # type: ignore
 
-        for apelido, msg, bkt_filtrado in mensagens_enviadas:
-            envios_realizados_responsavel: List[Tuple[str, bool]] = []
-            try:
-                mensagem_enviada = False
+        # Marcações de idempotência acumuladas no ciclo e gravadas de uma vez (no finally)
+        envios_realizados_ciclo: List[Tuple[str, bool]] = []
+        # Responsáveis para o webhook (sem bot): (apelido, msg, chaves, envios do responsável)
+        webhook_pendentes: List[Tuple[str, str, Tuple[str, ...], List[Tuple[str, bool]]]] = []
+        # Orçamento de consultas de detalhes desta execução (MAX_DETALHES_FETCH_PER_RUN)
+        detalhes_restantes = int(os.getenv('MAX_DETALHES_FETCH_PER_RUN', '50'))
+        try:
+            for apelido, msg, bkt_filtrado in mensagens_enviadas:
+                envios_realizados_responsavel: List[Tuple[str, bool]] = []
+                chaves_responsavel = _chaves_do_bucket(bkt_filtrado)
+                try:
+                    mensagem_enviada = False
+                    via_webhook = False
 
-                if bot_sender:
-                    # Em TEST_MODE, redirecionar todas as notificações para o usuário de teste
-                    if is_test_mode():
-                        teams_id = get_test_user_id()
-                        logger.info("🧪 [TEST_MODE] Forçando envio via bot para %s (original: %s)", teams_id, apelido)
-                    else:
-                        teams_id = mapear_apelido_para_teams_id(apelido)
-
-                    # Decidir enviar via bot: se temos conversation ou estamos em TEST_MODE
-                    has_conv = _has_conversation(getattr(bot_sender, "conversation_storage", None), teams_id) if teams_id else False
-                    if teams_id and (has_conv or is_test_mode()):
-                        try:
-                            for _categoria, lista_tarefas_chaves in bkt_filtrado.items():
-                                for tarefa, chave in lista_tarefas_chaves:
-                                    try:
-                                        responsavel_dados = {"nome": apelido, "apelido": apelido}
-
-                                        # Detalhes compactos
-                                        task_id_txt = str(tarefa.get("id") or tarefa.get("taskId") or "")
-                                        detalhes_compactos: Dict[str, Any] = {}
-                                        max_detalhes_per_run = int(os.getenv('MAX_DETALHES_FETCH_PER_RUN', '50'))
-                                        if not hasattr(run_notification_cycle, '_detalhes_fetches_done'):
-                                            setattr(run_notification_cycle, '_detalhes_fetches_done', 0)
-                                        done = getattr(run_notification_cycle, '_detalhes_fetches_done')
-                                        if done < max_detalhes_per_run:
-                                            try:
-                                                detalhes_compactos = _cached_obter_detalhes(task_id_txt)
-                                                setattr(run_notification_cycle, '_detalhes_fetches_done', done + 1)
-                                            except Exception as e_det:
-                                                logging.warning("[DETALHES] Falha ao obter detalhes %s: %s", task_id_txt, e_det)
-
-                                        # Monta card (se disponível)
-                                        if create_task_notification_card:
-                                            card_payload = _ensure_card_payload(
-                                                create_task_notification_card(tarefa, responsavel_dados, detalhes=detalhes_compactos)  # type: ignore
-                                            )
-                                        else:
-                                            # Fallback: mensagem simples
-                                            card_payload = {
-                                                "type": "AdaptiveCard", "version": "1.3",
-                                                "body": [{"type": "TextBlock", "text": msg, "wrap": True}]
-                                            }
-
-                                        fallback_text = (
-                                            f"🔔 Obrigação: {tarefa.get('nome', 'Sem nome')} "
-                                            f"(Venc: {tarefa.get('dataVencimento', 'N/A')})"
-                                        )
-
-                                        _run_coro_safely(_resilient_send_card(bot_sender, teams_id, card_payload, fallback_text))
-
-                                        envios_realizados_responsavel.append((chave, True))
-                                        logging.info(f"[BOT-CARD] ✅ Enviado para {apelido} (tarefa: {tarefa.get('id')})")
-                                    except Exception as card_error:
-                                        envios_realizados_responsavel.append((chave, False))
-                                        logging.warning(f"[BOT-CARD] ❌ Falha para {apelido} tarefa {tarefa.get('id')}: {card_error}")
-
-                            mensagem_enviada = any(sucesso for _, sucesso in envios_realizados_responsavel)
-                            sucessos = sum(1 for _, sucesso in envios_realizados_responsavel if sucesso)
-                            total = len(envios_realizados_responsavel)
-                            if sucessos > 0:
-                                logging.info(f"[BOT] ✅ {sucessos}/{total} cards enviados para {apelido} (teams_id: {teams_id})")
-                            else:
-                                logging.warning(f"[BOT] ❌ Nenhum card enviado via bot para {apelido}")
-                        except Exception as bot_error:
-                            logging.warning(f"[BOT] ❌ Falha geral para {apelido}: {bot_error}")
-                if not mensagem_enviada:
-                    # Quando o bot está disponível, evitar fallback para webhook — o bot é a fonte de verdade
                     if bot_sender:
-                        logging.error(f"[BOT] ❌ Mensagem para {apelido} não entregue via bot e fallback por webhook está desabilitado quando o bot está ativo.")
-                        for _categoria, lista_tarefas_chaves in bkt_filtrado.items():
-                            for _tarefa, chave in lista_tarefas_chaves:
-                                envios_realizados_responsavel.append((chave, False))
-                    else:
-                        try:
-                            enviar_teams_mensagem(f"{apelido}:\n{msg}")
-                            for _categoria, lista_tarefas_chaves in bkt_filtrado.items():
-                                for _tarefa, chave in lista_tarefas_chaves:
-                                    envios_realizados_responsavel.append((chave, True))
-                            logging.info(f"[WEBHOOK] ✅ Enviado para {apelido}")
-                        except Exception as webhook_error:
-                            logging.error(f"[WEBHOOK] ❌ Falha para {apelido}: {webhook_error}")
-                            for _categoria, lista_tarefas_chaves in bkt_filtrado.items():
-                                for _tarefa, chave in lista_tarefas_chaves:
-                                    envios_realizados_responsavel.append((chave, False))
-
-                marcar_envios_bem_sucedidos(envios_realizados_responsavel, state_storage)
+                        # Em TEST_MODE, redirecionar todas as notificações para o usuário de teste
+                        if is_test_mode():
+                            teams_id = get_test_user_id()
+                            logger.info("🧪 [TEST_MODE] Forçando envio via bot para %s (original: %s)", teams_id, apelido)
+                        else:
+                            teams_id = mapear_apelido_para_teams_id(apelido)
+
+                        # Decidir enviar via bot: se temos conversation ou estamos em TEST_MODE
+                        has_conv = _has_conversation(getattr(bot_sender, "conversation_storage", None), teams_id) if teams_id else False
+                        if teams_id and (has_conv or is_test_mode()):
+                            try:
+                                # Detalhes dos cards deste responsável buscados em lote (até o limite
+                                # restante do orçamento da execução), não um GET por card
+                                ids_detalhes = [
+                                    tid for tid in dict.fromkeys(
+                                        str(tarefa.get("id") or tarefa.get("taskId") or "")
+                                        for lista in bkt_filtrado.values() for tarefa, _chave in lista
+                                    ) if tid
+                                ][:max(0, detalhes_restantes)]
+                                detalhes_restantes -= len(ids_detalhes)
+                                try:
+                                    detalhes_lote = _prefetch_detalhes(ids_detalhes) if ids_detalhes else {}
+                                except Exception as e_det:
+                                    logging.warning("[DETALHES] Falha na busca em lote para %s: %s", apelido, e_det)
+                                    detalhes_lote = {}
+                                for _categoria, lista_tarefas_chaves in bkt_filtrado.items():
+                                    for tarefa, chave in lista_tarefas_chaves:
+                                        try:
+                                            responsavel_dados = {"nome": apelido, "apelido": apelido}
+
+                                            # Detalhes compactos
+                                            task_id_txt = str(tarefa.get("id") or tarefa.get("taskId") or "")
+                                            # Tarefas além do orçamento seguem sem detalhes
+                                            detalhes_compactos: Dict[str, Any] = detalhes_lote.get(task_id_txt) or {}
+
+                                            # Monta card (se disponível)
+                                            if create_task_notification_card:
+                                                card_payload = _ensure_card_payload(
+                                                    create_task_notification_card(tarefa, responsavel_dados, detalhes=detalhes_compactos, hoje=hoje)  # type: ignore
+                                                )
+                                            else:
+                                                # Fallback: mensagem simples
+                                                card_payload = {
+                                                    "type": "AdaptiveCard", "version": "1.3",
+                                                    "body": [{"type": "TextBlock", "text": msg, "wrap": True}]
+                                                }
+
+                                            fallback_text = (
+                                                f"🔔 Obrigação: {tarefa.get('nome', 'Sem nome')} "
+                                                f"(Venc: {tarefa.get('dataVencimento', 'N/A')})"
+                                            )
 
-                if verbose:
-                    sucessos = sum(1 for _, sucesso in envios_realizados_responsavel if sucesso)
-                    total = len(envios_realizados_responsavel)
-                    logger.debug("[ENVIADO] %s - %d/%d tarefas enviadas com sucesso", apelido, sucessos, total)
+                                            _run_coro_safely(_resilient_send_card(bot_sender, teams_id, card_payload, fallback_text))
+
+                                            envios_realizados_responsavel.append((chave, True))
+                                            logging.info("[BOT-CARD] ✅ Enviado para %s (tarefa: %s)", apelido, tarefa.get('id'))
+                                        except Exception as card_error:
+                                            envios_realizados_responsavel.append((chave, False))
+                                            logging.warning("[BOT-CARD] ❌ Falha para %s tarefa %s: %s", apelido, tarefa.get('id'), card_error)
+
+                                mensagem_enviada = any(sucesso for _, sucesso in envios_realizados_responsavel)
+                                sucessos = sum(1 for _, sucesso in envios_realizados_responsavel if sucesso)
+                                total = len(envios_realizados_responsavel)
+                                if sucessos > 0:
+                                    logging.info("[BOT] ✅ %s/%s cards enviados para %s (teams_id: %s)", sucessos, total, apelido, teams_id)
+                                else:
+                                    logging.warning("[BOT] ❌ Nenhum card enviado via bot para %s", apelido)
+                            except Exception as bot_error:
+                                logging.warning("[BOT] ❌ Falha geral para %s: %s", apelido, bot_error)
+                    if not mensagem_enviada:
+                        # Quando o bot está disponível, evitar fallback para webhook — o bot é a fonte de verdade
+                        if bot_sender:
+                            logging.error("[BOT] ❌ Mensagem para %s não entregue via bot e fallback por webhook está desabilitado quando o bot está ativo.", apelido)
+                            envios_realizados_responsavel.extend((chave, False) for chave in chaves_responsavel)
+                        else:
+                            # Enviado em lote após o laço
+                            webhook_pendentes.append((apelido, msg, chaves_responsavel, envios_realizados_responsavel))
+                            via_webhook = True
 
-                if rate_limit_sleep_ms > 0:
-                    time.sleep(rate_limit_sleep_ms / 1000.0)
+                    if not via_webhook:
+                        envios_realizados_ciclo.extend(envios_realizados_responsavel)
 
-            except Exception as e:
-                logging.error(f"[ERRO_ENVIO] {apelido}: {e}", exc_info=True)
-                for _categoria, lista_tarefas_chaves in bkt_filtrado.items():
-                    for _tarefa, chave in lista_tarefas_chaves:
-                        envios_realizados_responsavel.append((chave, False))
-                if rate_limit_sleep_ms > 0:
-                    time.sleep(rate_limit_sleep_ms / 1000.0)
+                        if verbose:
+                            sucessos = sum(1 for _, sucesso in envios_realizados_responsavel if sucesso)
+                            total = len(envios_realizados_responsavel)
+                            logger.debug("[ENVIADO] %s - %d/%d tarefas enviadas com sucesso", apelido, sucessos, total)
+
+                    if rate_limit_sleep_ms > 0:
+                        time.sleep(rate_limit_sleep_ms / 1000.0)
+
+                except Exception as e:
+                    logging.error("[ERRO_ENVIO] %s: %s", apelido, e, exc_info=logging.getLogger().isEnabledFor(logging.DEBUG))
+                    if rate_limit_sleep_ms > 0:
+                        time.sleep(rate_limit_sleep_ms / 1000.0)
+
+            # Webhooks pendentes enviados em sequência: todos vão para a mesma URL
+            if webhook_pendentes:
+                resultados = enviar_teams_mensagens(
+                    [f"{apelido}:\n{msg}" for apelido, msg, _, _ in webhook_pendentes],
+                    max_workers=1,
+                    intervalo_ms=rate_limit_sleep_ms,
+                )
+                for (apelido, _msg, chaves_responsavel, envios_realizados_responsavel), webhook_error in zip(webhook_pendentes, resultados):
+                    if webhook_error is None:
+                        envios_realizados_responsavel.extend((chave, True) for chave in chaves_responsavel)
+                        logging.info("[WEBHOOK] ✅ Enviado para %s", apelido)
+                    else:
+                        logging.error("[WEBHOOK] ❌ Falha para %s: %s", apelido, webhook_error)
+                        envios_realizados_responsavel.extend((chave, False) for chave in chaves_responsavel)
+                    envios_realizados_ciclo.extend(envios_realizados_responsavel)
+
+                    if verbose:
+                        sucessos = sum(1 for _, sucesso in envios_realizados_responsavel if sucesso)
+                        total = len(envios_realizados_responsavel)
+                        logger.debug("[ENVIADO] %s - %d/%d tarefas enviadas com sucesso", apelido, sucessos, total)
+        finally:
+            # Grava as marcações já obtidas mesmo se o ciclo abortar no meio (exceção
+            # inesperada, falha no lote de webhooks): o reenvio não repete quem já recebeu
+            marcar_envios_bem_sucedidos(envios_realizados_ciclo, state_storage)
 
     # 8) Estatísticas finais
     counts_final = {
-        "vencidas": len(buckets_globais["vencidas"]),
-        "vence_hoje": len(buckets_globais["vence_hoje"]),
-        "vence_em_3_dias": len(buckets_globais["vence_em_3_dias"]),
+        **bucket_counts,
         "responsaveis_selecionados": len(mensagens_enviadas),
     }
 
-    total_abertos_brutos = sum(1 for t in tarefas if t.get("status") in STATUS_ABERTOS)
-    total_fechados_brutos = len(tarefas) - total_abertos_brutos
     zero_abertos = apenas_status_abertos and total_abertos_brutos == 0
 
     duration = round(time.time() - start_ts, 2)
@@ -9,18 +9,38 @@ import os
 import logging
 import asyncio
 import time
+import random
+from collections import defaultdict, deque
 from functools import wraps
 from typing import List, Tuple, Callable, Any, Optional
 from dataclasses import dataclass
-from enum import Enum
+
+# Circuit breaker vive em gclick (o cliente HTTP o usa sem depender do engine)
+from ..gclick.circuit_breaker import CircuitBreaker, CircuitBreakerConfig, CircuitState  # noqa: F401 (reexportadas)
 
 logger = logging.getLogger(__name__)
 
-class CircuitState(Enum):
-    """Estados do Circuit Breaker."""
-    CLOSED = "closed"      # Funcionamento normal
-    OPEN = "open"          # Falhas detectadas, bloqueando requests
-    HALF_OPEN = "half_open"  # Testando se serviço se recuperou
+# Falhas transitórias: rede/timeout e status HTTP que costumam se resolver sozinhos
+try:
+    import requests
+    TRANSIENT_EXCEPTIONS: tuple = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+except ImportError:
+    TRANSIENT_EXCEPTIONS = (ConnectionError, TimeoutError)
+
+TRANSIENT_HTTP_STATUS = frozenset({429, 502, 503, 504})
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """Indica se vale a pena repetir a operação que levantou `exc`."""
+    if isinstance(exc, TRANSIENT_EXCEPTIONS):
+        return True
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    return status in TRANSIENT_HTTP_STATUS
+
+
+def _jittered(delay: float) -> float:
+    """Equal jitter: espera entre metade e o total do delay, evitando retries sincronizados."""
+    return delay * (0.5 + random.random() * 0.5)
 
 @dataclass
 class RateLimitConfig:
@@ -29,14 +49,6 @@ class RateLimitConfig:
     burst_capacity: int = 20
     window_size_seconds: int = 60
 
-@dataclass
-class CircuitBreakerConfig:
-    """Configuração do circuit breaker."""
-    failure_threshold: int = 5
-    recovery_timeout_seconds: int = 60
-    half_open_max_calls: int = 3
-    success_threshold: int = 2
-
 @dataclass
 class RetryConfig:
     """Configuração de retry."""
@@ -64,23 +76,23 @@ def safe_execute_batch(functions: List[Tuple[Callable, tuple, dict]], continue_o
     
     for i, (func, args, kwargs) in enumerate(functions):
         try:
-            logger.debug(f"Executando função {i+1}/{len(functions)}: {func.__name__}")
+            logger.debug("Executando função %s/%s: %s", i+1, len(functions), func.__name__)
             result = func(*args, **kwargs)
             results.append((True, result, None))
-            logger.debug(f"Função {func.__name__} executada com sucesso")
+            logger.debug("Função %s executada com sucesso", func.__name__)
             
         except Exception as e:
-            logger.error(f"Erro executando {func.__name__}: {e}", exc_info=True)
+            logger.error("Erro executando %s: %s", func.__name__, e, exc_info=logger.isEnabledFor(logging.DEBUG))
             results.append((False, None, e))
             
             if not continue_on_error:
-                logger.error(f"Parando execução em lote devido ao erro em {func.__name__}")
+                logger.error("Parando execução em lote devido ao erro em %s", func.__name__)
                 raise
                 
     # Log do resumo
     successful = sum(1 for success, _, _ in results if success)
     total = len(results)
-    logger.info(f"Execução em lote concluída: {successful}/{total} funções executadas com sucesso")
+    logger.info("Execução em lote concluída: %s/%s funções executadas com sucesso", successful, total)
     
     return results
 
@@ -97,46 +109,49 @@ async def safe_execute_batch_async(functions: List[Tuple[Callable, tuple, dict]]
         List[Tuple[bool, Any, Optional[Exception]]]: Status de cada execução
     """
     semaphore = asyncio.Semaphore(max_concurrent)
-    results = [None] * len(functions)  # Pre-allocate para manter ordem
     
-    async def execute_with_semaphore(index: int, func: Callable, args: tuple, kwargs: dict):
+    async def execute_with_semaphore(index: int, func: Callable, args: tuple, kwargs: dict, is_coro: bool) -> Tuple[bool, Any, Optional[Exception]]:
         async with semaphore:
             try:
-                logger.debug(f"Executando função assíncrona {index+1}/{len(functions)}: {func.__name__}")
+                logger.debug("Executando função assíncrona %s/%s: %s", index+1, len(functions), func.__name__)
                 
-                if asyncio.iscoroutinefunction(func):
+                if is_coro:
                     result = await func(*args, **kwargs)
                 else:
                     result = func(*args, **kwargs)
                     
-                results[index] = (True, result, None)
-                logger.debug(f"Função {func.__name__} executada com sucesso")
+                logger.debug("Função %s executada com sucesso", func.__name__)
+                return (True, result, None)
                 
             except Exception as e:
-                logger.error(f"Erro executando {func.__name__}: {e}", exc_info=True)
-                results[index] = (False, None, e)
+                logger.error("Erro executando %s: %s", func.__name__, e, exc_info=logger.isEnabledFor(logging.DEBUG))
                 
                 if not continue_on_error:
-                    logger.error(f"Parando execução em lote devido ao erro em {func.__name__}")
+                    logger.error("Parando execução em lote devido ao erro em %s", func.__name__)
                     raise
+                return (False, None, e)
     
-    # Cria tasks para todas as funções
-    tasks = [
-        execute_with_semaphore(i, func, args, kwargs)
-        for i, (func, args, kwargs) in enumerate(functions)
-    ]
+    # Cria tasks para todas as funções (tipo de cada função resolvido uma vez por lote)
+    is_coro_por_func = {}
+    tasks = []
+    for i, (func, args, kwargs) in enumerate(functions):
+        is_coro = is_coro_por_func.get(func)
+        if is_coro is None:
+            is_coro = is_coro_por_func[func] = asyncio.iscoroutinefunction(func)
+        tasks.append(execute_with_semaphore(i, func, args, kwargs, is_coro))
     
-    # Executa todas as tasks
-    await asyncio.gather(*tasks, return_exceptions=continue_on_error)
+    # gather preserva a ordem de submissão: não há estado compartilhado entre as tasks
+    results = await asyncio.gather(*tasks)
     
     # Log do resumo
     successful = sum(1 for success, _, _ in results if success)
     total = len(results)
-    logger.info(f"Execução assíncrona em lote concluída: {successful}/{total} funções executadas com sucesso")
+    logger.info("Execução assíncrona em lote concluída: %s/%s funções executadas com sucesso", successful, total)
     
     return results
 
-def retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor: float = 2.0, exceptions: tuple = (Exception,)):
+def retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor: float = 2.0, exceptions: tuple = (Exception,),
+                     max_delay: float = 30.0, retry_if: Optional[Callable[[Exception], bool]] = None):
     """
     Decorator que adiciona retry automático com backoff exponencial.
     
@@ -145,6 +160,9 @@ def retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor:
         delay: Delay inicial entre tentativas (segundos)
         backoff_factor: Fator de multiplicação do delay a cada retry
         exceptions: Tupla de exceções que devem triggerar retry
+        max_delay: Teto do delay entre tentativas (segundos)
+        retry_if: Predicado opcional (ex.: is_transient_error); se retornar False
+            a exceção é relançada sem novas tentativas
         
     Returns:
         Decorator function
@@ -160,14 +178,16 @@ def retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor:
                     return func(*args, **kwargs)
                 except exceptions as e:
                     last_exception = e
+                    if retry_if is not None and not retry_if(e):
+                        raise
                     if attempt == max_attempts - 1:
                         # Última tentativa - relança a exceção
-                        logger.error(f"Função {func.__name__} falhou após {max_attempts} tentativas: {e}")
+                        logger.error("Função %s falhou após %s tentativas: %s", func.__name__, max_attempts, e)
                         raise
                     else:
-                        logger.warning(f"Tentativa {attempt + 1}/{max_attempts} de {func.__name__} falhou: {e}. Tentando novamente em {current_delay}s...")
-                        time.sleep(current_delay)
-                        current_delay *= backoff_factor
+                        logger.warning("Tentativa %s/%s de %s falhou: %s. Tentando novamente em %ss...", attempt + 1, max_attempts, func.__name__, e, current_delay)
+                        time.sleep(_jittered(current_delay))
+                        current_delay = min(current_delay * backoff_factor, max_delay)
             
             # Não deveria chegar aqui, mas por segurança
             raise last_exception
@@ -175,7 +195,8 @@ def retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor:
         return wrapper
     return decorator
 
-def async_retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor: float = 2.0, exceptions: tuple = (Exception,)):
+def async_retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_factor: float = 2.0, exceptions: tuple = (Exception,),
+                           max_delay: float = 30.0, retry_if: Optional[Callable[[Exception], bool]] = None):
     """
     Versão assíncrona do decorator retry_on_failure.
     """
@@ -190,13 +211,15 @@ def async_retry_on_failure(max_attempts: int = 3, delay: float = 1.0, backoff_fa
                     return await func(*args, **kwargs)
                 except exceptions as e:
                     last_exception = e
+                    if retry_if is not None and not retry_if(e):
+                        raise
                     if attempt == max_attempts - 1:
-                        logger.error(f"Função {func.__name__} falhou após {max_attempts} tentativas: {e}")
+                        logger.error("Função %s falhou após %s tentativas: %s", func.__name__, max_attempts, e)
                         raise
                     else:
-                        logger.warning(f"Tentativa {attempt + 1}/{max_attempts} de {func.__name__} falhou: {e}. Tentando novamente em {current_delay}s...")
-                        await asyncio.sleep(current_delay)
-                        current_delay *= backoff_factor
+                        logger.warning("Tentativa %s/%s de %s falhou: %s. Tentando novamente em %ss...", attempt + 1, max_attempts, func.__name__, e, current_delay)
+                        await asyncio.sleep(_jittered(current_delay))
+                        current_delay = min(current_delay * backoff_factor, max_delay)
             
             raise last_exception
             
@@ -209,9 +232,9 @@ class ErrorCounter:
     """
     
     def __init__(self):
-        self.counts = {}
-        self.recent_errors = []
+        self.counts = defaultdict(int)
         self.max_recent = 100  # Máximo de erros recentes para manter
+        self.recent_errors = deque(maxlen=self.max_recent)
     
     def add_error(self, error_type: str, error_message: str = "", timestamp: Optional[float] = None):
         """
@@ -226,20 +249,16 @@ class ErrorCounter:
             timestamp = time.time()
             
         # Atualiza contador por tipo
-        self.counts[error_type] = self.counts.get(error_type, 0) + 1
+        self.counts[error_type] += 1
         
-        # Adiciona aos erros recentes
+        # Adiciona aos erros recentes (deque descarta os mais antigos)
         self.recent_errors.append({
             "type": error_type,
             "message": error_message,
             "timestamp": timestamp
         })
-        
-        # Limita tamanho da lista de erros recentes
-        if len(self.recent_errors) > self.max_recent:
-            self.recent_errors = self.recent_errors[-self.max_recent:]
-            
-        logger.debug(f"Erro adicionado ao contador: {error_type} (total: {self.counts[error_type]})")
+
+        logger.debug("Erro adicionado ao contador: %s (total: %s)", error_type, self.counts[error_type])
     
     def get_summary(self) -> dict:
         """
@@ -250,20 +269,24 @@ class ErrorCounter:
         """
         total_errors = sum(self.counts.values())
         
-        # Erros das últimas 24 horas
-        day_ago = time.time() - (24 * 60 * 60)
-        recent_24h = [e for e in self.recent_errors if e["timestamp"] > day_ago]
-        
-        # Erros da última hora
-        hour_ago = time.time() - (60 * 60)
-        recent_1h = [e for e in self.recent_errors if e["timestamp"] > hour_ago]
+        # Erros das últimas 24 horas e da última hora, numa única passagem
+        now = time.time()
+        day_ago = now - (24 * 60 * 60)
+        hour_ago = now - (60 * 60)
+        recent_24h = recent_1h = 0
+        for e in self.recent_errors:
+            ts = e["timestamp"]
+            if ts > day_ago:
+                recent_24h += 1
+                if ts > hour_ago:
+                    recent_1h += 1
         
         return {
             "total_errors": total_errors,
             "errors_by_type": dict(self.counts),
-            "errors_last_24h": len(recent_24h),
-            "errors_last_hour": len(recent_1h),
-            "most_recent_errors": self.recent_errors[-5:] if self.recent_errors else []
+            "errors_last_24h": recent_24h,
+            "errors_last_hour": recent_1h,
+            "most_recent_errors": list(self.recent_errors)[-5:]
         }
     
     def reset(self):
@@ -286,7 +309,7 @@ def log_error_and_count(error_type: str, exception: Exception, extra_info: str =
     """
     error_message = f"{str(exception)} {extra_info}".strip()
     
-    logger.error(f"[{error_type}] {error_message}", exc_info=True)
+    logger.error("[%s] %s", error_type, error_message, exc_info=True)
     global_error_counter.add_error(error_type, error_message)
 
 # Exemplo de uso das funções de resiliência
@@ -325,7 +348,7 @@ async def example_resilient_notification_batch(user_notifications: List[dict]):
     successful = sum(1 for success, _, _ in results if success)
     failed = len(results) - successful
     
-    logger.info(f"Notificações enviadas: {successful} sucesso, {failed} falhas")
+    logger.info("Notificações enviadas: %s sucesso, %s falhas", successful, failed)
     
     return {
         "sent": successful,
@@ -377,63 +400,6 @@ class RateLimiter:
             "rate_limit": self.config.requests_per_second
         }
 
-class CircuitBreaker:
-    """Circuit breaker para proteger contra falhas em cascata."""
-    
-    def __init__(self, name: str, config: CircuitBreakerConfig):
-        self.name = name
-        self.config = config
-        self.state = CircuitState.CLOSED
-        self.failure_count = 0
-        self.success_count = 0
-        self.last_failure_time = 0
-        
-        logger.info("🔌 Circuit breaker '%s' inicializado", name)
-    
-    def can_execute(self) -> bool:
-        """Verifica se pode executar operação."""
-        if self.state == CircuitState.CLOSED:
-            return True
-        
-        if self.state == CircuitState.OPEN:
-            if time.time() - self.last_failure_time >= self.config.recovery_timeout_seconds:
-                self.state = CircuitState.HALF_OPEN
-                logger.info("🔄 Circuit breaker '%s' mudou para HALF_OPEN", self.name)
-                return True
-            return False
-        
-        return True  # HALF_OPEN allows execution
-    
-    def on_success(self):
-        """Registra sucesso na operação."""
-        if self.state == CircuitState.HALF_OPEN:
-            self.success_count += 1
-            if self.success_count >= self.config.success_threshold:
-                self.state = CircuitState.CLOSED
-                self.failure_count = 0
-                logger.info("✅ Circuit breaker '%s' FECHADO", self.name)
-        elif self.state == CircuitState.CLOSED:
-            self.failure_count = max(0, self.failure_count - 1)
-    
-    def on_failure(self):
-        """Registra falha na operação."""
-        self.last_failure_time = time.time()
-        self.failure_count += 1
-        
-        if self.failure_count >= self.config.failure_threshold:
-            self.state = CircuitState.OPEN
-            logger.warning("🚨 Circuit breaker '%s' ABERTO (%d falhas)", 
-                         self.name, self.failure_count)
-    
-    def get_stats(self) -> dict:
-        """Retorna estatísticas do circuit breaker."""
-        return {
-            "name": self.name,
-            "state": self.state.value,
-            "failure_count": self.failure_count,
-            "can_execute": self.can_execute()
-        }
-
 class ResilienceManager:
     """Gerenciador central de resilience."""
     
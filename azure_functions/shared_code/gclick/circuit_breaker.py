@@ -0,0 +1,124 @@
+"""
+Circuit breaker thread-safe usado pelo cliente HTTP do G-Click.
+
+Fica no pacote gclick (sem dependências além da stdlib) para que o cliente
+não precise importar o engine; engine.resilience reexporta as classes.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """Estados do Circuit Breaker."""
+    CLOSED = "closed"      # Funcionamento normal
+    OPEN = "open"          # Falhas detectadas, bloqueando requests
+    HALF_OPEN = "half_open"  # Testando se serviço se recuperou
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """Configuração do circuit breaker."""
+    failure_threshold: int = 5
+    recovery_timeout_seconds: int = 60
+    half_open_max_calls: int = 3
+    success_threshold: int = 2
+
+
+class CircuitBreaker:
+    """Circuit breaker para proteger contra falhas em cascata (thread-safe)."""
+
+    def __init__(self, name: str, config: CircuitBreakerConfig):
+        self.name = name
+        self.config = config
+        self.state = CircuitState.CLOSED
+        self.failure_count = 0
+        self.success_count = 0
+        self.last_failure_time = 0.0
+        # Chamadas de teste liberadas na janela HALF_OPEN atual (limite: half_open_max_calls)
+        self.half_open_calls = 0
+        self.half_open_since = 0.0
+        # Compartilhado entre threads (ex.: prefetch de responsáveis/detalhes)
+        self._lock = threading.Lock()
+
+        logger.info("🔌 Circuit breaker '%s' inicializado", name)
+
+    def can_execute(self) -> bool:
+        """
+        Verifica se pode executar operação.
+
+        Em HALF_OPEN libera no máximo half_open_max_calls chamadas de teste; se
+        nenhuma delas decidir o estado (sucesso/falha) dentro de
+        recovery_timeout_seconds, uma nova janela de teste é aberta.
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+
+            agora = time.time()
+            if self.state == CircuitState.OPEN:
+                if agora - self.last_failure_time < self.config.recovery_timeout_seconds:
+                    return False
+                self.state = CircuitState.HALF_OPEN
+                self.success_count = 0
+                self.half_open_calls = 0
+                self.half_open_since = agora
+                logger.info("🔄 Circuit breaker '%s' mudou para HALF_OPEN", self.name)
+
+            if self.half_open_calls >= self.config.half_open_max_calls:
+                if agora - self.half_open_since < self.config.recovery_timeout_seconds:
+                    return False
+                self.half_open_calls = 0
+                self.half_open_since = agora
+            self.half_open_calls += 1
+            return True
+
+    def on_success(self):
+        """Registra sucesso na operação."""
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN:
+                self.success_count += 1
+                if self.success_count >= self.config.success_threshold:
+                    self.state = CircuitState.CLOSED
+                    self.failure_count = 0
+                    self.success_count = 0
+                    self.half_open_calls = 0
+                    logger.info("✅ Circuit breaker '%s' FECHADO", self.name)
+            elif self.state == CircuitState.CLOSED:
+                self.failure_count = max(0, self.failure_count - 1)
+
+    def on_failure(self):
+        """Registra falha na operação."""
+        with self._lock:
+            self.last_failure_time = time.time()
+            self.failure_count += 1
+
+            if self.failure_count >= self.config.failure_threshold:
+                if self.state != CircuitState.OPEN:
+                    logger.warning("🚨 Circuit breaker '%s' ABERTO (%d falhas)",
+                                   self.name, self.failure_count)
+                self.state = CircuitState.OPEN
+                # Cada reabertura exige de novo success_threshold sucessos em HALF_OPEN
+                self.success_count = 0
+                self.half_open_calls = 0
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do circuit breaker (sem consumir chamadas de teste)."""
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                pode = True
+            elif self.state == CircuitState.OPEN:
+                pode = time.time() - self.last_failure_time >= self.config.recovery_timeout_seconds
+            else:
+                pode = self.half_open_calls < self.config.half_open_max_calls
+            return {
+                "name": self.name,
+                "state": self.state.value,
+                "failure_count": self.failure_count,
+                "can_execute": pode,
+            }
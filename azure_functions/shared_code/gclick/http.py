@@ -1,8 +1,13 @@
 import os
+import json
 import time
+import socket
+import threading
 import requests
+from urllib3.connection import HTTPConnection
 from typing import Optional
 from .auth import get_access_token
+from .circuit_breaker import CircuitBreaker, CircuitBreakerConfig
 from ..config.logging_config import setup_logger
 
 logger = setup_logger(__name__)
@@ -12,8 +17,42 @@ DEBUG = os.getenv("GCLICK_DEBUG", "0") == "1"
 # Configuração de SSL verify via environment variable
 SSL_VERIFY = os.getenv("GCLICK_SSL_VERIFY", "true").lower() in ("1", "true", "yes")
 
+# Decodificação JSON: orjson quando disponível (bem mais rápido em listas grandes)
+try:
+    import orjson  # type: ignore
+
+    def json_loads(raw):
+        return orjson.loads(raw)
+except ImportError:  # pragma: no cover - fallback sem orjson
+    def json_loads(raw):
+        return json.loads(raw)
+
 # Session reutilizável para melhor performance
 _http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+# Um único host (api.gclick.com.br): o pool precisa comportar as consultas
+# concorrentes de responsáveis/detalhes sem descartar conexões keep-alive.
+HTTP_POOL_MAXSIZE = int(os.getenv("GCLICK_HTTP_POOL_MAXSIZE", "32"))
+
+def _keepalive_socket_options() -> list:
+    """TCP keepalive para que conexões ociosas do pool não sejam derrubadas entre ciclos."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # Constantes específicas de plataforma (Linux); ignoradas onde não existem
+    for nome, valor in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, nome):
+            options.append((socket.IPPROTO_TCP, getattr(socket, nome), valor))
+    return options
+
+
+class _KeepAliveHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter que liga TCP keepalive nos sockets do pool."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", _keepalive_socket_options())
+        super().init_poolmanager(*args, **kwargs)
+
 
 def get_http_session() -> requests.Session:
     """
@@ -21,27 +60,44 @@ def get_http_session() -> requests.Session:
     Thread-safe para Azure Functions.
     """
     global _http_session
-    if _http_session is None:
-        _http_session = requests.Session()
-        # Configurações de connection pooling
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=10,
-            pool_maxsize=20,
-            max_retries=0  # Controlamos retry manualmente
-        )
-        _http_session.mount('http://', adapter)
-        _http_session.mount('https://', adapter)
-        
-        # Headers padrão
-        _http_session.headers.update({
-            'User-Agent': 'GClick-Teams-Bot/1.0',
-            'Accept': 'application/json'
-        })
-        
-        logger.debug("HTTP Session criada com connection pooling")
-    
+    if _http_session is not None:
+        return _http_session
+
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            # Configurações de connection pooling
+            adapter = _KeepAliveHTTPAdapter(
+                pool_connections=10,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=0  # Controlamos retry manualmente
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+
+            # Headers padrão
+            session.headers.update({
+                'User-Agent': 'GClick-Teams-Bot/1.0',
+                'Accept': 'application/json'
+            })
+
+            _http_session = session
+            logger.debug("HTTP Session criada com connection pooling (pool_maxsize=%d)", HTTP_POOL_MAXSIZE)
+
     return _http_session
 
+# Circuit breaker: após falhas seguidas (timeout/conexão ou 502/503/504),
+# chamadas à API falham de imediato durante o cooldown em vez de repetir
+# retries contra uma API fora do ar. 500 não conta: /responsaveis o devolve
+# para tarefas inválidas, o que não indica indisponibilidade.
+_gclick_breaker = CircuitBreaker(
+    "gclick_api",
+    CircuitBreakerConfig(
+        failure_threshold=int(os.getenv("GCLICK_CB_FAILURES", "10")),
+        recovery_timeout_seconds=int(os.getenv("GCLICK_CB_COOLDOWN", "30")),
+    ),
+)
+
 class GClickHTTPError(RuntimeError):
     def __init__(self, message, status=None, url=None, body=None, trace_id=None):
         super().__init__(message)
@@ -50,6 +106,37 @@ class GClickHTTPError(RuntimeError):
         self.body = body
         self.trace_id = trace_id
 
+# Status que indicam API indisponível (contam como falha no circuit breaker)
+_STATUS_INDISPONIVEL = frozenset((502, 503, 504))
+
+def breaker_get(url: str, *, session: Optional[requests.Session] = None,
+                breaker: Optional[CircuitBreaker] = None, **kwargs) -> requests.Response:
+    """
+    session.get protegido por circuit breaker (padrão: o compartilhado da API G-Click).
+
+    Levanta GClickHTTPError sem tocar na rede enquanto o circuito está aberto.
+    requests.RequestException (timeout, conexão) e 502/503/504 contam como
+    falha; respostas < 400 como sucesso. Demais status são devolvidos ao chamador.
+    Hosts distintos devem passar o próprio `breaker` para não abrir o da API.
+    """
+    cb = breaker or _gclick_breaker
+    if not cb.can_execute():
+        raise GClickHTTPError(f"Circuit breaker '{cb.name}' aberto; chamada a {url} bloqueada", url=url)
+
+    try:
+        resp = (session or get_http_session()).get(url, **kwargs)
+    except requests.RequestException as e:
+        cb.on_failure()
+        logger.debug("Falha de rede em %s (%s) registrada no circuit breaker '%s'", url, type(e).__name__, cb.name)
+        raise
+
+    if resp.status_code in _STATUS_INDISPONIVEL:
+        cb.on_failure()
+        logger.debug("HTTP %s em %s registrado no circuit breaker '%s'", resp.status_code, url, cb.name)
+    elif resp.status_code < 400:
+        cb.on_success()
+    return resp
+
 def _full_url(path: str) -> str:
     if path.startswith("http"):
         return path
@@ -60,10 +147,10 @@ def gclick_get(path: str, params=None, retry=True, max_retries=2, backoff=1.5):
     GET simples com:
       - renovação de token em 401/403
       - pequenas tentativas extras para 502/503/504
+      - circuit breaker compartilhado (breaker_get) contra API fora do ar
       - reutilização de conexões HTTP via Session
     """
     url = _full_url(path)
-    session = get_http_session()
     attempt = 0
     
     while True:
@@ -73,7 +160,7 @@ def gclick_get(path: str, params=None, retry=True, max_retries=2, backoff=1.5):
             "Authorization": f"Bearer {token}",
         }
         
-        resp = session.get(url, headers=headers, params=params, timeout=40, verify=SSL_VERIFY)
+        resp = breaker_get(url, headers=headers, params=params, timeout=40, verify=SSL_VERIFY)
 
         if resp.status_code in (401, 403) and retry:
             # Força renovação token
@@ -89,7 +176,7 @@ def gclick_get(path: str, params=None, retry=True, max_retries=2, backoff=1.5):
             body_json = None
             trace_id = None
             try:
-                body_json = resp.json()
+                body_json = json_loads(resp.content)
                 if isinstance(body_json, dict):
                     trace_id = body_json.get("traceId")
             except Exception:
@@ -111,7 +198,7 @@ def gclick_get(path: str, params=None, retry=True, max_retries=2, backoff=1.5):
             )
 
         try:
-            data = resp.json()
+            data = json_loads(resp.content)
         except ValueError:
             raise GClickHTTPError("Resposta não JSON", status=resp.status_code, url=url, body=resp.text)
 
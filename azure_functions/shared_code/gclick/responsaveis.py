@@ -1,14 +1,36 @@
 import time
+import threading
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from .auth import get_access_token
+from .http import GClickHTTPError, breaker_get, json_loads, SSL_VERIFY
 from azure_functions.shared_code.config.logging_config import setup_logger
 
 logger = setup_logger(__name__)
 
+# Cache curto por tarefa: ciclos repetidos dentro da janela não voltam à API
+RESPONSAVEIS_CACHE_TTL = 120  # segundos
+_cache_responsaveis: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+_responsaveis_lock = threading.Lock()
+
 def _headers():
     return {"Authorization": f"Bearer {get_access_token()}"}
 
+def _cache_get(tarefa_id: str) -> Optional[List[Dict[str, Any]]]:
+    with _responsaveis_lock:
+        entry = _cache_responsaveis.get(tarefa_id)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[0]:
+            del _cache_responsaveis[tarefa_id]
+            return None
+        return entry[1]
+
+def _cache_set(tarefa_id: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with _responsaveis_lock:
+        _cache_responsaveis[tarefa_id] = (time.monotonic() + RESPONSAVEIS_CACHE_TTL, data)
+    return data
+
 def listar_responsaveis_tarefa(
     tarefa_id: str,
     timeout: int = 8,
@@ -19,7 +41,12 @@ def listar_responsaveis_tarefa(
     """
     Consulta /tarefas/{id}/responsaveis com tratamento robusto de erros.
     Retorna lista (possivelmente vazia).
+    Respostas definitivas (200/404/500) ficam em cache por RESPONSAVEIS_CACHE_TTL segundos.
     """
+    cached = _cache_get(tarefa_id)
+    if cached is not None:
+        return cached
+
     url = f"https://api.gclick.com.br/tarefas/{tarefa_id}/responsaveis"
 
     attempt = 0
@@ -28,37 +55,41 @@ def listar_responsaveis_tarefa(
     while attempt < retries:
         attempt += 1
         try:
-            resp = requests.get(url, headers=_headers(), timeout=timeout)
+            resp = breaker_get(url, headers=_headers(), timeout=timeout, verify=SSL_VERIFY)
             last_status_code = resp.status_code
             
             if resp.status_code == 200:
-                data = resp.json()
+                data = json_loads(resp.content)
                 if isinstance(data, list):
                     if verbose:
-                        logger.info(f"Tarefa {tarefa_id}: encontrado(s) {len(data)} responsável(is)")
-                    return data
+                        logger.info("Tarefa %s: encontrado(s) %s responsável(is)", tarefa_id, len(data))
+                    return _cache_set(tarefa_id, data)
                 if verbose:
-                    logger.warning(f"Tarefa {tarefa_id}: resposta não é lista. body={data}")
-                return []
+                    logger.warning("Tarefa %s: resposta não é lista. body=%s", tarefa_id, data)
+                return _cache_set(tarefa_id, [])
             elif resp.status_code == 500:
                 # Erro específico do servidor - não retry agressivo
                 if verbose:
-                    logger.warning(f"Tarefa {tarefa_id}: endpoint pode não existir ou tarefa inválida (HTTP 500)")
-                return []
+                    logger.warning("Tarefa %s: endpoint pode não existir ou tarefa inválida (HTTP 500)", tarefa_id)
+                return _cache_set(tarefa_id, [])
             elif resp.status_code == 404:
                 # Tarefa não encontrada ou sem responsáveis
                 if verbose:
-                    logger.info(f"Tarefa {tarefa_id}: não encontrada ou sem responsáveis (HTTP 404)")
-                return []
+                    logger.info("Tarefa %s: não encontrada ou sem responsáveis (HTTP 404)", tarefa_id)
+                return _cache_set(tarefa_id, [])
             else:
                 if verbose:
-                    logger.warning(f"Tarefa {tarefa_id}: erro HTTP {resp.status_code} - {resp.text[:180]}")
+                    logger.warning("Tarefa %s: erro HTTP %s - %s", tarefa_id, resp.status_code, resp.text[:180])
+        except GClickHTTPError as e:
+            # Circuit breaker aberto: sem retries/backoff e sem cache (não é resposta da API)
+            logger.warning("Tarefa %s: circuit breaker aberto, consulta ignorada (%s)", tarefa_id, e)
+            return []
         except (requests.Timeout, requests.ConnectionError) as e:
             if verbose:
-                logger.warning(f"Tarefa {tarefa_id}: timeout/erro conexão (tentativa {attempt}/{retries}) - {e}")
+                logger.warning("Tarefa %s: timeout/erro conexão (tentativa %s/%s) - %s", tarefa_id, attempt, retries, e)
         except requests.RequestException as e:
             if verbose:
-                logger.warning(f"Tarefa {tarefa_id}: erro na requisição (tentativa {attempt}/{retries}) - {e}")
+                logger.warning("Tarefa %s: erro na requisição (tentativa %s/%s) - %s", tarefa_id, attempt, retries, e)
 
         # Não retry em erros definitivos (500, 404)
         if last_status_code in [500, 404]:
@@ -69,7 +100,7 @@ def listar_responsaveis_tarefa(
             time.sleep(sleep_for)
 
     if verbose:
-        logger.error(f"Tarefa {tarefa_id}: falha após {attempt} tentativas (último status: {last_status_code})")
+        logger.error("Tarefa %s: falha após %s tentativas (último status: %s)", tarefa_id, attempt, last_status_code)
     return []
 
 def normalizar_responsavel(raw: Dict[str, Any]) -> Dict[str, Any]:
@@ -1,23 +1,56 @@
-import requests
-from typing import Dict, Any
-from .auth import get_access_token
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from azure_functions.shared_code.config.logging_config import setup_logger
 
 logger = setup_logger(__name__)
 
+# Header de auth reaproveitado enquanto o token não mudar; validade e refresh
+# (inclusive o forçado após 401/403) ficam com auth.get_access_token
+_HEADERS: Optional[Dict[str, str]] = None
+_HEADERS_TOKEN: Optional[str] = None
+
 def _headers() -> Dict[str, str]:
-    return {"Authorization": f"Bearer {get_access_token()}"}
+    global _HEADERS, _HEADERS_TOKEN
+    from .auth import get_access_token  # import tardio: evita custo no cold start
+    token = get_access_token()
+    if _HEADERS is None or token != _HEADERS_TOKEN:
+        _HEADERS = {"Authorization": f"Bearer {token}"}
+        _HEADERS_TOKEN = token
+    return _HEADERS
 
 def obter_tarefa_detalhes(task_id: str) -> Dict[str, Any]:
     """Obtém os detalhes de uma tarefa específica"""
+    # Session compartilhada (keep-alive + pool) atrás do circuit breaker da API
+    from .http import breaker_get
+
     url = f"https://api.gclick.com.br/tarefas/{task_id}"
-    resp = requests.get(url, headers=_headers(), timeout=40)
+    resp = breaker_get(url, headers=_headers(), timeout=40)
     if not resp.ok:
         raise RuntimeError(
             f"Erro {resp.status_code} GET {url} body={resp.text[:500]}"
         )
     return resp.json()
 
+def obter_tarefas_detalhes_batch(task_ids: List[str], max_workers: int = 16) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca detalhes de várias tarefas em paralelo (sobrepõe a latência de rede).
+    Retorna {task_id: detalhes}; tarefas cuja consulta falhou vêm como {}.
+    """
+    ids = list(dict.fromkeys(str(t) for t in task_ids))
+    if not ids:
+        return {}
+
+    def _buscar(task_id: str) -> Dict[str, Any]:
+        try:
+            return obter_tarefa_detalhes(task_id)
+        except Exception as e:
+            logger.warning("Falha ao obter detalhes da tarefa %s: %s", task_id, e)
+            return {}
+
+    workers = max(1, min(max_workers, len(ids)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(ids, executor.map(_buscar, ids)))
+
 def resumir_detalhes_para_card(task_data: Dict[str, Any]) -> str:
     """Formata os detalhes da tarefa para exibição no card do Teams"""
     # Campos chave para mostrar
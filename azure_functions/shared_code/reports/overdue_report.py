@@ -6,8 +6,6 @@ Utiliza pandas e openpyxl para criar relatórios profissionais.
 from __future__ import annotations
 import os
 import logging
-import shutil
-import tempfile
 from pathlib import Path
 from datetime import datetime, date
 from threading import Lock
@@ -15,6 +13,19 @@ from threading import Lock
 # Lock global para proteger operações de escrita de arquivo
 _reports_lock = Lock()
 
+# pandas é importado só quando um relatório é de fato gerado (cold start)
+_pd = None
+
+
+def _get_pd():
+    """Importa (uma única vez) pandas + openpyxl; levanta ImportError se ausentes."""
+    global _pd
+    if _pd is None:
+        import pandas as pd  # type: ignore
+        import openpyxl  # noqa: F401  # Requerido pelo pandas como engine xlsx, não usado diretamente
+        _pd = pd
+    return _pd
+
 def _resolve_reports_dir(base_dir: str | None = None) -> Path:
     """
     Resolve diretório persistente para relatórios:
@@ -65,13 +76,16 @@ def gerar_relatorio_excel_overdue(tarefas_atrasadas: list, output_dir: str | Non
     """
     try:
         # Import preguiçoso para não punir cold start quando não precisa
-        try:
-            import pandas as pd  # type: ignore
-            import openpyxl  # noqa: F401  # Requerido pelo pandas como engine xlsx, não usado diretamente
-        except ImportError as ie:
-            logging.warning("Dependências para relatórios Excel não instaladas: %s", ie)
-            logging.warning("Instale com: pip install pandas openpyxl")
-            return ""
+        # (lista vazia gera o relatório direto com openpyxl, sem pandas)
+        if tarefas_atrasadas:
+            try:
+                pd = _get_pd()
+            except ImportError as ie:
+                logging.warning("Dependências para relatórios Excel não instaladas: %s", ie)
+                logging.warning("Instale com: pip install pandas openpyxl")
+                return ""
+        import shutil
+        import tempfile
 
         out_dir = _resolve_reports_dir(output_dir)
         if hoje is None:
@@ -85,70 +99,66 @@ def gerar_relatorio_excel_overdue(tarefas_atrasadas: list, output_dir: str | Non
         with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp_file:
             temp_path = Path(tmp_file.name)
 
-            if not tarefas_atrasadas:
-                # Criar arquivo indicando que não há tarefas atrasadas
-                with pd.ExcelWriter(temp_path, engine="openpyxl") as writer:
-                    pd.DataFrame({
-                        "Mensagem": ["Nenhuma tarefa com atraso acima da política atual"],
-                        "Data_Verificacao": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                    }).to_excel(writer, sheet_name="Resumo", index=False)
-            else:
-                # Preparar dados das tarefas
-                linhas = _preparar_dados_excel(tarefas_atrasadas, hoje)
-                df = pd.DataFrame(linhas)
-            
+        if not tarefas_atrasadas:
+            # Arquivo indicando que não há tarefas atrasadas (ver _salvar_excel_sem_tarefas)
+            abas = None
+        else:
+            # Preparar dados das tarefas
+            df = _preparar_df_excel(tarefas_atrasadas, hoje)
+
             # Resumo por responsável
-            if not df.empty:
-                grp = df.groupby("Responsável", dropna=False)["ID"].count().sort_values(ascending=False)
-                df_resumo = grp.reset_index().rename(columns={"ID": "Total de Tarefas Atrasadas"})
-                
-                # Adicionar média de dias de atraso por responsável
-                if "Dias de Atraso" in df.columns:
-                    media_atraso = df.groupby("Responsável", dropna=False)["Dias de Atraso"].mean().round(1)
-                    df_resumo = df_resumo.merge(
-                        media_atraso.reset_index().rename(columns={"Dias de Atraso": "Média de Dias de Atraso"}),
-                        on="Responsável",
-                        how="left"
-                    )
+            # Total e média de dias de atraso por responsável num único groupby
+            df_resumo = (
+                df.groupby("Responsável", dropna=False)
+                .agg(**{
+                    "Total de Tarefas Atrasadas": ("ID", "count"),
+                    "Média de Dias de Atraso": ("Dias de Atraso", "mean"),
+                })
+                .round({"Média de Dias de Atraso": 1})
+                .sort_values("Total de Tarefas Atrasadas", ascending=False)
+                .reset_index()
+            )
+
+            # Aba de estatísticas gerais
+            stats = {
+                "Métrica": [
+                    "Total de tarefas atrasadas",
+                    "Média de dias de atraso",
+                    "Maior atraso (dias)",
+                    "Responsáveis únicos",
+                    "Data do relatório"
+                ],
+                "Valor": [
+                    len(df),
+                    df["Dias de Atraso"].mean() if "Dias de Atraso" in df.columns else 0,
+                    df["Dias de Atraso"].max() if "Dias de Atraso" in df.columns else 0,
+                    df["Responsável"].nunique(),
+                    data_str
+                ]
+            }
+
+            abas = [("Tarefas Atrasadas", df)]
+            if not df_resumo.empty:
+                abas.append(("Resumo por Responsável", df_resumo))
+            abas.append(("Estatísticas", pd.DataFrame(stats)))
+
+        try:
+            if abas is None:
+                _salvar_excel_sem_tarefas(temp_path)
             else:
-                df_resumo = pd.DataFrame()
-
-            # Salvar em arquivo Excel com múltiplas abas
-            with pd.ExcelWriter(arquivo_datado, engine="openpyxl") as writer:
-                # Aba principal com tarefas detalhadas
-                df.to_excel(writer, sheet_name="Tarefas Atrasadas", index=False)
-                
-                # Aba de resumo por responsável
-                if not df_resumo.empty:
-                    df_resumo.to_excel(writer, sheet_name="Resumo por Responsável", index=False)
-                
-                # Aba de estatísticas gerais
-                stats = {
-                    "Métrica": [
-                        "Total de tarefas atrasadas",
-                        "Média de dias de atraso",
-                        "Maior atraso (dias)",
-                        "Responsáveis únicos",
-                        "Data do relatório"
-                    ],
-                    "Valor": [
-                        len(df),
-                        df["Dias de Atraso"].mean() if "Dias de Atraso" in df.columns else 0,
-                        df["Dias de Atraso"].max() if "Dias de Atraso" in df.columns else 0,
-                        df["Responsável"].nunique(),
-                        data_str
-                    ]
-                }
-                pd.DataFrame(stats).to_excel(writer, sheet_name="Estatísticas", index=False)
+                _salvar_excel_write_only(temp_path, abas)
 
             # Atomic move para o destino final
             with _reports_lock:
                 shutil.move(str(temp_path), str(arquivo_datado))
                 try:
-                    # Criar cópia latest para facilitar acesso
-                    shutil.copy2(arquivo_datado, arquivo_latest)
+                    # Criar "latest" para facilitar acesso (hardlink, sem copiar bytes)
+                    _atualizar_latest(arquivo_datado, arquivo_latest)
                 except Exception as e:
                     logging.warning("[REPORT] Erro ao criar cópia latest (não crítico): %s", e)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
 
         logging.info("[REPORT] Relatório Excel gerado: %s", arquivo_datado)
         return str(arquivo_datado)
@@ -158,6 +168,108 @@ def gerar_relatorio_excel_overdue(tarefas_atrasadas: list, output_dir: str | Non
         return ""
 
 
+def _atualizar_latest(origem: Path, destino: Path) -> None:
+    """
+    Aponta `destino` para o mesmo conteúdo de `origem` via hardlink, trocado
+    atomicamente com os.replace. Se o filesystem não suportar hardlinks,
+    recorre a shutil.copy2.
+    """
+    tmp_link = destino.with_name(destino.name + ".tmp")
+    try:
+        if tmp_link.exists():
+            tmp_link.unlink()
+        os.link(origem, tmp_link)
+        os.replace(tmp_link, destino)
+    except OSError:
+        import shutil
+
+        if tmp_link.exists():
+            tmp_link.unlink()
+        shutil.copy2(origem, destino)
+
+
+def _salvar_excel_write_only(caminho: Path, abas: list) -> None:
+    """
+    Grava as abas (titulo, DataFrame) com openpyxl em modo write-only.
+    Evita o caminho célula-a-célula do ExcelWriter do pandas.
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    for titulo, df in abas:
+        ws = wb.create_sheet(title=titulo)
+        ws.append(list(df.columns))
+        # NaN/NaT viram células vazias, como no to_excel; só as colunas que
+        # têm ausentes são convertidas para object (o resto segue sem cópia)
+        valores = df
+        com_ausentes = df.columns[df.isna().any()]
+        if len(com_ausentes):
+            valores = df.copy(deep=False)
+            for col in com_ausentes:
+                valores[col] = df[col].astype(object).where(df[col].notna(), None)
+        # itertuples(name=None) entrega tuplas cruas, sem montar uma Series por linha
+        for row in valores.itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(caminho)
+
+
+def _salvar_excel_sem_tarefas(caminho: Path) -> None:
+    """Grava o relatório de "nenhuma tarefa atrasada" só com openpyxl (sem pandas)."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title="Resumo")
+    ws.append(["Mensagem", "Data_Verificacao"])
+    ws.append([
+        "Nenhuma tarefa com atraso acima da política atual",
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    ])
+    wb.save(caminho)
+
+
+def _preparar_df_excel(tarefas_atrasadas: list, hoje: date):
+    """
+    Versão vetorizada de _preparar_dados_excel: monta o DataFrame do relatório
+    coluna a coluna, com o parse de datas feito de uma vez pelo pandas.
+    """
+    pd = _get_pd()
+    bruto = pd.DataFrame.from_records(tarefas_atrasadas)
+    indice = bruto.index
+
+    def coluna(nome: str):
+        if nome in bruto.columns:
+            return bruto[nome].astype(object)
+        return pd.Series([None] * len(indice), index=indice, dtype=object)
+
+    def primeiro(*colunas, padrao):
+        # Equivalente a `a or b or padrao` por linha (NaN de chave ausente conta como vazio)
+        resultado = pd.Series([padrao] * len(indice), index=indice, dtype=object)
+        for col in reversed(colunas):
+            preenchido = col.map(lambda v: v == v and bool(v))
+            resultado = col.where(preenchido, resultado)
+        return resultado
+
+    def nome_se_dict(col):
+        return col.map(lambda v: v.get("nome") if isinstance(v, dict) else v)
+
+    vencimento = primeiro(coluna("dataVencimento"), padrao="")
+    datas = pd.to_datetime(vencimento, format="%Y-%m-%d", errors="coerce", cache=True)
+    dias_atraso = (pd.Timestamp(hoje) - datas).dt.days.astype("Int64")
+
+    return pd.DataFrame({
+        "ID": coluna("id"),
+        "Nome da Tarefa": primeiro(coluna("nome"), coluna("titulo"), padrao="Sem nome"),
+        "Descrição": coluna("descricao").fillna(""),
+        "Data Vencimento": vencimento,
+        "Dias de Atraso": dias_atraso,
+        "Responsável": primeiro(nome_se_dict(coluna("responsavel")), padrao="Não informado"),
+        "Departamento": primeiro(coluna("departamento"), padrao="N/A"),
+        "Categoria": primeiro(nome_se_dict(coluna("categoria")), padrao="N/A"),
+        "Prioridade": primeiro(coluna("prioridade"), padrao="N/A"),
+        "Status": primeiro(coluna("status"), coluna("_statusLabel"), padrao=""),
+    }, index=indice)
+
+
 def _preparar_dados_excel(tarefas_atrasadas: list, hoje: date) -> list:
     """
     Prepara dados das tarefas para exportação Excel.
@@ -1,17 +1,141 @@
 import os
 import json
+import atexit
+import hashlib
+import base64
 import logging
-from typing import Optional, Union
+import threading
+import time
+import asyncio
+import concurrent.futures
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from botbuilder.core import TurnContext
-from botbuilder.schema import Activity, ConversationReference, Attachment
-from botframework.connector.auth import MicrosoftAppCredentials
+# botbuilder/botframework são importados dentro dos métodos que os usam: pesam
+# no cold start e ConversationReferenceStorage (load/save) não depende deles
+if TYPE_CHECKING:  # pragma: no cover
+    from botbuilder.core import TurnContext
 
 # REMOVIDO: from teams.user_mapping import mapear_apelido_para_teams_id
 # (import não usado neste arquivo)
 
+# (De)serialização JSON: orjson quando disponível (C, bytes direto), senão stdlib
+try:
+    import orjson  # type: ignore
+
+    def _json_loads(raw):
+        return orjson.loads(raw)
+
+    def _json_dumps(obj) -> bytes:
+        # OPT_NON_STR_KEYS: chaves não-str viram str, como no json da stdlib
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:  # pragma: no cover - fallback sem orjson
+    def _json_loads(raw):
+        return json.loads(raw)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _dump_references(fh, refs: dict) -> None:
+    """Grava o dict de referências no arquivo entrada a entrada, sem montar o JSON inteiro em memória."""
+    fh.write(b"{")
+    # Snapshot das entradas: mutações concorrentes não invalidam a iteração
+    for i, (user_id, data) in enumerate(list(refs.items())):
+        if i:
+            fh.write(b",")
+        fh.write(_json_dumps(str(user_id)))
+        fh.write(b":")
+        fh.write(_json_dumps(data))
+    fh.write(b"}")
+
+# Envios simultâneos em broadcast(): o gargalo é o RTT até o Bot Framework
+BROADCAST_CONCORRENCIA = int(os.getenv("BOT_BROADCAST_CONCURRENCY", "32"))
+
+# Alterações no storage são agrupadas (debounce) e gravadas por uma thread de
+# timer, fora do event loop que tratou o turno; pendências vão ao disco no encerramento
+SAVE_DEBOUNCE_SECONDS = float(os.getenv("CONVREF_SAVE_DEBOUNCE", "0.5"))
+
+# Referências sem nenhuma atividade (armazenamento ou envio) há mais de N dias
+# são descartadas no save(); cada envio renova o prazo. 0 desativa a expiração
+CONVREF_TTL_DAYS = int(os.getenv("CONVREF_TTL_DAYS", "90"))
+
+# Backend remoto (CONVREF_BACKEND=table): usuário ausente no Table Storage não é
+# consultado de novo por N segundos (evita um GET por envio a quem não tem
+# referência). Falha na carga inicial é retentada e, persistindo, propagada
+CONVREF_MISS_TTL_SECONDS = float(os.getenv("CONVREF_MISS_TTL", "60"))
+CONVREF_LOAD_ATTEMPTS = int(os.getenv("CONVREF_LOAD_ATTEMPTS", "3"))
+
+# Opcional: reenvio do mesmo cartão ao mesmo usuário dentro desta janela (segundos)
+# é suprimido sem chamada HTTPS (send_message devolve None). Desligado por padrão
+# (0): reenvios intencionais (repetir_no_mesmo_dia, TEST_MODE, retries manuais)
+# precisam sair de fato. Respostas só de texto não passam pelo filtro
+SEND_DEDUP_SECONDS = float(os.getenv("BOT_SEND_DEDUP_SECONDS", "0"))
+
+ADAPTIVE_CARD_CONTENT_TYPE = "application/vnd.microsoft.card.adaptive"
+
+
+# Loop asyncio de longa duração numa thread daemon: chamadas síncronas
+# (send_direct_message) submetem corrotinas sem criar/derrubar um loop por envio
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _bg_loop
+    if _bg_loop is None:
+        with _bg_loop_lock:
+            if _bg_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="BotSenderLoop", daemon=True).start()
+                _bg_loop = loop
+    return _bg_loop
+
+
+def _ultimo_uso(ref) -> Optional[str]:
+    """Timestamp ISO mais recente da referência (stored_at/last_activity); None se não houver."""
+    if not isinstance(ref, dict):
+        return None
+    marcas = (ref.get("stored_at"), (ref.get("last_activity") or {}).get("timestamp"))
+    return max((m for m in marcas if isinstance(m, str)), default=None)
+
+
+# trust_service_url confia na URL por tempo limitado (1 dia no botframework):
+# cada service_url é reconfirmada periodicamente, não a cada envio
+_TRUST_REFRESH_SECONDS = 3600.0
+_trusted_service_urls = {}  # service_url -> próxima reconfirmação (monotonic)
+
+
+def _trust_service_url(service_url: Optional[str]) -> None:
+    if not service_url:
+        return
+    agora = time.monotonic()
+    if _trusted_service_urls.get(service_url, 0.0) > agora:
+        return
+    from botframework.connector.auth import MicrosoftAppCredentials
+
+    MicrosoftAppCredentials.trust_service_url(service_url)
+    _trusted_service_urls[service_url] = agora + _TRUST_REFRESH_SECONDS
+
+
+# Conversão de card_json por tipo exato: lookup direto, sem cadeia de isinstance
+_CARD_PARSERS = {
+    str: _json_loads,
+    bytes: _json_loads,
+    dict: lambda card: card,
+}
+
+
+def _card_to_dict(card_json) -> dict:
+    """Converte card_json (str, bytes ou dict) em dict; JSON é parseado aqui, uma única vez."""
+    parser = _CARD_PARSERS.get(type(card_json))
+    if parser is not None:
+        return parser(card_json)
+    if isinstance(card_json, dict):  # subclasses (OrderedDict etc.)
+        return card_json
+    raise TypeError("card_json must be str, bytes or dict")
+
 class BotSender:
     """
     Gerenciador de mensagens proativas para o Bot Framework.
@@ -31,6 +155,8 @@ class BotSender:
         self.app_id = app_id
         self.conversation_storage = conversation_storage  # Storage object, não dict
         self.logger = logging.getLogger("BotSender")
+        self._send_dedup = {}  # (user_id, hash do conteúdo) -> expiração (monotonic)
+        self._send_dedup_lock = threading.Lock()  # broadcasts enviam em paralelo
         
         # Validações robustas no construtor
         if not self.adapter:
@@ -47,7 +173,7 @@ class BotSender:
         else:
             self.logger.warning("⚠️ ConversationReferenceStorage não fornecido - funcionalidade limitada")
     
-    async def send_message(self, user_id: str, message: str, card_json: Optional[Union[str, dict]] = None) -> bool:
+    async def send_message(self, user_id: str, message: str, card_json: Optional[Union[str, dict]] = None) -> Optional[bool]:
         """
         Envia mensagem proativa para um usuário específico.
         
@@ -57,7 +183,8 @@ class BotSender:
             card_json: JSON de um Adaptive Card (opcional)
             
         Returns:
-            bool: True se enviado com sucesso, False caso contrário
+            Optional[bool]: True se enviado com sucesso, False em caso de falha e
+            None se suprimido pelo dedup (BOT_SEND_DEDUP_SECONDS): nada foi enviado
         """
         # Se estivermos em TEST_MODE, forçar todas as mensagens para o TEST_USER_TEAMS_ID
         test_mode = os.environ.get('TEST_MODE', 'false').lower() in ('1', 'true', 'yes')
@@ -69,121 +196,245 @@ class BotSender:
 
         # Verificar se conversation_storage está disponível
         if not self.conversation_storage:
-            self.logger.warning(f"ConversationStorage não configurado - não é possível enviar para {user_id}")
+            self.logger.warning("ConversationStorage não configurado - não é possível enviar para %s", user_id)
             return False
             
-        # Usa o storage em tempo real, não uma cópia
-        cref_data = self.conversation_storage.get(user_id)
-        if not cref_data:
-            self.logger.warning(f"Nenhuma referência para user_id={user_id}")
-            return False
-        
-        # Reconstrói ConversationReference a partir dos dados salvos
+        # Usa o storage em tempo real, não uma cópia (desserialização cacheada)
         try:
-            if isinstance(cref_data, dict):
-                cref = ConversationReference().deserialize(cref_data)
-            else:
-                cref = cref_data  # Já é ConversationReference
+            cref = self.conversation_storage.get_cref(user_id)
         except Exception as e:
-            self.logger.error(f"Erro ao deserializar referência para {user_id}: {e}")
+            self.logger.error("Erro ao deserializar referência para %s: %s", user_id, e)
+            return False
+        if cref is None:
+            self.logger.warning("Nenhuma referência para user_id=%s", user_id)
             return False
             
+        # Cartão convertido para dict uma única vez, fora do callback
+        card_data = None
+        if card_json:
+            try:
+                card_data = _card_to_dict(card_json)
+            except (TypeError, ValueError) as e:
+                self.logger.error("Erro ao parsear JSON do cartão: %s", e)
+
+        dedup_key = self._dedup_key(user_id, message, card_data)
+        if dedup_key is not None and self._envio_recente(dedup_key):
+            self.logger.info("Envio duplicado suprimido para %s (mesmo conteúdo há menos de %ss)", user_id, SEND_DEDUP_SECONDS)
+            return None
+
+        from botbuilder.schema import Activity, Attachment
+
+        # Attachment montado uma vez por envio, fora do callback. A Activity
+        # continua nova a cada envio: send_activity a completa com os dados da conversa
+        card_attachment = None
+        if card_data:
+            card_attachment = Attachment(content_type=ADAPTIVE_CARD_CONTENT_TYPE, content=card_data)
+
         try:
             # Trust service URL para evitar erros de autenticação
-            MicrosoftAppCredentials.trust_service_url(cref.service_url)
+            _trust_service_url(cref.service_url)
             
             # Define callback que será executado no contexto da conversa
-            async def _send_callback(turn_context: TurnContext):
+            async def _send_callback(turn_context: "TurnContext"):
                 resp = None
-                if card_json:
-                    # Envio como cartão adaptativo (tolerante a str ou dict)
+                if card_attachment is not None:
+                    # Envio como cartão adaptativo
                     try:
-                        if isinstance(card_json, str):
-                            card_data = json.loads(card_json)
-                        elif isinstance(card_json, dict):
-                            card_data = card_json
-                        else:
-                            raise TypeError("card_json must be str or dict")
-
-                        card_attachment = Attachment(
-                            content_type="application/vnd.microsoft.card.adaptive",
-                            content=card_data
-                        )
                         activity = Activity(
                             type="message",
                             text=message,  # fallback
                             attachments=[card_attachment]
                         )
                         resp = await turn_context.send_activity(activity)
-                        self.logger.info("Cartão adaptativo enviado para %s id=%s", user_id, getattr(resp, 'id', None))
+                        self.logger.debug("Cartão adaptativo enviado para %s id=%s", user_id, getattr(resp, 'id', None))
                     except Exception as e:
                         self.logger.error("Erro ao enviar cartão: %s", e)
                         resp = await turn_context.send_activity(message)  # fallback de texto
                 else:
                     resp = await turn_context.send_activity(message)
 
-                # Tentar gravar o id da activity no conversation_storage se disponível (para cards e textos)
+                # Registrar o id da activity enviada (para cards e textos) sem regravar o arquivo inteiro
                 try:
-                    if resp and getattr(resp, 'id', None) and getattr(self, 'conversation_storage', None):
-                        try:
-                            existing = self.conversation_storage.references.get(user_id, {})
-                        except Exception:
-                            existing = {}
-                        if isinstance(existing, dict):
-                            existing.setdefault('last_activity', {})
-                            existing['last_activity']['id'] = resp.id
-                            existing['last_activity']['timestamp'] = datetime.utcnow().isoformat()
-                            # gravar de volta e persistir
-                            self.conversation_storage.references[user_id] = existing
-                            try:
-                                self.conversation_storage.save()
-                            except Exception:
-                                self.logger.debug("Falha ao salvar conversation_storage após atualizar last_activity", exc_info=True)
+                    if resp and getattr(resp, 'id', None):
+                        self.conversation_storage.record_last_activity(user_id, resp.id)
                 except Exception:
-                    self.logger.debug("Falha ao atualizar last_activity no conversation_storage", exc_info=True)
+                    # Não obrigar a persistência se falhar, mas não esconder a falha
+                    self.logger.warning("Falha ao atualizar last_activity de %s no conversation_storage", user_id, exc_info=True)
                 
             # Continua a conversa usando a referência armazenada
             await self.adapter.continue_conversation(cref, _send_callback, self.app_id)
-            self.logger.info(f"Mensagem enviada com sucesso para user_id={user_id}")
+            self.logger.info("Mensagem enviada com sucesso para user_id=%s", user_id)
+            if dedup_key is not None:
+                self._registrar_envio(dedup_key)
             return True
         except Exception as e:
-            self.logger.error(f"Falha ao enviar mensagem para user_id={user_id}: {e}", exc_info=True)
+            self.logger.error("Falha ao enviar mensagem para user_id=%s: %s", user_id, e, exc_info=True)
             return False
     
-    async def send_card(self, user_id: str, card_json: str, fallback_message: str = "Notificação do G-Click") -> bool:
+    @staticmethod
+    def _dedup_key(user_id: str, message: str, card_data: Optional[dict]):
+        """Chave (user_id, hash do texto + cartão) para suprimir reenvios idênticos de cartões."""
+        if SEND_DEDUP_SECONDS <= 0 or card_data is None:
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        h.update((message or "").encode("utf-8"))
+        h.update(b"\0")
+        h.update(_json_dumps(card_data))
+        return (user_id, h.hexdigest())
+
+    def _envio_recente(self, key) -> bool:
+        with self._send_dedup_lock:
+            return self._send_dedup.get(key, 0.0) > time.monotonic()
+
+    def _registrar_envio(self, key) -> None:
+        with self._send_dedup_lock:
+            agora = time.monotonic()
+            if len(self._send_dedup) >= 1024:
+                # Poda ocasional das entradas já expiradas
+                self._send_dedup = {k: exp for k, exp in self._send_dedup.items() if exp > agora}
+            self._send_dedup[key] = agora + SEND_DEDUP_SECONDS
+
+    async def send_card(self, user_id: str, card_json: Union[str, dict], fallback_message: str = "Notificação do G-Click") -> Optional[bool]:
         """
         Envia um cartão adaptativo para um usuário específico.
         
         Args:
             user_id: ID do usuário no Teams
-            card_json: JSON do Adaptive Card
+            card_json: Adaptive Card (JSON em str ou dict já parseado)
             fallback_message: Mensagem de fallback caso o cartão não seja suportado
             
         Returns:
-            bool: True se enviado com sucesso, False caso contrário
+            Optional[bool]: como send_message (None = suprimido pelo dedup)
         """
         return await self.send_message(user_id, fallback_message, card_json)
 
-    def send_direct_message(self, activity_body: dict, text: str) -> None:
-        """Apenas um wrapper síncrono para enviar resposta direta ao autor da activity."""
+    async def broadcast(self, user_ids: Iterable[str], message: str, card_json=None,
+                        concurrency: Optional[int] = None) -> List[Union[Optional[bool], BaseException]]:
+        """
+        Envia a mesma mensagem/cartão para vários usuários em paralelo.
+
+        Os envios são sobrepostos com asyncio.gather, limitados por um semáforo
+        (BROADCAST_CONCORRENCIA por padrão) para não saturar o conector.
+
+        Returns:
+            Lista na mesma ordem de user_ids com o resultado de send_message
+            (ou a exceção levantada para aquele usuário).
+        """
+        if card_json:
+            # Parse único para todos os destinatários
+            card_json = _card_to_dict(card_json)
+        user_ids = list(user_ids)
+        self._trust_service_urls(user_ids)
+        sem = asyncio.Semaphore(concurrency or BROADCAST_CONCORRENCIA)
+
+        async def _one(uid: str):
+            async with sem:
+                return await self.send_message(uid, message, card_json)
+
+        return await asyncio.gather(*(_one(uid) for uid in user_ids), return_exceptions=True)
+
+    def _trust_service_urls(self, user_ids: Iterable[str]) -> None:
+        """Confia em cada service_url distinto dos destinatários uma única vez."""
+        if not self.conversation_storage:
+            return
+        urls = set()
+        for uid in user_ids:
+            try:
+                cref = self.conversation_storage.get_cref(uid)
+            except Exception:
+                continue  # send_message registra o erro deste usuário
+            if cref is not None and getattr(cref, "service_url", None):
+                urls.add(cref.service_url)
+        for url in urls:
+            _trust_service_url(url)
+
+    def send_direct_message(self, activity_body: dict, text: str) -> Optional[concurrent.futures.Future]:
+        """
+        Wrapper síncrono para enviar resposta direta ao autor da activity.
+
+        Não bloqueia o chamador: fora de um event loop o envio é submetido ao
+        loop de fundo e o Future retornado pode ser aguardado opcionalmente.
+        """
         try:
             user_id = (activity_body or {}).get("from", {}).get("id")
             if not user_id:
                 self.logger.warning("send_direct_message: from.id ausente no payload")
-                return
-            
-            # Enviar de forma segura em qualquer thread
+                return None
+
             try:
-                import asyncio
-                try:
-                    loop = asyncio.get_running_loop()
-                    loop.create_task(self.send_message(user_id, text))
-                except RuntimeError:
-                    asyncio.run(self.send_message(user_id, text))
-            except Exception as e:
-                self.logger.error(f"send_direct_message falhou: {e}", exc_info=True)
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run_coroutine_threadsafe(
+                    self.send_message(user_id, text), _get_background_loop()
+                )
+            loop.create_task(self.send_message(user_id, text))
+            return None
         except Exception as e:
-            self.logger.error(f"send_direct_message falhou: {e}", exc_info=True)
+            self.logger.error("send_direct_message falhou: %s", e, exc_info=True)
+            return None
+
+class AzureTableReferenceStore:
+    """
+    Backend de referências em Azure Table Storage: uma entidade por usuário,
+    com upsert/delete individuais em vez de regravar o arquivo inteiro.
+    Compartilhado entre instâncias da Function App (o disco local é efêmero).
+    Requer o pacote opcional azure-data-tables.
+    """
+
+    def __init__(self, connection_string: str, table_name: str = "ConversationReferences",
+                 partition_key: str = "refs"):
+        from azure.data.tables import TableServiceClient
+
+        service = TableServiceClient.from_connection_string(connection_string)
+        self._table = service.create_table_if_not_exists(table_name)
+        self._partition_key = partition_key
+
+    @staticmethod
+    def _row_key(user_id: str) -> str:
+        # RowKey não aceita '/', '\\', '#', '?': codifica o id do Teams
+        return base64.urlsafe_b64encode(user_id.encode("utf-8")).decode("ascii")
+
+    def load_all(self) -> dict:
+        entidades = self._table.query_entities("PartitionKey eq @pk", parameters={"pk": self._partition_key})
+        return {e["UserId"]: _json_loads(e["Data"]) for e in entidades}
+
+    def get(self, user_id: str) -> Optional[dict]:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            entidade = self._table.get_entity(self._partition_key, self._row_key(user_id))
+        except ResourceNotFoundError:
+            return None
+        return _json_loads(entidade["Data"])
+
+    def upsert(self, user_id: str, data) -> None:
+        self._table.upsert_entity({
+            "PartitionKey": self._partition_key,
+            "RowKey": self._row_key(user_id),
+            "UserId": user_id,
+            "Data": _json_dumps(data).decode("utf-8"),
+        })
+
+    def delete(self, user_id: str) -> None:
+        self._table.delete_entity(self._partition_key, self._row_key(user_id))
+
+
+def _criar_backend_referencias():
+    """Backend remoto opcional (CONVREF_BACKEND=table); None mantém o arquivo JSON local."""
+    if os.getenv("CONVREF_BACKEND", "file").lower() != "table":
+        return None
+    conn = os.getenv("CONVREF_TABLE_CONNECTION_STRING") or os.getenv("AzureWebJobsStorage")
+    if not conn:
+        logging.warning("CONVREF_BACKEND=table sem connection string - usando arquivo local")
+        return None
+    try:
+        return AzureTableReferenceStore(conn, os.getenv("CONVREF_TABLE_NAME", "ConversationReferences"))
+    except ImportError:
+        logging.warning("azure-data-tables não instalado - usando arquivo local para referências")
+    except Exception as e:
+        logging.error("Falha ao conectar no Azure Table Storage (%s) - usando arquivo local", e)
+    return None
+
 
 class ConversationReferenceStorage:
     """Armazenamento persistente para referências de conversação."""
@@ -194,92 +445,193 @@ class ConversationReferenceStorage:
             project_root = Path(__file__).parent.parent
             file_path = project_root / "storage" / "conversation_references.json"
         self.file_path = file_path
+        self._dirty = 0
+        self._dirty_keys = set()  # user_ids pendentes (backend por chave)
+        self._backend = _criar_backend_referencias()
+        self._save_timer = None
+        self._timer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._deser_cache = {}
+        self._cref_dict_cache = {}  # v2.0 -> dict no formato antigo, montado uma vez
+        self._misses = {}  # user_id -> instante (monotonic) até o qual a ausência no backend vale
+        atexit.register(self.flush)
         self.logger = logging.getLogger("ConversationReferenceStorage")
         self.logger.info("🗂️  Inicializando storage em: %s", self.file_path)
-        self.references = self._load()
-        self.logger.info("🗂️  Storage inicializado com %d referências", len(self.references))
-        
+        self._load_lock = threading.Lock()
+        self._references = None
+
+    @property
+    def references(self) -> dict:
+        """Referências, carregadas no primeiro acesso: o cold start não paga o parse do arquivo."""
+        refs = self._references
+        if refs is None:
+            with self._load_lock:
+                if self._references is None:
+                    self._references = self._load()
+                refs = self._references
+        return refs
+
+    @references.setter
+    def references(self, value: dict) -> None:
+        self._references = value
+        self._deser_cache.clear()
+        self._cref_dict_cache.clear()
+
+    def _invalidar_caches(self, user_id: str) -> None:
+        """Descarta as formas derivadas (cref desserializada, dict antigo) de um usuário."""
+        self._deser_cache.pop(user_id, None)
+        self._cref_dict_cache.pop(user_id, None)
+
     def _load(self):
-        """Carrega referências do arquivo."""
+        """Carrega referências do backend configurado ou do arquivo."""
+        if self._backend is not None:
+            # Sem fallback para {}: um storage "vazio" faria todos os envios falharem
+            # em silêncio. Se as tentativas se esgotarem, o erro sobe e o próximo
+            # acesso a `references` tenta carregar de novo
+            tentativas = max(1, CONVREF_LOAD_ATTEMPTS)
+            for i in range(tentativas):
+                try:
+                    data = self._backend.load_all()
+                    self.logger.info("🗂️  Carregadas %d referências do Azure Table Storage", len(data))
+                    return data
+                except Exception as e:
+                    self.logger.error("💥 Erro ao carregar referências do Table Storage (tentativa %d/%d): %s",
+                                      i + 1, tentativas, e)
+                    if i + 1 == tentativas:
+                        raise
+                    time.sleep(0.5 * 2 ** i)
         path = Path(self.file_path)
         self.logger.info("🗂️  Tentando carregar de: %s (existe: %s)", path, path.exists())
+        data = {}
         if path.exists():
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = _json_loads(path.read_bytes())
                 self.logger.info("🗂️  Carregadas %d referências do arquivo", len(data))
-                return data
             except Exception as e:
                 self.logger.error("💥 Erro ao carregar referências: %s", e)
         else:
             self.logger.info("🗂️  Arquivo não existe, inicializando storage vazio")
-        return {}
+        self._aplicar_log_atividades(data)
+        return data
         
     def save(self):
+        """Grava imediatamente todas as referências (uma gravação por vez)."""
+        with self._write_lock:
+            self._dirty = 0
+            self._gc()
+            if self._backend is None:
+                self._write()
+                return
+            # Backend por chave: grava só os usuários alterados (ausentes = removidos)
+            alterados, self._dirty_keys = self._dirty_keys, set()
+            for user_id in alterados:
+                ref = self.references.get(user_id)
+                try:
+                    if ref is None:
+                        self._backend.delete(user_id)
+                    else:
+                        self._backend.upsert(user_id, ref)
+                except Exception as e:
+                    self.logger.error("💥 Erro ao persistir referência de %s: %s", user_id, e)
+                    self._dirty_keys.add(user_id)
+                    self._dirty += 1
+
+    def _gc(self) -> int:
+        """Remove referências expiradas (ver CONVREF_TTL_DAYS); retorna quantas saíram."""
+        if CONVREF_TTL_DAYS <= 0:
+            return 0
+        limite = (datetime.utcnow() - timedelta(days=CONVREF_TTL_DAYS)).isoformat()
+        refs = self.references
+        expirados = [uid for uid, ref in list(refs.items()) if (_ultimo_uso(ref) or limite) < limite]
+        for user_id in expirados:
+            refs.pop(user_id, None)
+            self._invalidar_caches(user_id)
+            self._dirty_keys.add(user_id)  # backend por chave: vira delete
+        if expirados:
+            self.logger.info("Removidas %d referências sem atividade há mais de %d dias", len(expirados), CONVREF_TTL_DAYS)
+        return len(expirados)
+
+    def _activity_log_path(self) -> Path:
+        return Path(self.file_path).with_suffix('.log')
+
+    def _aplicar_log_atividades(self, refs: dict) -> None:
+        """Aplica sobre refs as atualizações de last_activity registradas após o último snapshot."""
+        log_path = self._activity_log_path()
+        if not log_path.exists():
+            return
+        try:
+            with open(log_path, "rb") as fh:
+                for linha in fh:
+                    try:
+                        entrada = _json_loads(linha)
+                    except ValueError:
+                        continue  # linha truncada por queda no meio do append
+                    ref = refs.get(entrada.get("user_id"))
+                    if isinstance(ref, dict):
+                        ref.setdefault('last_activity', {}).update(id=entrada.get("id"), timestamp=entrada.get("ts"))
+        except OSError as e:
+            self.logger.error("Erro ao ler log de last_activity: %s", e)
+
+    def record_last_activity(self, user_id: str, activity_id: str) -> None:
+        """
+        Registra o id da última activity enviada ao usuário.
+
+        Com arquivo, a atualização vira uma linha num log append-only em vez de
+        regravar todas as referências; o próximo snapshot (save) o consolida.
+        """
+        existing = self.references.get(user_id)
+        if not isinstance(existing, dict):
+            return
+        now_iso = datetime.utcnow().isoformat()
+        if self._backend is not None:
+            # Backend por chave: upsert agrupado apenas deste usuário
+            existing.setdefault('last_activity', {}).update(id=activity_id, timestamp=now_iso)
+            self.mark_dirty(user_id)
+            return
+        linha = _json_dumps({"user_id": user_id, "id": activity_id, "ts": now_iso}) + b"\n"
+        # Mesmo lock do save(): a linha entra no log antes do snapshot ou depois de ele limpar o log
+        with self._write_lock:
+            existing.setdefault('last_activity', {}).update(id=activity_id, timestamp=now_iso)
+            try:
+                with open(self._activity_log_path(), "ab") as fh:
+                    fh.write(linha)
+                return
+            except OSError as e:
+                self.logger.warning("Falha ao gravar log de last_activity (%s); agendando snapshot", e)
+        self.mark_dirty(user_id)
+
+    def _write(self):
         """Salva referências no arquivo com serialização correta e tratamento de erro robusto."""
         path = Path(self.file_path)
-        self.logger.info("💾 Salvando %d referências em: %s", len(self.references), path)
+        self.logger.debug("Salvando %d referências em: %s", len(self.references), path)
         
         try:
             # Garantir que o diretório pai existe
             os.makedirs(path.parent, exist_ok=True)
             
-            # Serializa ConversationReference objects para dict antes de salvar
-            serializable_refs = {}
-            for user_id, cref in self.references.items():
-                try:
-                    if hasattr(cref, 'serialize') and callable(getattr(cref, 'serialize')):
-                        # É um ConversationReference object com método serialize
-                        serializable_refs[user_id] = cref.serialize()
-                        self.logger.debug("🔄 Serializado ConversationReference para user_id=%s", user_id)
-                    elif isinstance(cref, dict):
-                        # Já é um dict - verificar se é válido
-                        serializable_refs[user_id] = cref
-                        self.logger.debug("📋 Dict mantido para user_id=%s", user_id)
-                    else:
-                        # Tipo desconhecido - tentar converter para dict
-                        self.logger.warning("⚠️ Tipo não reconhecido para user_id=%s: %s", user_id, type(cref))
-                        serializable_refs[user_id] = dict(cref) if hasattr(cref, '__dict__') else str(cref)
-                except Exception as serialize_err:
-                    self.logger.error("💥 Erro ao serializar user_id=%s: %s", user_id, serialize_err)
-                    # Pular este item em vez de falhar completamente
-                    continue
-                    
-            # Salvar com backup se arquivo já existe
-            backup_path = None
-            if path.exists():
-                backup_path = path.with_suffix('.json.backup')
+            # Referências já são armazenadas serializadas (ver add())
+            serializable_refs = self.references
+
+            # Grava em arquivo temporário e troca atomicamente pelo original:
+            # uma falha no meio da escrita nunca deixa o arquivo principal truncado
+            tmp_path = path.with_suffix('.json.tmp')
+            try:
+                with open(tmp_path, "wb") as fh:
+                    _dump_references(fh, serializable_refs)
+                os.replace(tmp_path, path)
+                # Snapshot já contém as atualizações de last_activity do log
+                self._activity_log_path().unlink(missing_ok=True)
+            except Exception:
                 try:
-                    import shutil
-                    shutil.copy2(path, backup_path)
-                    self.logger.debug("📋 Backup criado: %s", backup_path)
-                except Exception as backup_err:
-                    self.logger.warning("⚠️ Falha ao criar backup: %s", backup_err)
-            
-            # Salvar arquivo principal
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(serializable_refs, f, indent=2, ensure_ascii=False, default=str)
-                
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+                raise
+
             self.logger.info("✅ Referências salvas: %d entries em %s", len(serializable_refs), self.file_path)
-            
-            # Remover backup se salvamento foi bem-sucedido
-            if backup_path and backup_path.exists():
-                try:
-                    backup_path.unlink()
-                    self.logger.debug("🗑️ Backup removido após salvamento bem-sucedido")
-                except Exception:
-                    pass  # Não é crítico se falhar
-                    
+
         except Exception as e:
             self.logger.error("💥 Erro crítico ao salvar referências: %s", e, exc_info=True)
-            # Se falhou mas existe backup, tentar restaurar
-            if backup_path and backup_path.exists():
-                try:
-                    import shutil
-                    shutil.copy2(backup_path, path)
-                    self.logger.info("🔄 Backup restaurado após falha no salvamento")
-                except Exception as restore_err:
-                    self.logger.error("💥 Falha também na restauração do backup: %s", restore_err)
             
     def store_conversation_reference(self, user_id: str, conversation_data: dict = None, **kwargs):
         """
@@ -290,14 +642,16 @@ class ConversationReferenceStorage:
             conversation_data: Dados estruturados da conversa (nova API)
             **kwargs: Compatibilidade com API antiga (conversation_id, service_url, etc.)
         """
-        self.logger.info("💾 store_conversation_reference chamado para user_id=%s", user_id)
+        self.logger.debug("store_conversation_reference chamado para user_id=%s", user_id)
+        # Um único timestamp para stored_at e last_activity desta chamada
+        now_iso = datetime.utcnow().isoformat()
         try:
             if conversation_data:
                 # Nova API: dados estruturados
                 reference_data = {
                     "user_id": user_id,
                     "conversation_data": conversation_data,
-                    "stored_at": datetime.utcnow().isoformat(),
+                    "stored_at": now_iso,
                     "version": "2.0"
                 }
             else:
@@ -307,7 +661,7 @@ class ConversationReferenceStorage:
                 activity_data = kwargs.get("activity_data", {})
                 
                 if not conversation_id:
-                    logging.warning(f"conversation_id ausente para user_id={user_id}")
+                    logging.warning("conversation_id ausente para user_id=%s", user_id)
                     return
                 
                 # Construir dados estruturados a partir da API antiga
@@ -336,17 +690,18 @@ class ConversationReferenceStorage:
                         "timezone": activity_data.get("timezone", "America/Sao_Paulo"),
                         "last_activity": {
                             "type": activity_data.get("type"),
-                            "timestamp": datetime.utcnow().isoformat(),
+                            "timestamp": now_iso,
                             "id": activity_data.get("id")
                         }
                     },
-                    "stored_at": datetime.utcnow().isoformat(),
+                    "stored_at": now_iso,
                     "version": "2.0"
                 }
             
             # Armazenar usando novo formato
             self.references[user_id] = reference_data
-            self.save()
+            self._invalidar_caches(user_id)
+            self.mark_dirty(user_id)
             self.logger.info("✅ ConversationReference robusta armazenada para user_id=%s", user_id)
             
         except Exception as e:
@@ -362,8 +717,8 @@ class ConversationReferenceStorage:
         Returns:
             dict ou ConversationReference: Dados da conversa ou None se não encontrado
         """
-        self.logger.info("🔍 get_conversation_reference chamado para user_id=%s", user_id)
-        ref_data = self.references.get(user_id)
+        self.logger.debug("get_conversation_reference chamado para user_id=%s", user_id)
+        ref_data = self._ref_data(user_id)
         if not ref_data:
             self.logger.warning("⚠️  Nenhuma referência encontrada para user_id=%s", user_id)
             return None
@@ -371,32 +726,93 @@ class ConversationReferenceStorage:
         try:
             # Verificar se é formato novo (v2.0)
             if isinstance(ref_data, dict) and ref_data.get("version") == "2.0":
-                self.logger.info("✅ Retornando ConversationReference v2.0 para user_id=%s", user_id)
+                self.logger.debug("Retornando ConversationReference v2.0 para user_id=%s", user_id)
                 return ref_data["conversation_data"]
             
             # Formato antigo ou ConversationReference object
-            self.logger.info("✅ Retornando ConversationReference legado para user_id=%s", user_id)
+            self.logger.debug("Retornando ConversationReference legado para user_id=%s", user_id)
             return ref_data
             
         except Exception as e:
             self.logger.error("💥 Erro ao recuperar ConversationReference para %s: %s", user_id, e, exc_info=True)
             return None
         
+    def _ref_data(self, user_id):
+        """Referência em memória; com backend remoto, busca lá em caso de falta
+        (usuário registrado por outra instância da Function App)."""
+        ref_data = self.references.get(user_id)
+        if ref_data is None and self._backend is not None:
+            if self._misses.get(user_id, 0.0) > time.monotonic():
+                return None
+            try:
+                ref_data = self._backend.get(user_id)
+            except Exception as e:
+                # Erro transitório: não vira cache negativo
+                self.logger.warning("Falha ao buscar referência de %s no Table Storage: %s", user_id, e)
+                return None
+            if ref_data is not None:
+                self._misses.pop(user_id, None)
+                self.references[user_id] = ref_data
+            elif CONVREF_MISS_TTL_SECONDS > 0:
+                self._misses[user_id] = time.monotonic() + CONVREF_MISS_TTL_SECONDS
+        return ref_data
+
+    def flush(self):
+        """Persiste alterações pendentes, se houver."""
+        if self._dirty:
+            self.save()
+
+    def mark_dirty(self, user_id: Optional[str] = None):
+        """Registra alteração pendente e agenda uma gravação agrupada (debounce).
+
+        user_id indica qual referência mudou (None = todas), para backends que
+        gravam por chave.
+        """
+        if user_id is None:
+            self._dirty_keys.update(self.references)
+        else:
+            self._dirty_keys.add(user_id)
+        self._dirty += 1
+        with self._timer_lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DEBOUNCE_SECONDS, self._flush_timer)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _flush_timer(self):
+        with self._timer_lock:
+            self._save_timer = None
+        try:
+            self.flush()
+        except Exception:
+            logging.error("Erro ao gravar referências pendentes", exc_info=True)
+
     def add(self, user_id, reference):
-        """Adiciona/atualiza referência e salva (compatibilidade com API antiga)."""
-        # Armazena a referência original (ConversationReference ou dict)
+        """Adiciona/atualiza referência (compatibilidade com API antiga).
+
+        A gravação é agrupada (ver mark_dirty); chame flush() para forçá-la.
+        """
+        # Serializa uma única vez aqui, para que save() não precise percorrer
+        # e serializar todas as referências a cada gravação
+        if hasattr(reference, 'serialize') and callable(getattr(reference, 'serialize')):
+            reference = reference.serialize()
         self.references[user_id] = reference
-        self.save()
-        logging.info(f"Referência adicionada para user_id={user_id}")
+        self._invalidar_caches(user_id)
+        self.mark_dirty(user_id)
+        logging.info("Referência adicionada para user_id=%s", user_id)
         
     def get(self, user_id):
         """Obtém referência por ID (compatibilidade com API antiga)."""
-        ref_data = self.references.get(user_id)
+        ref_data = self._ref_data(user_id)
         if not ref_data:
             return None
             
         # Para compatibilidade, retornar dados da conversa se for formato novo
         if isinstance(ref_data, dict) and ref_data.get("version") == "2.0":
+            # Dict montado uma vez por referência (compartilhado: não alterar)
+            cref_dict = self._cref_dict_cache.get(user_id)
+            if cref_dict is not None:
+                return cref_dict
             # Tentar reconstruir ConversationReference a partir dos dados estruturados
             try:
                 conv_data = ref_data["conversation_data"]
@@ -425,14 +841,36 @@ class ConversationReferenceStorage:
                     "serviceUrl": conv_data.get("service_url", ""),
                     "locale": conv_data.get("locale", "pt-BR")
                 }
+                self._cref_dict_cache[user_id] = cref_dict
                 return cref_dict
             except Exception as e:
-                logging.warning(f"Erro ao converter formato novo para antigo: {e}")
+                logging.warning("Erro ao converter formato novo para antigo: %s", e)
                 return ref_data
         
         # Formato antigo
         return ref_data
         
+    def get_cref(self, user_id):
+        """Obtém ConversationReference já desserializada (cacheada por user_id).
+
+        Evita repetir ConversationReference().deserialize() a cada envio; o cache
+        é invalidado quando a referência do usuário é alterada ou removida.
+        """
+        cref = self._deser_cache.get(user_id)
+        if cref is not None:
+            return cref
+        cref_data = self.get(user_id)
+        if not cref_data:
+            return None
+        if isinstance(cref_data, dict):
+            from botbuilder.schema import ConversationReference
+
+            cref = ConversationReference().deserialize(cref_data)
+        else:
+            cref = cref_data  # Já é ConversationReference
+        self._deser_cache[user_id] = cref
+        return cref
+
     def list_users(self):
         """Lista todos os user_ids com referências salvas."""
         return list(self.references.keys())
@@ -445,7 +883,8 @@ class ConversationReferenceStorage:
         """Remove referência de um usuário."""
         if user_id in self.references:
             del self.references[user_id]
-            self.save()
+            self._invalidar_caches(user_id)
+            self.mark_dirty(user_id)
             return True
         return False
 
@@ -453,28 +892,24 @@ class ConversationReferenceStorage:
         """
         Atualiza um cartão previamente enviado (replace/update activity) usando a activity id.
         """
-        cref_data = self.get(user_id)
-        if not cref_data:
-            self.logger.warning("update_card: referência não encontrada for %s", user_id)
-            return False
-
         try:
-            if isinstance(cref_data, dict) and cref_data.get('version') == '2.0':
-                conv = cref_data.get('conversation_data', cref_data)
-            else:
-                conv = cref_data
-            cref = ConversationReference().deserialize(conv)
+            cref = self.get_cref(user_id)
         except Exception as e:
             self.logger.error("update_card: erro ao desserializar cref: %s", e, exc_info=True)
             return False
+        if cref is None:
+            self.logger.warning("update_card: referência não encontrada for %s", user_id)
+            return False
+
+        from botbuilder.schema import Activity, Attachment
 
         try:
-            MicrosoftAppCredentials.trust_service_url(cref.service_url)
+            _trust_service_url(cref.service_url)
+            card_data = _card_to_dict(card_json)
 
-            async def _update_cb(turn_context: TurnContext):
+            async def _update_cb(turn_context: "TurnContext"):
                 try:
-                    card_data = json.loads(card_json) if isinstance(card_json, str) else card_json
-                    card_attachment = Attachment(content_type="application/vnd.microsoft.card.adaptive", content=card_data)
+                    card_attachment = Attachment(content_type=ADAPTIVE_CARD_CONTENT_TYPE, content=card_data)
                     activity = Activity(type="message", id=activity_id, text=fallback_message, attachments=[card_attachment])
                     await turn_context.update_activity(activity)
                     self.logger.info("update_card: atualizado %s id=%s", user_id, activity_id)
@@ -7,6 +7,7 @@ Módulo para criação de cartões adaptativos (Adaptive Cards) para o Teams.
 - Retorna payloads como dict (compatível com o sender atual).
 """
 
+from functools import lru_cache
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, date
 
@@ -16,6 +17,29 @@ from utils.gclick_links import (
     EMPRESA_ID_PADRAO,
 )
 
+# Trechos fixos dos cards, montados uma única vez no import e reaproveitados
+# por referência em todos os cards (não devem ser alterados pelos chamadores)
+_TITULO_TAREFA = {
+    "type": "TextBlock",
+    "text": "Obrigação Fiscal",
+    "weight": "Bolder",
+    "size": "Medium",
+    "wrap": True,
+}
+_ACOES_RESUMO = [
+    {
+        "type": "Action.OpenUrl",
+        "title": "🔍 Abrir G-Click",
+        # Link genérico; pode ser ajustado para um filtro próprio, se houver
+        "url": "https://app.gclick.com.br/",
+    }
+]
+_AVISO_SEM_DETALHES = {
+    "type": "TextBlock",
+    "text": "Não foi possível carregar detalhes agora. Abra no G-Click para consultar.",
+    "wrap": True,
+    "isSubtle": True,
+}
 
 # =========================
 # API pública
@@ -26,6 +50,7 @@ def create_task_notification_card(
     detalhes: Optional[Dict[str, Any]] = None,
     *,
     max_atividades: int = 5,
+    hoje: Optional[date] = None,
 ) -> Dict[str, Any]:
     """
     Cria um Adaptive Card para notificação de tarefa/obrigação (estilo minimalista/dark-friendly).
@@ -39,6 +64,7 @@ def create_task_notification_card(
             - meta_interna: str (data normalizada dd/mm/aaaa quando disponível)
             - observacoes: str (resumo curto)
         max_atividades: Limite de linhas de atividades a exibir no bloco "Detalhes"
+        hoje: Data de referência do lote (a mesma da classificação); padrão date.today()
 
     Returns:
         dict: payload de Adaptive Card pronto para envio
@@ -55,86 +81,44 @@ def create_task_notification_card(
     # URL deep-link correto
     url_tarefa = montar_link_gclick_obrigacao(id_tarefa, EMPRESA_ID_PADRAO)
 
-    # Estilo de urgência
-    cor_status, icone_status = _determine_urgency_style(data_venc)
+    # Estilo e textos do vencimento (memoizados por vencimento e dia)
+    cor_status, icone_status, msg_urgencia, venc_exibicao = _vencimento_para_card(
+        data_venc, hoje or date.today()
+    )
 
     # ID único para toggle de detalhes (evita colisões)
     detalhes_container_id = f"detalhes_{id_tarefa or 'x'}"
 
-    # Cabeçalho compacto
-    header_container = {
-        "type": "Container",
-        "bleed": True,
-        "items": [
-            {
-                "type": "ColumnSet",
-                "columns": [
-                    {
-                        "type": "Column",
-                        "width": "auto",
-                        "items": [
-                            {"type": "TextBlock", "text": icone_status, "size": "Large"}
-                        ],
-                        "verticalContentAlignment": "Center",
-                    },
-                    {
-                        "type": "Column",
-                        "width": "stretch",
-                        "items": [
-                            {
-                                "type": "TextBlock",
-                                "text": "Obrigação Fiscal",
-                                "weight": "Bolder",
-                                "size": "Medium",
-                                "wrap": True,
-                            },
-                            {
-                                "type": "TextBlock",
-                                "text": _get_urgency_message(data_venc),
-                                "wrap": True,
-                                "isSubtle": True,
-                                "spacing": "None",
-                                "color": cor_status,
-                            },
-                        ],
-                    },
-                ],
-            }
-        ],
-        # "style": "emphasis"  # opcional; o Teams segue o tema do usuário (dark/clear)
-    }
+    # Cabeçalho compacto (compartilhado entre cards com o mesmo vencimento no dia)
+    header_container = _cabecalho_tarefa(icone_status, msg_urgencia, cor_status)
 
     # Corpo principal (título e facts)
-    body_items: List[Dict[str, Any]] = [
-        header_container,
-        {
-            "type": "TextBlock",
-            "text": nome_tarefa,
-            "wrap": True,
-            "size": "Large",
-            "weight": "Bolder",
-            "spacing": "Medium",
-        },
-        {
-            "type": "FactSet",
-            "facts": [
-                {"title": "ID:", "value": id_tarefa or "—"},
-                {"title": "Vencimento:", "value": _format_date_for_display(data_venc)},
-                {"title": "Status:", "value": str(status)},
-                {"title": "Responsável:", "value": nome_responsavel},
-            ],
-        },
-    ]
+    titulo_block = {
+        "type": "TextBlock",
+        "text": nome_tarefa,
+        "wrap": True,
+        "size": "Large",
+        "weight": "Bolder",
+        "spacing": "Medium",
+    }
+    factset = {
+        "type": "FactSet",
+        "facts": [
+            {"title": "ID:", "value": id_tarefa or "—"},
+            {"title": "Vencimento:", "value": venc_exibicao},
+            {"title": "Status:", "value": str(status)},
+            {"title": "Responsável:", "value": nome_responsavel},
+        ],
+    }
 
-    # “Dica” de contagem quando houver detalhes
-    if detalhes and isinstance(detalhes, dict):
-        cont = detalhes.get("contagem") or {}
-        pend = _safe_int(cont.get("pendentes"))
-        conc = _safe_int(cont.get("concluidas"))
-        total = _safe_int(cont.get("total")) or (pend + conc)
+    # “Dica” de contagem quando houver detalhes (contagem reaproveitada no container)
+    extras: List[Dict[str, Any]] = []
+    contagem = _contagem_atividades(detalhes)
+    if contagem:
+        pend, conc, total = contagem
         if total > 0:
             hint = f"Atividades: {conc}/{total} concluídas • {pend} pendentes"
-            body_items.append(
+            extras.append(
                 {
                     "type": "TextBlock",
                     "text": hint,
@@ -156,14 +140,14 @@ def create_task_notification_card(
 
     # Container de detalhes (inicialmente oculto)
     detalhes_container = _render_detalhes_container(
-        detalhes_container_id, nome_tarefa, detalhes, max_atividades=max_atividades
+        detalhes_container_id, nome_tarefa, detalhes, max_atividades=max_atividades, contagem=contagem
     )
 
-    # Montar card completo
+    # Montar card completo (body criado uma única vez, já no tamanho final)
     card: Dict[str, Any] = {
         "type": "AdaptiveCard",
         "version": "1.3",
-        "body": body_items + [detalhes_container],
+        "body": [header_container, titulo_block, factset, *extras, detalhes_container],
         "actions": actions,
     }
     return card
@@ -193,75 +177,59 @@ def create_summary_notification_card(resumo: Dict[str, Any], responsavel: str) -
     else:
         cor_principal, icone = "good", "📅"
 
-    body: List[Dict[str, Any]] = [
-        {
-            "type": "Container",
-            "items": [
-                {
-                    "type": "ColumnSet",
-                    "columns": [
-                        {
-                            "type": "Column",
-                            "width": "auto",
-                            "items": [{"type": "TextBlock", "text": icone, "size": "Large"}],
-                            "verticalContentAlignment": "Center",
-                        },
-                        {
-                            "type": "Column",
-                            "width": "stretch",
-                            "items": [
-                                {
-                                    "type": "TextBlock",
-                                    "text": f"Resumo de Obrigações • {responsavel}",
-                                    "weight": "Bolder",
-                                    "size": "Medium",
-                                    "wrap": True,
-                                },
-                                {
-                                    "type": "TextBlock",
-                                    "text": f"**{total_pendentes}** pendente(s)",
-                                    "wrap": True,
-                                    "spacing": "None",
-                                    "color": cor_principal,
-                                },
-                            ],
-                        },
-                    ],
-                }
-            ],
-        }
-    ]
+    header = {
+        "type": "Container",
+        "items": [
+            {
+                "type": "ColumnSet",
+                "columns": [
+                    {
+                        "type": "Column",
+                        "width": "auto",
+                        "items": [{"type": "TextBlock", "text": icone, "size": "Large"}],
+                        "verticalContentAlignment": "Center",
+                    },
+                    {
+                        "type": "Column",
+                        "width": "stretch",
+                        "items": [
+                            {
+                                "type": "TextBlock",
+                                "text": f"Resumo de Obrigações • {responsavel}",
+                                "weight": "Bolder",
+                                "size": "Medium",
+                                "wrap": True,
+                            },
+                            {
+                                "type": "TextBlock",
+                                "text": f"**{total_pendentes}** pendente(s)",
+                                "wrap": True,
+                                "spacing": "None",
+                                "color": cor_principal,
+                            },
+                        ],
+                    },
+                ],
+            }
+        ],
+    }
 
-    if total_pendentes > 0:
-        if vencidas > 0:
-            body.append(
-                {"type": "TextBlock", "text": f"🔴 **{vencidas}** vencida(s)", "wrap": True}
-            )
-        if vence_hoje > 0:
-            body.append(
-                {"type": "TextBlock", "text": f"🟡 **{vence_hoje}** vence(m) hoje", "wrap": True}
-            )
-        if vence_proximos > 0:
-            body.append(
-                {
-                    "type": "TextBlock",
-                    "text": f"🟢 **{vence_proximos}** vence(m) nos próximos dias",
-                    "wrap": True,
-                }
-            )
+    # Linhas de contagem (só as não nulas), montadas junto com o body final
+    linhas = [
+        {"type": "TextBlock", "text": texto, "wrap": True}
+        for qtd, texto in (
+            (vencidas, f"🔴 **{vencidas}** vencida(s)"),
+            (vence_hoje, f"🟡 **{vence_hoje}** vence(m) hoje"),
+            (vence_proximos, f"🟢 **{vence_proximos}** vence(m) nos próximos dias"),
+        )
+        if qtd > 0
+    ] if total_pendentes > 0 else []
 
     card: Dict[str, Any] = {
         "type": "AdaptiveCard",
         "version": "1.3",
-        "body": body,
-        "actions": [
-            {
-                "type": "Action.OpenUrl",
-                "title": "🔍 Abrir G-Click",
-                # Link genérico; pode ser ajustado para um filtro próprio, se houver
-                "url": "https://app.gclick.com.br/",
-            }
-        ],
+        "body": [header, *linhas],
+        "actions": _ACOES_RESUMO,
     }
     return card
 
@@ -275,10 +243,13 @@ def _render_detalhes_container(
     detalhes: Optional[Dict[str, Any]],
     *,
     max_atividades: int = 5,
+    contagem: Optional[Tuple[int, int, int]] = None,
 ) -> Dict[str, Any]:
     """
     Constrói o Container de detalhes (colapsável).
 
+    contagem: (pendentes, concluidas, total) já calculada pelo chamador, se houver.
+
     detalhes esperados:
       - atividades: List[{"titulo": str, "concluida": bool}]
       - contagem: {"pendentes": int, "concluidas": int, "total": int}
@@ -290,14 +261,7 @@ def _render_detalhes_container(
     ]
 
     if not detalhes or not isinstance(detalhes, dict):
-        items.append(
-            {
-                "type": "TextBlock",
-                "text": "Não foi possível carregar detalhes agora. Abra no G-Click para consultar.",
-                "wrap": True,
-                "isSubtle": True,
-            }
-        )
+        items.append(_AVISO_SEM_DETALHES)
         return {"type": "Container", "id": container_id, "isVisible": False, "items": items}
 
     # Meta interna (data) e observações (resumo)
@@ -333,10 +297,7 @@ def _render_detalhes_container(
         items.append({"type": "TextBlock", "text": txt, "wrap": True})
 
     # Contadores (se presentes)
-    cont = detalhes.get("contagem") or {}
-    pend = _safe_int(cont.get("pendentes"))
-    conc = _safe_int(cont.get("concluidas"))
-    total = _safe_int(cont.get("total")) or (pend + conc)
+    pend, conc, total = contagem or _contagem_atividades(detalhes)
     if total > 0:
         items.append(
             {
@@ -351,70 +312,163 @@ def _render_detalhes_container(
     return {"type": "Container", "id": container_id, "isVisible": False, "items": items}
 
 
-def _determine_urgency_style(data_vencimento: str) -> Tuple[str, str]:
+def _parse_venc(data_vencimento: Any) -> Optional[date]:
+    """YYYY-MM-DD -> date, convertida uma única vez por card (None se vazia/inválida)."""
+    if not data_vencimento:
+        return None
+    try:
+        return date.fromisoformat(data_vencimento)
+    except (TypeError, ValueError):
+        pass
+    try:
+        # strptime também aceita dia/mês sem zero à esquerda
+        return datetime.strptime(data_vencimento, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _determine_urgency_style(dt_venc: Optional[date], hoje: date) -> Tuple[str, str]:
     """
     Determina (cor, ícone) conforme proximidade do vencimento.
     Cores: default | attention | warning | good | accent
     """
-    if not data_vencimento:
-        return "default", "📋"
-    try:
-        dt_venc = datetime.strptime(data_vencimento, "%Y-%m-%d").date()
-        hoje = date.today()
-        if dt_venc < hoje:
-            return "attention", "🔴"  # vencida
-        if dt_venc == hoje:
-            return "warning", "🟡"    # vence hoje
-        delta = (dt_venc - hoje).days
-        if delta <= 3:
-            return "good", "🟢"       # em breve
-        return "default", "📅"
-    except Exception:
+    if dt_venc is None:
         return "default", "📋"
+    if dt_venc < hoje:
+        return "attention", "🔴"  # vencida
+    if dt_venc == hoje:
+        return "warning", "🟡"    # vence hoje
+    delta = (dt_venc - hoje).days
+    if delta <= 3:
+        return "good", "🟢"       # em breve
+    return "default", "📅"
 
 
-def _format_date_for_display(data_vencimento: str) -> str:
+def _format_date_for_display(data_vencimento: str, dt_venc: Optional[date]) -> str:
     """YYYY-MM-DD -> dd/mm/aaaa (fallback para original se parsing falhar)."""
     if not data_vencimento:
         return "—"
-    try:
-        dt = datetime.strptime(data_vencimento, "%Y-%m-%d")
-        return dt.strftime("%d/%m/%Y")
-    except Exception:
+    if dt_venc is None:
         return str(data_vencimento)
+    # Campos da data direto no f-string, sem passar pela máquina de formato do strftime
+    return f"{dt_venc.day:02d}/{dt_venc.month:02d}/{dt_venc.year:04d}"
 
 
-def _get_urgency_message(data_vencimento: str) -> str:
+def _get_urgency_message(data_vencimento: str, dt_venc: Optional[date], hoje: date) -> str:
     """Mensagem curta de urgência conforme data."""
     if not data_vencimento:
         return "Verifique o prazo desta obrigação."
-    try:
-        dt_venc = datetime.strptime(data_vencimento, "%Y-%m-%d").date()
-        hoje = date.today()
-        if dt_venc < hoje:
-            dias = (hoje - dt_venc).days
-            return f"Vencida há {dias} dia(s). Ação urgente necessária."
-        if dt_venc == hoje:
-            return "Vence HOJE. Ação imediata recomendada."
-        delta = (dt_venc - hoje).days
-        if delta == 1:
-            return "Vence AMANHÃ. Prepare-se."
-        if delta <= 3:
-            return f"Vence em {delta} dia(s). Planeje a execução."
-        return f"Vence em {delta} dia(s)."
-    except Exception:
+    if dt_venc is None:
         return "Verifique o prazo no G-Click."
+    if dt_venc < hoje:
+        dias = (hoje - dt_venc).days
+        return f"Vencida há {dias} dia(s). Ação urgente necessária."
+    if dt_venc == hoje:
+        return "Vence HOJE. Ação imediata recomendada."
+    delta = (dt_venc - hoje).days
+    if delta == 1:
+        return "Vence AMANHÃ. Prepare-se."
+    if delta <= 3:
+        return f"Vence em {delta} dia(s). Planeje a execução."
+    return f"Vence em {delta} dia(s)."
+
+
+@lru_cache(maxsize=512)
+def _apresentacao_vencimento(data_vencimento: str, hoje: date) -> Tuple[str, str, str, str]:
+    """
+    (cor, ícone, mensagem de urgência, data formatada) do vencimento.
+    Muitas obrigações vencem no mesmo dia (ex.: dia 20), então o resultado é
+    calculado uma vez por (vencimento, hoje) e reaproveitado entre os cards.
+    """
+    dt_venc = _parse_venc(data_vencimento)
+    cor, icone = _determine_urgency_style(dt_venc, hoje)
+    return (
+        cor,
+        icone,
+        _get_urgency_message(data_vencimento, dt_venc, hoje),
+        _format_date_for_display(data_vencimento, dt_venc),
+    )
+
+
+@lru_cache(maxsize=512)
+def _cabecalho_tarefa(icone: str, msg_urgencia: str, cor: str) -> Dict[str, Any]:
+    """
+    Container de cabeçalho do card de tarefa; depende só do estilo/mensagem de urgência.
+    Montado uma vez por combinação e compartilhado por referência entre os cards,
+    como os demais trechos fixos (não deve ser alterado pelos chamadores).
+    """
+    return {
+        "type": "Container",
+        "bleed": True,
+        "items": [
+            {
+                "type": "ColumnSet",
+                "columns": [
+                    {
+                        "type": "Column",
+                        "width": "auto",
+                        "items": [{"type": "TextBlock", "text": icone, "size": "Large"}],
+                        "verticalContentAlignment": "Center",
+                    },
+                    {
+                        "type": "Column",
+                        "width": "stretch",
+                        "items": [
+                            _TITULO_TAREFA,
+                            {
+                                "type": "TextBlock",
+                                "text": msg_urgencia,
+                                "wrap": True,
+                                "isSubtle": True,
+                                "spacing": "None",
+                                "color": cor,
+                            },
+                        ],
+                    },
+                ],
+            }
+        ],
+        # "style": "emphasis"  # opcional; o Teams segue o tema do usuário (dark/clear)
+    }
+
+
+def _vencimento_para_card(data_vencimento: Any, hoje: date) -> Tuple[str, str, str, str]:
+    """Usa o cache de _apresentacao_vencimento quando a data é hashable."""
+    if data_vencimento is None or isinstance(data_vencimento, str):
+        return _apresentacao_vencimento(data_vencimento, hoje)
+    return _apresentacao_vencimento.__wrapped__(data_vencimento, hoje)
+
+
+def _contagem_atividades(detalhes: Optional[Dict[str, Any]]) -> Optional[Tuple[int, int, int]]:
+    """(pendentes, concluidas, total) de detalhes["contagem"]; None sem detalhes."""
+    if not detalhes or not isinstance(detalhes, dict):
+        return None
+    cont = detalhes.get("contagem") or {}
+    pend = _safe_int(cont.get("pendentes"))
+    conc = _safe_int(cont.get("concluidas"))
+    total = _safe_int(cont.get("total")) or (pend + conc)
+    return pend, conc, total
 
 
 def _truncate(texto: str, max_len: int) -> str:
     """Corta texto em max_len com reticências."""
-    s = (texto or "").strip()
+    if not texto:
+        return ""
+    # Caso comum: já cabe e não tem espaços nas pontas — devolvido sem copiar
+    if len(texto) <= max_len and not texto[0].isspace() and not texto[-1].isspace():
+        return texto
+    s = texto.strip()
     if len(s) <= max_len:
         return s
     return s[: max(0, max_len - 1)].rstrip() + "…"
 
 
 def _safe_int(v: Any) -> int:
+    # Casos mais comuns (campo ausente ou já inteiro) sem passar pelo try/except
+    if v is None:
+        return 0
+    if type(v) is int:
+        return v
     try:
         return int(v)
     except Exception:
@@ -1,17 +1,28 @@
 import os
 import re
+from functools import lru_cache
 from typing import Union
 
 EMPRESA_ID_PADRAO = int(os.getenv("GCLICK_EMPRESA_ID", "2557"))
 
+# Padrões compilados uma vez (usados a cada link de card)
+_ID_SPLIT_RE = re.compile(r"^\s*(\d+)\D+(\d+)\s*$")
+_DIGITS_RE = re.compile(r"\d+")
+
 def montar_link_gclick_obrigacao(id_tarefa: Union[str, int], emp_id: int = EMPRESA_ID_PADRAO) -> str:
-    s = str(id_tarefa or "").strip()
+    return _link_obrigacao(str(id_tarefa or "").strip(), emp_id)
+
+
+# O mesmo ID aparece em vários cards (um por responsável) e a cada ciclo do
+# timer no mesmo worker: o link é montado uma vez por (id, empresa)
+@lru_cache(maxsize=4096)
+def _link_obrigacao(s: str, emp_id: int) -> str:
     # tenta capturar "NNN<sep>NNNNN" com qualquer separador não numérico
-    m = re.match(r"^\s*(\d+)\D+(\d+)\s*$", s)
+    m = _ID_SPLIT_RE.match(s)
     if m:
         coid, eve = m.group(1), m.group(2)
     else:
-        digits = re.findall(r"\d+", s)
+        digits = _DIGITS_RE.findall(s)
         if not digits:
             return "https://app.gclick.com.br/coListar.do?obj=coevento"
         flat = "".join(digits)
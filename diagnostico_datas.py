@@ -5,6 +5,7 @@ import csv
 import json
 import argparse
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 
 from dotenv import load_dotenv
@@ -97,17 +98,49 @@ def parse_args():
                     help="Logs detalhados.")
     return ap.parse_args()
 
+# Páginas buscadas em paralelo depois que a primeira informa totalPages
+PAGINAS_CONCORRENCIA = int(os.getenv("DIAG_PAGE_CONCURRENCY", "8"))
+
 def collect_tasks(categoria, inicio: date, fim: date, page_size=200, max_pages=None, verbose=False):
-    tarefas = []
-    page = 0
-    while True:
-        tasks_page, meta = listar_tarefas_page(
+    def _buscar(page):
+        return listar_tarefas_page(
             categoria=categoria,
             page=page,
             size=page_size,
             dataVencimentoInicio=inicio.isoformat(),
             dataVencimentoFim=fim.isoformat()
         )
+
+    tasks_page, meta = _buscar(0)
+    tarefas = list(tasks_page)
+    if verbose:
+        print(f"[PAG] page=0 obtidas={len(tasks_page)} totalPages={meta.get('totalPages')}")
+    if meta.get("last"):
+        return tarefas
+    if max_pages is not None and max_pages <= 1:
+        if verbose:
+            print("[INFO] max_pages atingido.")
+        return tarefas
+
+    total_pages = meta.get("totalPages")
+    if isinstance(total_pages, int) and total_pages > 1:
+        limite = total_pages if max_pages is None else min(total_pages, max_pages)
+        paginas = range(1, limite)
+        workers = max(1, min(PAGINAS_CONCORRENCIA, len(paginas)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map preserva a ordem das páginas no resultado
+            for page, (tasks_page, meta) in zip(paginas, executor.map(_buscar, paginas)):
+                tarefas.extend(tasks_page)
+                if verbose:
+                    print(f"[PAG] page={page} obtidas={len(tasks_page)} totalPages={meta.get('totalPages')}")
+        if verbose and max_pages is not None and limite < total_pages:
+            print("[INFO] max_pages atingido.")
+        return tarefas
+
+    # Sem totalPages: segue página a página até "last"
+    page = 1
+    while True:
+        tasks_page, meta = _buscar(page)
         tarefas.extend(tasks_page)
         if verbose:
             print(f"[PAG] page={page} obtidas={len(tasks_page)} totalPages={meta.get('totalPages')}")
@@ -132,6 +165,10 @@ def normalize_all(raw_tasks):
             dt_key = f"{campo}_dt"
             if dt_key not in nt:
                 nt[dt_key] = _parse_date_safe(nt.get(campo))
+        # Ordinais calculados uma vez: classify roda até duas vezes sobre a lista
+        for campo in ("dataVencimento", "dataMeta", "dataAcao"):
+            dt = nt[f"{campo}_dt"]
+            nt[f"_ord_{campo}"] = dt.toordinal() if dt else None
         out.append(nt)
     return out
 
@@ -139,42 +176,48 @@ def classify(tasks, hoje: date, abertos_set, usar_fallback=False):
     buckets = {"vencidas": [], "vence_hoje": [], "vence_em_3_dias": []}
     excl = {"sem_data": [], "fora_janela": [], "status_fechado": []}
 
-    for t in tasks:
-        status = t.get("status")
-        dt_venc = t.get("dataVencimento_dt")
-        if usar_fallback and dt_venc is None:
-            dt_venc = t.get("dataMeta_dt") or t.get("dataAcao_dt")
+    # Appends e hoje (em ordinal) resolvidos uma vez fora do laço
+    venc_app = buckets["vencidas"].append
+    hoje_app = buckets["vence_hoje"].append
+    prox_app = buckets["vence_em_3_dias"].append
+    sem_data_app = excl["sem_data"].append
+    fora_app = excl["fora_janela"].append
+    fechado_app = excl["status_fechado"].append
+    hoje_ord = hoje.toordinal()
 
-        if dt_venc is None:
-            excl["sem_data"].append(t)
+    for t in tasks:
+        ord_venc = t.get("_ord_dataVencimento")
+        # A flag só é avaliada quando falta dataVencimento (caso raro), então
+        # o caminho sem fallback já não paga o desvio; não especializar o laço.
+        if ord_venc is None and usar_fallback:
+            ord_venc = t.get("_ord_dataMeta") or t.get("_ord_dataAcao")
+
+        if ord_venc is None:
+            sem_data_app(t)
             continue
 
-        if status not in abertos_set:
-            excl["status_fechado"].append(t)
+        if t.get("status") not in abertos_set:
+            fechado_app(t)
             continue
 
-        delta = (dt_venc - hoje).days
+        delta = ord_venc - hoje_ord
         if delta < 0:
-            buckets["vencidas"].append(t)
+            venc_app(t)
         elif delta == 0:
-            buckets["vence_hoje"].append(t)
-        elif 0 < delta <= 3:
-            buckets["vence_em_3_dias"].append(t)
+            hoje_app(t)
+        elif delta <= 3:
+            prox_app(t)
         else:
-            excl["fora_janela"].append(t)
+            fora_app(t)
 
     return buckets, excl
 
 def collect_date_stats(tasks):
     fields = ["dataVencimento", "dataMeta", "dataAcao", "dataConclusao"]
-    presence = {f: 0 for f in fields}
-    distinct = {f: Counter() for f in fields}
-    for t in tasks:
-        for f in fields:
-            val = t.get(f)
-            if val:
-                presence[f] += 1
-                distinct[f][val] += 1
+    # Uma passada por campo com a contagem feita pelo próprio Counter (em C);
+    # presença = total de valores preenchidos
+    distinct = {f: Counter(val for t in tasks if (val := t.get(f))) for f in fields}
+    presence = {f: sum(distinct[f].values()) for f in fields}
     return presence, distinct
 
 def print_top_distinct(distinct, top_n=10):
@@ -190,37 +233,38 @@ def show_examples(excl, max_ex=5):
             print(f"  - id={t.get('id')} status={t.get('status')} nome={t.get('nome')}")
 
 def export_csv(path, tasks, buckets, excl, usar_fallback):
-    bucket_map = {}
-    for b, lista in buckets.items():
-        for t in lista:
-            bucket_map[t.get("id")] = b
-    excl_map = {}
-    for r, lista in excl.items():
-        for t in lista:
-            excl_map[t.get("id")] = r
+    bucket_map = {t.get("id"): b for b, lista in buckets.items() for t in lista}
+    excl_map = {t.get("id"): r for r, lista in excl.items() for t in lista}
 
     fields = [
         "id","status","status_label","dataVencimento","dataMeta","dataAcao","dataConclusao",
         "bucket","exclusao","usar_fallback"
     ]
-    with open(path, "w", newline="", encoding="utf-8") as f:
+    # Linhas geradas sob demanda e gravadas por um único writerows (laço no _csv)
+    label_get = STATUS_LABEL.get
+    bucket_get = bucket_map.get
+    excl_get = excl_map.get
+    flag_fallback = "1" if usar_fallback else "0"
+    linhas = (
+        (
+            sid,
+            st,
+            label_get(st, ""),
+            t.get("dataVencimento"),
+            t.get("dataMeta"),
+            t.get("dataAcao"),
+            t.get("dataConclusao"),
+            bucket_get(sid, ""),
+            excl_get(sid, ""),
+            flag_fallback,
+        )
+        for t in tasks
+        for sid, st in ((t.get("id"), t.get("status")),)
+    )
+    with open(path, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
         wr = csv.writer(f, delimiter=";")
         wr.writerow(fields)
-        for t in tasks:
-            sid = t.get("id")
-            st = t.get("status")
-            wr.writerow([
-                sid,
-                st,
-                STATUS_LABEL.get(st, ""),
-                t.get("dataVencimento"),
-                t.get("dataMeta"),
-                t.get("dataAcao"),
-                t.get("dataConclusao"),
-                bucket_map.get(sid, ""),
-                excl_map.get(sid, ""),
-                "1" if usar_fallback else "0"
-            ])
+        wr.writerows(linhas)
     print(f"[CSV] Exportado: {path}")
 
 def main():
@@ -230,7 +274,7 @@ def main():
     inicio = hoje - timedelta(days=args.retro_dias)
     fim = hoje + timedelta(days=args.dias_proximos)
 
-    abertos_set = {s.strip() for s in args.status_abertos.split(",") if s.strip()}
+    abertos_set = frozenset(s.strip() for s in args.status_abertos.split(",") if s.strip())
     print(f"[INFO] Janela: {inicio} -> {fim} | categoria={args.categoria}")
     print(f"[INFO] Status abertos: {sorted(abertos_set)} | fallback={args.usar_fallback}")
 
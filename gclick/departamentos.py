@@ -1,6 +1,7 @@
 # gclick/departamentos.py
 import requests
 import time
+import threading
 from typing import List, Dict, Any
 from .auth import get_access_token
 from ..config.logging_config import setup_logger
@@ -9,8 +10,10 @@ logger = setup_logger(__name__)
 
 BASE = "https://api.gclick.com.br"
 
-# Cache simples em memória
-_cache_departamentos = {"data": None, "timestamp": 0, "ttl": 3600}  # 1 hora
+# Cache simples em memória (protegido por lock para evitar buscas duplicadas)
+DEPARTAMENTOS_CACHE_TTL = 3600  # 1 hora
+_cache_departamentos = {"data": None, "expira_em": 0.0}  # expira_em em time.monotonic()
+_departamentos_lock = threading.RLock()
 
 def listar_departamentos(page: int = 0, size: int = 100) -> List[Dict[str, Any]]:
     token = get_access_token()
@@ -32,17 +35,19 @@ def get_departamentos_cached() -> List[Dict[str, Any]]:
     Returns:
         Lista de departamentos ou lista vazia em caso de erro
     """
-    now = time.time()
     cache = _cache_departamentos
-    
-    if cache["data"] is None or (now - cache["timestamp"]) > cache["ttl"]:
+
+    with _departamentos_lock:
+        if cache["data"] is not None and time.monotonic() < cache["expira_em"]:
+            return cache["data"]
+
         try:
             cache["data"] = listar_departamentos(size=500)  # Buscar todos
-            cache["timestamp"] = now
+            cache["expira_em"] = time.monotonic() + DEPARTAMENTOS_CACHE_TTL
             logger.info(f"Cache de departamentos atualizado: {len(cache['data'])} itens")
         except Exception as e:
             logger.error(f"Erro ao cachear departamentos: {e}")
             if cache["data"] is None:
                 cache["data"] = []
-    
-    return cache["data"]
+
+        return cache["data"]
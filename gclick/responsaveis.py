@@ -1,12 +1,34 @@
 import os
 import time
+import threading
 import requests
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from .auth import get_access_token
+from .http import GClickHTTPError, breaker_get, json_loads, SSL_VERIFY
+
+# Cache curto por tarefa: ciclos repetidos dentro da janela não voltam à API
+RESPONSAVEIS_CACHE_TTL = 120  # segundos
+_cache_responsaveis: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+_responsaveis_lock = threading.Lock()
 
 def _headers():
     return {"Authorization": f"Bearer {get_access_token()}"}
 
+def _cache_get(tarefa_id: str) -> Optional[List[Dict[str, Any]]]:
+    with _responsaveis_lock:
+        entry = _cache_responsaveis.get(tarefa_id)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[0]:
+            del _cache_responsaveis[tarefa_id]
+            return None
+        return entry[1]
+
+def _cache_set(tarefa_id: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with _responsaveis_lock:
+        _cache_responsaveis[tarefa_id] = (time.monotonic() + RESPONSAVEIS_CACHE_TTL, data)
+    return data
+
 def listar_responsaveis_tarefa(
     tarefa_id: str,
     timeout: int = 8,
@@ -17,7 +39,12 @@ def listar_responsaveis_tarefa(
     """
     Consulta /tarefas/{id}/responsaveis com tratamento robusto de erros.
     Retorna lista (possivelmente vazia).
+    Respostas definitivas (200/404/500) ficam em cache por RESPONSAVEIS_CACHE_TTL segundos.
     """
+    cached = _cache_get(tarefa_id)
+    if cached is not None:
+        return cached
+
     url = f"https://api.gclick.com.br/tarefas/{tarefa_id}/responsaveis"
 
     attempt = 0
@@ -26,31 +53,36 @@ def listar_responsaveis_tarefa(
     while attempt < retries:
         attempt += 1
         try:
-            resp = requests.get(url, headers=_headers(), timeout=timeout)
+            resp = breaker_get(url, headers=_headers(), timeout=timeout, verify=SSL_VERIFY)
             last_status_code = resp.status_code
             
             if resp.status_code == 200:
-                data = resp.json()
+                data = json_loads(resp.content)
                 if isinstance(data, list):
                     if verbose:
                         print(f"[RESP] tarefa={tarefa_id} -> {len(data)} responsável(is).")
-                    return data
+                    return _cache_set(tarefa_id, data)
                 if verbose:
                     print(f"[RESP][WARN] tarefa={tarefa_id} resposta não é lista. body={data}")
-                return []
+                return _cache_set(tarefa_id, [])
             elif resp.status_code == 500:
                 # Erro específico do servidor - não retry agressivo
                 if verbose:
                     print(f"[RESP][500] tarefa={tarefa_id} - endpoint pode não existir ou tarefa inválida")
-                return []
+                return _cache_set(tarefa_id, [])
             elif resp.status_code == 404:
                 # Tarefa não encontrada ou sem responsáveis
                 if verbose:
                     print(f"[RESP][404] tarefa={tarefa_id} - não encontrada ou sem responsáveis")
-                return []
+                return _cache_set(tarefa_id, [])
             else:
                 if verbose:
                     print(f"[RESP][HTTP {resp.status_code}] tarefa={tarefa_id} body={resp.text[:180]}")
+        except GClickHTTPError as e:
+            # Circuit breaker aberto: sem retries/backoff e sem cache (não é resposta da API)
+            if verbose:
+                print(f"[RESP][CIRCUIT] tarefa={tarefa_id} - circuit breaker aberto, consulta ignorada")
+            return []
         except (requests.Timeout, requests.ConnectionError) as e:
             if verbose:
                 print(f"[RESP][TIMEOUT/CONN] tarefa={tarefa_id} tent={attempt}/{retries} erro={e}")
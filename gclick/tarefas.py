@@ -1,8 +1,9 @@
 import os
-import requests
+import sys
 from datetime import datetime, timedelta
 from typing import Tuple, List, Dict, Any, Iterable, Optional
 from .auth import get_access_token  # Usar auth centralizado
+from .http import breaker_get, json_loads
 
 # Carrega .env defensivamente (não falha se não existir)
 try:
@@ -37,6 +38,11 @@ STATUS_LABELS = {
 def normalizar_tarefa(t: Dict[str, Any]) -> Dict[str, Any]:
     r = dict(t)
     st = r.get("status")
+    if isinstance(st, str):
+        # Status se repetem em todas as tarefas: internar deixa as comparações
+        # de filtro/classificação praticamente por identidade
+        st = sys.intern(st)
+        r["status"] = st
     r["_statusLabel"] = STATUS_LABELS.get(st, st)
     
     # Normalizar data de vencimento
@@ -100,13 +106,14 @@ def listar_tarefas_page(
     if extra_params:
         params.update(extra_params)
 
-    resp = requests.get(url, headers=_headers(), params=params, timeout=40)
+    # Via circuit breaker: com a API fora do ar falha de imediato (GClickHTTPError)
+    resp = breaker_get(url, headers=_headers(), params=params, timeout=40)
     if not resp.ok:
         raise RuntimeError(
             f"Erro {resp.status_code} GET {url} params={params} body={resp.text[:500]}"
         )
 
-    data = resp.json()
+    data = json_loads(resp.content)
     content = data.get("content", []) or []
     norm = [normalizar_tarefa(t) for t in content]
 
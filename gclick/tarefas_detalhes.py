@@ -1,12 +1,18 @@
 # azure_functions/shared_code/gclick/tarefas_detalhes.py
 import os
 import logging
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional, TYPE_CHECKING
 
-import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
+import threading
+
+from .circuit_breaker import CircuitBreaker, CircuitBreakerConfig
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +28,45 @@ GCLICK_TASK_DETAILS_TMPL = os.getenv("GCLICK_TASK_DETAILS_TMPL", "{base}/tarefas
 # Permitir desabilitar verificação SSL via env (apenas se necessário em ambientes corp)
 GCLICK_API_VERIFY = os.getenv("GCLICK_API_VERIFY", "true").lower() not in ("0", "false", "no")
 
-# sessão HTTP com auth
-_session = requests.Session()
-_session.verify = GCLICK_API_VERIFY
-if GCLICK_API_TOKEN:
-    _session.headers.update({"Authorization": f"Bearer {GCLICK_API_TOKEN}"})
-_session.headers.update({"Accept": "application/json"})
+# Pool de conexões keep-alive da sessão (consultas de detalhes podem ser paralelas)
+GCLICK_DETAILS_POOL_SIZE = int(os.getenv("GCLICK_DETAILS_POOL_SIZE", "20"))
+
+# Breaker próprio: GCLICK_API_BASE pode ser outro host, e falhas dele não devem
+# abrir o circuito da API G-Click (nem o contrário)
+_detalhes_breaker = CircuitBreaker(
+    "gclick_detalhes",
+    CircuitBreakerConfig(
+        failure_threshold=int(os.getenv("GCLICK_DETAILS_CB_FAILURES", "10")),
+        recovery_timeout_seconds=int(os.getenv("GCLICK_DETAILS_CB_COOLDOWN", "30")),
+    ),
+)
+
+# sessão HTTP com auth (criada sob demanda: requests só é importado se houver consulta)
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> "requests.Session":
+    global _session
+    if _session is not None:
+        return _session
+
+    # Double-checked: threads do prefetch de detalhes podem chegar juntas aqui
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=GCLICK_DETAILS_POOL_SIZE, pool_maxsize=GCLICK_DETAILS_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.verify = GCLICK_API_VERIFY
+            if GCLICK_API_TOKEN:
+                session.headers.update({"Authorization": f"Bearer {GCLICK_API_TOKEN}"})
+            session.headers.update({"Accept": "application/json"})
+            _session = session
+    return _session
 
 
 def _split_task_id(task_id: str) -> Tuple[str, str]:
@@ -46,9 +85,11 @@ def _split_task_id(task_id: str) -> Tuple[str, str]:
 
 def _try_get(url: str, timeout: int = 12, attempts: int = 3) -> Optional[Dict[str, Any]]:
     """GET tolerante com retry exponencial e tratamento de 429 Retry-After."""
+    from .http import GClickHTTPError, breaker_get  # import tardio, como a sessão
+
     for i in range(attempts):
         try:
-            r = _session.get(url, timeout=timeout)
+            r = breaker_get(url, session=_get_session(), breaker=_detalhes_breaker, timeout=timeout)
             if r.status_code == 200:
                 try:
                     return r.json() or {}
@@ -84,6 +125,10 @@ def _try_get(url: str, timeout: int = 12, attempts: int = 3) -> Optional[Dict[st
             logger.warning("[GCLICK] %s -> HTTP %s", url, r.status_code)
             # client errors or non-retriable server errors
             return None
+        except GClickHTTPError as e:
+            # Circuit breaker aberto: não insistir (nem nas rotas de fallback)
+            logger.warning("[GCLICK] %s", e)
+            return None
         except Exception as e:
             logger.warning("[GCLICK] Falha GET %s (attempt %d): %s", url, i + 1, e)
             if i + 1 < attempts:
@@ -158,6 +203,20 @@ def obter_tarefa_detalhes(task_id: str) -> Dict[str, Any]:
     return {}  # falha: devolve vazio para UI fazer fallback
 
 
+def obter_tarefas_detalhes_batch(task_ids: List[str],
+                                 max_workers: int = GCLICK_DETAILS_POOL_SIZE) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca detalhes de várias tarefas em paralelo (sobrepõe a latência de rede).
+    Retorna {task_id: detalhes}; falhas viram {} como em obter_tarefa_detalhes.
+    """
+    ids = list(dict.fromkeys(str(t) for t in task_ids))
+    if not ids:
+        return {}
+    workers = max(1, min(max_workers, len(ids)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(ids, executor.map(obter_tarefa_detalhes, ids)))
+
+
 def _bool_status(valor: Any) -> Optional[bool]:
     """Converte status flexíveis em bool concluído/pendente."""
     if isinstance(valor, bool):
@@ -11,6 +11,9 @@ from engine.notification_engine import run_notification_cycle  # ajustar import
 
 RUN_ID_FORMAT = "%Y%m%dT%H%M%SZ"
 
+# Loader da libyaml (C) quando disponível; mesma semântica do safe_load
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 def build_run_id(prefix: str = "notify") -> str:
     return f"{prefix}_{dt.datetime.utcnow().strftime(RUN_ID_FORMAT)}_{uuid.uuid4().hex[:6]}"
@@ -21,7 +24,7 @@ def load_yaml(path: str | Path):
     if not p.exists():
         return {}
     with open(p, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f) or {}
+        return yaml.load(f, Loader=_YAML_LOADER) or {}
 
 
 def main():
@@ -3,22 +3,82 @@ import time
 from pathlib import Path
 from typing import Optional
 
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+try:  # Windows
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
 class FileLock:
     """Lock simples baseado em arquivo para evitar execuções concorrentes.
 
+    Usa lock do sistema operacional (flock/msvcrt.locking) sobre o arquivo:
+    a espera acontece no kernel e o lock é liberado automaticamente se o
+    processo morrer, sem deixar arquivo de lock "órfão". Com ``timeout=None``
+    a espera é bloqueante sem polling.
+
     Uso:
         from storage.lock import FileLock
         with FileLock('storage/notification.lock', timeout=30):
             # seção crítica
     """
 
-    def __init__(self, path: str | os.PathLike, timeout: int = 30, poll_interval: float = 0.2):
+    def __init__(self, path: str | os.PathLike, timeout: Optional[float] = 30, poll_interval: float = 0.05):
         self.lock_path = Path(path)
         self.timeout = timeout
         self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    def _try_lock(self, fd: int, blocking: bool) -> bool:
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(fd, flags)
+                return True
+            except BlockingIOError:
+                return False
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(self, fd: int) -> None:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
 
     def __enter__(self):
-        start = time.time()
+        if fcntl is None and msvcrt is None:
+            return self._enter_exclusive_create()
+
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if self.timeout is None and fcntl is not None:
+                self._try_lock(fd, blocking=True)
+            else:
+                start = time.monotonic()
+                while not self._try_lock(fd, blocking=False):
+                    if self.timeout is not None and time.monotonic() - start > self.timeout:
+                        raise RuntimeError(f"Timeout aguardando lock: {self.lock_path}")
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    def _enter_exclusive_create(self):
+        """Fallback sem lock de SO: criação exclusiva do arquivo com polling."""
+        start = time.monotonic()
         while True:
             try:
                 # O_CREAT|O_EXCL garante falha se já existir.
@@ -26,12 +86,22 @@ class FileLock:
                 os.close(fd)
                 return self
             except FileExistsError:
-                if time.time() - start > self.timeout:
+                if self.timeout is not None and time.monotonic() - start > self.timeout:
                     raise RuntimeError(f"Timeout aguardando lock: {self.lock_path}")
                 time.sleep(self.poll_interval)
 
     def __exit__(self, exc_type, exc, tb):
+        if self._fd is None:
+            try:
+                os.remove(self.lock_path)
+            except FileNotFoundError:
+                pass
+            return
+
+        # O arquivo é mantido: removê-lo permitiria que outro processo
+        # travasse um inode diferente enquanto um terceiro ainda espera no antigo
+        fd, self._fd = self._fd, None
         try:
-            os.remove(self.lock_path)
-        except FileNotFoundError:
-            pass
\ No newline at end of file
+            self._unlock(fd)
+        finally:
+            os.close(fd)
@@ -1,33 +1,80 @@
 import json
+import os
+import tempfile
 from pathlib import Path
 from threading import RLock
 from datetime import date, datetime, timedelta
+from typing import Optional
 import logging
 
+def _json_default(o):
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    elif isinstance(o, timedelta):
+        return str(o)  # timedelta não tem isoformat()
+    return str(o)
+
 def _json_dumps_safe(obj, **kwargs) -> str:
     """Serializa objetos para JSON com suporte a date/datetime."""
-    def _default(o):
-        if isinstance(o, (date, datetime)):
-            return o.isoformat()
-        elif isinstance(o, timedelta):
-            return str(o)  # timedelta não tem isoformat()
-        return str(o)
-    return json.dumps(obj, ensure_ascii=False, default=_default, **kwargs)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default, **kwargs)
+
+# orjson (quando instalado) serializa direto para bytes e parseia ~2x mais rápido
+try:
+    import orjson  # type: ignore
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_json_default)
+
+    def _loads(raw):
+        return orjson.loads(raw)
+except ImportError:  # pragma: no cover - fallback sem orjson
+    def _dumps(obj) -> bytes:
+        return _json_dumps_safe(obj, separators=(",", ":")).encode("utf-8")
+
+    def _loads(raw):
+        return json.loads(raw)
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    """Grava em arquivo temporário no mesmo diretório e troca com os.replace (sem arquivo truncado).
+
+    mkstemp gera um nome exclusivo por chamada: threads do mesmo processo não
+    disputam o mesmo temporário.
+    """
+    fd, tmp_name = tempfile.mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
 
 _STATE_FILE = Path("storage/notification_state.json")
 _LOCK = RLock()
 
+# Cache em memória das chaves (set), invalidado quando o arquivo muda no disco.
+# A assinatura inclui tamanho e inode: só o mtime pode não mudar entre duas
+# gravações próximas (resolução do sistema de arquivos), e os.replace troca o inode
+_CACHE: Optional[set] = None
+_CACHE_ASSINATURA: Optional[tuple] = None
+
+
+def _assinatura_arquivo() -> tuple:
+    st = _STATE_FILE.stat()
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
 def _ensure_file():
     if not _STATE_FILE.parent.exists():
         _STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
     if not _STATE_FILE.exists():
-        _STATE_FILE.write_text(_json_dumps_safe({"entries": []}))
+        _STATE_FILE.write_bytes(_dumps({"entries": []}))
 
 def load_state():
     with _LOCK:
         _ensure_file()
         try:
-            data = json.loads(_STATE_FILE.read_text(encoding="utf-8"))
+            data = _loads(_STATE_FILE.read_bytes())
             if "entries" not in data:
                 data["entries"] = []
             return data
@@ -35,38 +82,57 @@ def load_state():
             return {"entries": []}
 
 def save_state(data):
+    global _CACHE, _CACHE_ASSINATURA
     with _LOCK:
-        _STATE_FILE.write_text(_json_dumps_safe(data, indent=2))
+        _atomic_write_bytes(_STATE_FILE, _dumps(data))
+        _CACHE = set(data.get("entries", []))
+        _CACHE_ASSINATURA = _assinatura_arquivo()
+
+def _get_cache() -> set:
+    """Set das chaves enviadas; relê o arquivo só se ele mudou desde a última leitura."""
+    global _CACHE, _CACHE_ASSINATURA
+    with _LOCK:
+        _ensure_file()
+        assinatura = _assinatura_arquivo()
+        if _CACHE is None or assinatura != _CACHE_ASSINATURA:
+            _CACHE = set(load_state()["entries"])
+            _CACHE_ASSINATURA = assinatura
+        return _CACHE
 
 def already_sent(key: str) -> bool:
-    data = load_state()
-    return key in data["entries"]
+    return key in _get_cache()
 
 def register_sent(key: str):
-    data = load_state()
-    if key not in data["entries"]:
-        data["entries"].append(key)
-        save_state(data)
+    with _LOCK:
+        if key in _get_cache():
+            return
+        data = load_state()
+        if key not in data["entries"]:
+            data["entries"].append(key)
+            save_state(data)
+
+def _tem_prefixo_data(chave: str) -> bool:
+    """Verifica se a chave começa com YYYY-MM-DD seguido de '|' (ou termina na data)."""
+    return (
+        len(chave) >= 10
+        and chave[4] == "-" and chave[7] == "-"
+        and chave[:4].isdigit() and chave[5:7].isdigit() and chave[8:10].isdigit()
+        and (len(chave) == 10 or chave[10] == "|")
+    )
 
 def purge_older_than(days: int = 7):
     """
     Remove entradas com data anterior a hoje - days (segurança).
     Formato chave: YYYY-MM-DD|apelido|...
     """
-    today = date.today()
+    # Datas ISO (YYYY-MM-DD) ordenam lexicograficamente: basta comparar o prefixo
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
     data = load_state()
-    kept = []
-    for k in data["entries"]:
-        try:
-            d_str = k.split("|", 1)[0]
-            y, m, d = map(int, d_str.split("-"))
-            kd = date(y, m, d)
-            delta = (today - kd).days
-            if delta <= days:
-                kept.append(k)
-        except Exception:
-            # se formato inesperado, mantemos por segurança
-            kept.append(k)
+    kept = [
+        k for k in data["entries"]
+        # se formato inesperado, mantemos por segurança
+        if not _tem_prefixo_data(k) or k[:10] >= cutoff
+    ]
     if len(kept) != len(data["entries"]):
         data["entries"] = kept
         save_state(data)
@@ -86,52 +152,80 @@ class NotificationStateStorage:
             # Usar path padrão mas com estrutura expandida
             self.file_path = Path("storage/notification_state_v2.json")
         self._data = self._load_state()
+        # Índice em memória (dia -> set de chaves) espelhando as listas do JSON
+        self._indice: dict = {}
+        # Serializa marcações e gravações (a instância global é compartilhada entre threads)
+        self._lock = RLock()
     
     def _load_state(self) -> dict:
         """Carrega estado do arquivo JSON"""
         try:
             if self.file_path.exists():
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return _loads(self.file_path.read_bytes())
         except Exception as e:
             logging.warning(f"Erro ao carregar estado: {e}")
         return {"sent_today": {}, "metadata": {"version": "2.0", "created": datetime.now().isoformat()}}
     
     def _save_state(self):
         """Salva estado no arquivo JSON"""
-        try:
-            self.file_path.parent.mkdir(parents=True, exist_ok=True)
-            # Atualizar metadata
-            self._data["metadata"]["last_updated"] = datetime.now().isoformat()
+        with self._lock:
+            try:
+                self.file_path.parent.mkdir(parents=True, exist_ok=True)
+                # Atualizar metadata
+                self._data["metadata"]["last_updated"] = datetime.now().isoformat()
             
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self._data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logging.error(f"Erro ao salvar estado: {e}")
+                _atomic_write_bytes(self.file_path, _dumps(self._data))
+            except Exception as e:
+                logging.error(f"Erro ao salvar estado: {e}")
     
     def get_sent_today(self, chave_individual: str) -> bool:
         """Verifica se chave específica foi enviada hoje"""
         dia = chave_individual.split("|", 1)[0]
-        enviados_dia = self._data.get("sent_today", {}).get(dia, [])
-        # Converte para set em memória para busca rápida
-        return chave_individual in set(enviados_dia)
+        return chave_individual in self._indice_do_dia(dia)
+    
+    def _indice_do_dia(self, dia: str) -> set:
+        """Set das chaves enviadas no dia, montado uma única vez a partir da lista persistida"""
+        indice = self._indice.get(dia)
+        if indice is None:
+            indice = set(self._data.get("sent_today", {}).get(dia, []))
+            self._indice[dia] = indice
+        return indice
     
     def mark_sent_today(self, chave_individual: str):
         """Marca chave específica como enviada hoje (JSON-friendly)"""
-        dia = chave_individual.split("|", 1)[0]
+        with self._lock:
+            dia = chave_individual.split("|", 1)[0]
         
-        # Inicializa estrutura se necessário
-        if "sent_today" not in self._data:
-            self._data["sent_today"] = {}
-        if dia not in self._data["sent_today"]:
-            self._data["sent_today"][dia] = []
+            # Inicializa estrutura se necessário
+            if "sent_today" not in self._data:
+                self._data["sent_today"] = {}
+            if dia not in self._data["sent_today"]:
+                self._data["sent_today"][dia] = []
+        
+            # Adiciona apenas se não existe (evita duplicatas)
+            indice = self._indice_do_dia(dia)
+            if chave_individual not in indice:
+                indice.add(chave_individual)
+                self._data["sent_today"][dia].append(chave_individual)
         
-        # Adiciona apenas se não existe (evita duplicatas)
-        if chave_individual not in self._data["sent_today"][dia]:
-            self._data["sent_today"][dia].append(chave_individual)
+            self._cleanup_old_dates()
+            self._save_state()
+    
+    def mark_sent_today_batch(self, chaves_individuais: list):
+        """Marca várias chaves como enviadas com uma única gravação do estado"""
+        with self._lock:
+            if not chaves_individuais:
+                return
+            sent_today = self._data.setdefault("sent_today", {})
+            for chave_individual in chaves_individuais:
+                dia = chave_individual.split("|", 1)[0]
+                indice = self._indice_do_dia(dia)
+                if chave_individual not in indice:
+                    indice.add(chave_individual)
+                    sent_today.setdefault(dia, []).append(chave_individual)
         
-        self._cleanup_old_dates()
-        self._save_state()
+            self._cleanup_old_dates()
+            self._save_state()
     
     def _cleanup_old_dates(self):
         """Remove dados antigos (>7 dias) para manter storage limpo"""
@@ -148,6 +242,7 @@ class NotificationStateStorage:
         
         for data in dates_to_remove:
             del self._data["sent_today"][data]
+            self._indice.pop(data, None)
             
         if dates_to_remove:
             logging.info(f"🧹 Limpeza automática: removidos {len(dates_to_remove)} dias antigos")
@@ -184,10 +279,16 @@ def aplicar_filtro_idempotencia(buckets_originais: dict, apelido: str, hoje_brt:
 
 def marcar_envios_bem_sucedidos(envios_realizados: list, state_storage):
     """Marca como enviado apenas após sucesso (evita fantasmas)"""
-    for chave, sucesso in envios_realizados:
-        if sucesso:
+    chaves = [chave for chave, sucesso in envios_realizados if sucesso]
+    if not chaves:
+        return
+    if hasattr(state_storage, "mark_sent_today_batch"):
+        state_storage.mark_sent_today_batch(chaves)
+    else:
+        for chave in chaves:
             state_storage.mark_sent_today(chave)
-            logging.info(f"✅ Marcado como enviado: {chave}")
+    for chave in chaves:
+        logging.info(f"✅ Marcado como enviado: {chave}")
 
 
 # Instância global para compatibility
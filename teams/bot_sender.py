@@ -1,18 +1,116 @@
 import os
 import json
+import atexit
+import hashlib
 import logging
+import threading
+import time
 import asyncio
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from botbuilder.core import BotFrameworkAdapter, TurnContext
-from botbuilder.schema import Activity, ConversationReference, Attachment
-from botframework.connector.auth import MicrosoftAppCredentials
+# botbuilder/botframework são importados dentro dos métodos que os usam: pesam
+# no cold start e ConversationReferenceStorage (load/save) não depende deles
+if TYPE_CHECKING:  # pragma: no cover
+    from botbuilder.core import TurnContext
 
 # REMOVIDO: from teams.user_mapping import mapear_apelido_para_teams_id
 # (import não usado neste arquivo)
 
+# (De)serialização JSON: orjson quando disponível (C, bytes direto), senão stdlib
+try:
+    import orjson  # type: ignore
+
+    def _json_loads(raw):
+        return orjson.loads(raw)
+
+    def _json_dumps(obj) -> bytes:
+        # OPT_NON_STR_KEYS: chaves não-str viram str, como no json da stdlib
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:  # pragma: no cover - fallback sem orjson
+    def _json_loads(raw):
+        return json.loads(raw)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _dump_references(fh, refs: dict) -> None:
+    """Grava o dict de referências no arquivo entrada a entrada, sem montar o JSON inteiro em memória."""
+    fh.write(b"{")
+    # Snapshot das entradas: mutações concorrentes não invalidam a iteração
+    for i, (user_id, data) in enumerate(list(refs.items())):
+        if i:
+            fh.write(b",")
+        fh.write(_json_dumps(str(user_id)))
+        fh.write(b":")
+        fh.write(_json_dumps(data))
+    fh.write(b"}")
+
+# Envios simultâneos em broadcast(): o gargalo é o RTT até o Bot Framework
+BROADCAST_CONCORRENCIA = int(os.getenv("BOT_BROADCAST_CONCURRENCY", "32"))
+
+# Alterações no storage são agrupadas (debounce) e gravadas por uma thread de
+# timer, fora do event loop que tratou o turno; pendências vão ao disco no encerramento
+SAVE_DEBOUNCE_SECONDS = float(os.getenv("CONVREF_SAVE_DEBOUNCE", "0.5"))
+
+# Referências sem nenhuma atividade (armazenamento ou envio) há mais de N dias
+# são descartadas no save(); cada envio renova o prazo. 0 desativa a expiração
+CONVREF_TTL_DAYS = int(os.getenv("CONVREF_TTL_DAYS", "90"))
+
+# Opcional: reenvio do mesmo cartão ao mesmo usuário dentro desta janela (segundos)
+# é suprimido sem chamada HTTPS (send_message devolve None). Desligado por padrão
+# (0): reenvios intencionais (repetir_no_mesmo_dia, TEST_MODE, retries manuais)
+# precisam sair de fato. Respostas só de texto não passam pelo filtro
+SEND_DEDUP_SECONDS = float(os.getenv("BOT_SEND_DEDUP_SECONDS", "0"))
+
+ADAPTIVE_CARD_CONTENT_TYPE = "application/vnd.microsoft.card.adaptive"
+
+
+def _ultimo_uso(ref) -> Optional[str]:
+    """Timestamp ISO mais recente da referência (stored_at/last_activity); None se não houver."""
+    if not isinstance(ref, dict):
+        return None
+    marcas = (ref.get("stored_at"), (ref.get("last_activity") or {}).get("timestamp"))
+    return max((m for m in marcas if isinstance(m, str)), default=None)
+
+
+# trust_service_url confia na URL por tempo limitado (1 dia no botframework):
+# cada service_url é reconfirmada periodicamente, não a cada envio
+_TRUST_REFRESH_SECONDS = 3600.0
+_trusted_service_urls = {}  # service_url -> próxima reconfirmação (monotonic)
+
+
+def _trust_service_url(service_url: Optional[str]) -> None:
+    if not service_url:
+        return
+    agora = time.monotonic()
+    if _trusted_service_urls.get(service_url, 0.0) > agora:
+        return
+    from botframework.connector.auth import MicrosoftAppCredentials
+
+    MicrosoftAppCredentials.trust_service_url(service_url)
+    _trusted_service_urls[service_url] = agora + _TRUST_REFRESH_SECONDS
+
+
+# Conversão de card_json por tipo exato: lookup direto, sem cadeia de isinstance
+_CARD_PARSERS = {
+    str: _json_loads,
+    bytes: _json_loads,
+    dict: lambda card: card,
+}
+
+
+def _card_to_dict(card_json) -> dict:
+    """Converte card_json (str, bytes ou dict) em dict; JSON é parseado aqui, uma única vez."""
+    parser = _CARD_PARSERS.get(type(card_json))
+    if parser is not None:
+        return parser(card_json)
+    if isinstance(card_json, dict):  # subclasses (OrderedDict etc.)
+        return card_json
+    raise TypeError("card_json must be str, bytes or dict")
+
 class BotSender:
     """
     Gerenciador de mensagens proativas para o Bot Framework.
@@ -32,8 +130,10 @@ class BotSender:
         self.app_id = app_id
         self.conversation_storage = conversation_storage  # Storage object, não dict
         self.logger = logging.getLogger("BotSender")
+        self._send_dedup = {}  # (user_id, hash do conteúdo) -> expiração (monotonic)
+        self._send_dedup_lock = threading.Lock()  # broadcasts enviam em paralelo
     
-    async def send_message(self, user_id: str, message: str, card_json: Optional[str] = None) -> bool:
+    async def send_message(self, user_id: str, message: str, card_json: Optional[Union[str, dict]] = None) -> Optional[bool]:
         """
         Envia mensagem proativa para um usuário específico.
         
@@ -43,7 +143,8 @@ class BotSender:
             card_json: JSON de um Adaptive Card (opcional)
             
         Returns:
-            bool: True se enviado com sucesso, False caso contrário
+            Optional[bool]: True se enviado com sucesso, False em caso de falha e
+            None se suprimido pelo dedup (BOT_SEND_DEDUP_SECONDS): nada foi enviado
         """
         # Se estivermos em TEST_MODE, forçar todas as mensagens para o TEST_USER_TEAMS_ID
         test_mode = os.environ.get('TEST_MODE', 'false').lower() in ('1', 'true', 'yes')
@@ -53,138 +154,193 @@ class BotSender:
                 self.logger.info("🧪 [TEST_MODE] Forçando envio para %s (original: %s)", test_user, user_id)
                 user_id = test_user
 
-        # Usa o storage em tempo real, não uma cópia
-        cref_data = self.conversation_storage.get(user_id)
-        if not cref_data:
-            self.logger.warning(f"Nenhuma referência para user_id={user_id}")
-            return False
-        
-        # Reconstrói ConversationReference a partir dos dados salvos
+        # Usa o storage em tempo real, não uma cópia (desserialização cacheada)
         try:
-            if isinstance(cref_data, dict):
-                cref = ConversationReference().deserialize(cref_data)
-            else:
-                cref = cref_data  # Já é ConversationReference
+            cref = self.conversation_storage.get_cref(user_id)
         except Exception as e:
-            self.logger.error(f"Erro ao deserializar referência para {user_id}: {e}")
+            self.logger.error("Erro ao deserializar referência para %s: %s", user_id, e)
+            return False
+        if cref is None:
+            self.logger.warning("Nenhuma referência para user_id=%s", user_id)
             return False
             
+        # Cartão convertido para dict uma única vez, fora do callback
+        card_data = None
+        if card_json:
+            try:
+                card_data = _card_to_dict(card_json)
+            except (TypeError, ValueError) as e:
+                self.logger.error("Erro ao parsear JSON do cartão: %s", e)
+
+        dedup_key = self._dedup_key(user_id, message, card_data)
+        if dedup_key is not None and self._envio_recente(dedup_key):
+            self.logger.info("Envio duplicado suprimido para %s (mesmo conteúdo há menos de %ss)", user_id, SEND_DEDUP_SECONDS)
+            return None
+
+        from botbuilder.schema import Activity, Attachment
+
+        # Attachment montado uma vez por envio, fora do callback. A Activity
+        # continua nova a cada envio: send_activity a completa com os dados da conversa
+        card_attachment = None
+        if card_data:
+            card_attachment = Attachment(content_type=ADAPTIVE_CARD_CONTENT_TYPE, content=card_data)
+
         try:
             # Trust service URL para evitar erros de autenticação
-            MicrosoftAppCredentials.trust_service_url(cref.service_url)
+            _trust_service_url(cref.service_url)
             
             # Define callback que será executado no contexto da conversa
-            async def _send_callback(turn_context: TurnContext):
+            async def _send_callback(turn_context: "TurnContext"):
                 response = None
-                if card_json:
+                if card_attachment is not None:
                     # Envio como cartão adaptativo
                     try:
-                        card_data = json.loads(card_json)
-                        card_attachment = Attachment(
-                            content_type="application/vnd.microsoft.card.adaptive",
-                            content=card_data
-                        )
                         activity = Activity(
                             type="message",
                             text=message,  # Texto de fallback caso o card não renderize
                             attachments=[card_attachment]
                         )
                         response = await turn_context.send_activity(activity)
-                        self.logger.info(f"Cartão adaptativo enviado para {user_id}")
-                    except json.JSONDecodeError as e:
-                        self.logger.error(f"Erro ao parsear JSON do cartão: {e}")
-                        response = await turn_context.send_activity(message)
+                        self.logger.debug("Cartão adaptativo enviado para %s", user_id)
                     except Exception as e:
-                        self.logger.error(f"Erro ao enviar cartão: {e}")
+                        self.logger.error("Erro ao enviar cartão: %s", e)
                         response = await turn_context.send_activity(message)
                 else:
                     # Envio como mensagem texto simples
                     response = await turn_context.send_activity(message)
 
-                # Tentar gravar o id da activity no conversation_storage se disponível
+                # Registrar o id da activity enviada (sem regravar o arquivo inteiro)
                 try:
-                    if response and hasattr(response, 'id') and response.id and self.conversation_storage:
-                        # Normalizar storage para suportar dict ou objeto com .references
-                        # Se for dict-like storage (ConversationReferenceStorage in this module)
-                        if hasattr(self.conversation_storage, 'references') and isinstance(self.conversation_storage.references, dict):
-                            existing = self.conversation_storage.references.get(user_id, {})
-                            if isinstance(existing, dict):
-                                existing.setdefault('last_activity', {})
-                                existing['last_activity']['id'] = response.id
-                                existing['last_activity']['timestamp'] = datetime.utcnow().isoformat()
-                                self.conversation_storage.references[user_id] = existing
-                                # tentar persistir
-                                if hasattr(self.conversation_storage, 'save'):
-                                    try:
-                                        self.conversation_storage.save()
-                                    except Exception:
-                                        self.logger.debug("Falha ao salvar conversation_storage após atualizar last_activity", exc_info=True)
+                    if response and getattr(response, 'id', None):
+                        self.conversation_storage.record_last_activity(user_id, response.id)
                 except Exception:
-                    # Não obrigar a persistência se falhar
-                    self.logger.debug("Não foi possível salvar last_activity no storage para %s", user_id, exc_info=True)
+                    # Não obrigar a persistência se falhar, mas não esconder a falha
+                    self.logger.warning("Não foi possível salvar last_activity no storage para %s", user_id, exc_info=True)
                 
             # Continua a conversa usando a referência armazenada
             await self.adapter.continue_conversation(cref, _send_callback, self.app_id)
-            self.logger.info(f"Mensagem enviada com sucesso para user_id={user_id}")
+            self.logger.info("Mensagem enviada com sucesso para user_id=%s", user_id)
+            if dedup_key is not None:
+                self._registrar_envio(dedup_key)
             return True
         except Exception as e:
-            self.logger.error(f"Falha ao enviar mensagem para user_id={user_id}: {e}", exc_info=True)
+            self.logger.error("Falha ao enviar mensagem para user_id=%s: %s", user_id, e, exc_info=True)
             return False
     
-    async def send_card(self, user_id: str, card_json: str, fallback_message: str = "Notificação do G-Click") -> bool:
+    @staticmethod
+    def _dedup_key(user_id: str, message: str, card_data: Optional[dict]):
+        """Chave (user_id, hash do texto + cartão) para suprimir reenvios idênticos de cartões."""
+        if SEND_DEDUP_SECONDS <= 0 or card_data is None:
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        h.update((message or "").encode("utf-8"))
+        h.update(b"\0")
+        h.update(_json_dumps(card_data))
+        return (user_id, h.hexdigest())
+
+    def _envio_recente(self, key) -> bool:
+        with self._send_dedup_lock:
+            return self._send_dedup.get(key, 0.0) > time.monotonic()
+
+    def _registrar_envio(self, key) -> None:
+        with self._send_dedup_lock:
+            agora = time.monotonic()
+            if len(self._send_dedup) >= 1024:
+                # Poda ocasional das entradas já expiradas
+                self._send_dedup = {k: exp for k, exp in self._send_dedup.items() if exp > agora}
+            self._send_dedup[key] = agora + SEND_DEDUP_SECONDS
+
+    async def send_card(self, user_id: str, card_json: Union[str, dict], fallback_message: str = "Notificação do G-Click") -> Optional[bool]:
         """
         Envia um cartão adaptativo para um usuário específico.
         
         Args:
             user_id: ID do usuário no Teams
-            card_json: JSON do Adaptive Card
+            card_json: Adaptive Card (JSON em str ou dict já parseado)
             fallback_message: Mensagem de fallback caso o cartão não seja suportado
             
         Returns:
-            bool: True se enviado com sucesso, False caso contrário
+            Optional[bool]: como send_message (None = suprimido pelo dedup)
         """
         return await self.send_message(user_id, fallback_message, card_json)
 
+    async def broadcast(self, user_ids: Iterable[str], message: str, card_json=None,
+                        concurrency: Optional[int] = None) -> List[Union[Optional[bool], BaseException]]:
+        """
+        Envia a mesma mensagem/cartão para vários usuários em paralelo.
+
+        Os envios são sobrepostos com asyncio.gather, limitados por um semáforo
+        (BROADCAST_CONCORRENCIA por padrão) para não saturar o conector.
+
+        Returns:
+            Lista na mesma ordem de user_ids com o resultado de send_message
+            (ou a exceção levantada para aquele usuário).
+        """
+        if card_json:
+            # Parse único para todos os destinatários
+            card_json = _card_to_dict(card_json)
+        user_ids = list(user_ids)
+        self._trust_service_urls(user_ids)
+        sem = asyncio.Semaphore(concurrency or BROADCAST_CONCORRENCIA)
+
+        async def _one(uid: str):
+            async with sem:
+                return await self.send_message(uid, message, card_json)
+
+        return await asyncio.gather(*(_one(uid) for uid in user_ids), return_exceptions=True)
+
+    def _trust_service_urls(self, user_ids: Iterable[str]) -> None:
+        """Confia em cada service_url distinto dos destinatários uma única vez."""
+        if not self.conversation_storage:
+            return
+        urls = set()
+        for uid in user_ids:
+            try:
+                cref = self.conversation_storage.get_cref(uid)
+            except Exception:
+                continue  # send_message registra o erro deste usuário
+            if cref is not None and getattr(cref, "service_url", None):
+                urls.add(cref.service_url)
+        for url in urls:
+            _trust_service_url(url)
+
     async def update_card(self, user_id: str, activity_id: str, card_json: str, fallback_message: str = "Notificação do G-Click") -> bool:
         """
         Atualiza um cartão/adaptive card previamente enviado (replace/update activity).
         """
-        cref_data = self.conversation_storage.get(user_id)
-        if not cref_data:
-            self.logger.warning(f"Nenhuma referência para user_id={user_id} (update_card)")
-            return False
-
         try:
-            if isinstance(cref_data, dict):
-                cref = ConversationReference().deserialize(cref_data)
-            else:
-                cref = cref_data
+            cref = self.conversation_storage.get_cref(user_id)
         except Exception as e:
-            self.logger.error(f"Erro ao deserializar referência para update_card {user_id}: {e}")
+            self.logger.error("Erro ao deserializar referência para update_card %s: %s", user_id, e)
+            return False
+        if cref is None:
+            self.logger.warning("Nenhuma referência para user_id=%s (update_card)", user_id)
             return False
 
+        from botbuilder.schema import Activity, Attachment
+
         try:
-            MicrosoftAppCredentials.trust_service_url(cref.service_url)
+            _trust_service_url(cref.service_url)
+            card_data = _card_to_dict(card_json)
 
-            async def _update_callback(turn_context: TurnContext):
+            async def _update_callback(turn_context: "TurnContext"):
                 try:
-                    card_data = json.loads(card_json)
                     card_attachment = Attachment(
-                        content_type="application/vnd.microsoft.card.adaptive",
+                        content_type=ADAPTIVE_CARD_CONTENT_TYPE,
                         content=card_data
                     )
                     activity = Activity(type="message", id=activity_id, text=fallback_message, attachments=[card_attachment])
                     await turn_context.update_activity(activity)
-                    self.logger.info(f"Cartão atualizado para {user_id} activity_id={activity_id}")
+                    self.logger.info("Cartão atualizado para %s activity_id=%s", user_id, activity_id)
                     return True
                 except Exception as e:
-                    self.logger.error(f"Erro ao atualizar cartão para {user_id}: {e}", exc_info=True)
+                    self.logger.error("Erro ao atualizar cartão para %s: %s", user_id, e, exc_info=True)
                     return False
 
             await self.adapter.continue_conversation(cref, _update_callback, self.app_id)
             return True
         except Exception as e:
-            self.logger.error(f"Falha ao atualizar mensagem para user_id={user_id}: {e}", exc_info=True)
+            self.logger.error("Falha ao atualizar mensagem para user_id=%s: %s", user_id, e, exc_info=True)
             return False
 
 class ConversationReferenceStorage:
@@ -196,41 +352,133 @@ class ConversationReferenceStorage:
             project_root = Path(__file__).parent.parent
             file_path = project_root / "storage" / "conversation_references.json"
         self.file_path = file_path
-        self.references = self._load()
-        
+        self._dirty = 0
+        self._save_timer = None
+        self._timer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._deser_cache = {}
+        self._cref_dict_cache = {}  # v2.0 -> dict no formato antigo, montado uma vez
+        atexit.register(self.flush)
+        self._load_lock = threading.Lock()
+        self._references = None
+
+    @property
+    def references(self) -> dict:
+        """Referências, carregadas no primeiro acesso: o cold start não paga o parse do arquivo."""
+        refs = self._references
+        if refs is None:
+            with self._load_lock:
+                if self._references is None:
+                    self._references = self._load()
+                refs = self._references
+        return refs
+
+    @references.setter
+    def references(self, value: dict) -> None:
+        self._references = value
+        self._deser_cache.clear()
+        self._cref_dict_cache.clear()
+
+    def _invalidar_caches(self, user_id: str) -> None:
+        """Descarta as formas derivadas (cref desserializada, dict antigo) de um usuário."""
+        self._deser_cache.pop(user_id, None)
+        self._cref_dict_cache.pop(user_id, None)
+
     def _load(self):
         """Carrega referências do arquivo."""
         path = Path(self.file_path)
+        data = {}
         if path.exists():
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                data = _json_loads(path.read_bytes())
             except Exception as e:
-                logging.error(f"Erro ao carregar referências: {e}")
-        return {}
+                logging.error("Erro ao carregar referências: %s", e)
+        self._aplicar_log_atividades(data)
+        return data
         
     def save(self):
+        """Grava imediatamente todas as referências (uma gravação por vez)."""
+        with self._write_lock:
+            self._dirty = 0
+            self._gc()
+            self._write()
+
+    def _gc(self) -> int:
+        """Remove referências expiradas (ver CONVREF_TTL_DAYS); retorna quantas saíram."""
+        if CONVREF_TTL_DAYS <= 0:
+            return 0
+        limite = (datetime.utcnow() - timedelta(days=CONVREF_TTL_DAYS)).isoformat()
+        refs = self.references
+        expirados = [uid for uid, ref in list(refs.items()) if (_ultimo_uso(ref) or limite) < limite]
+        for user_id in expirados:
+            refs.pop(user_id, None)
+            self._invalidar_caches(user_id)
+        if expirados:
+            logging.info("Removidas %d referências sem atividade há mais de %d dias", len(expirados), CONVREF_TTL_DAYS)
+        return len(expirados)
+
+    def _activity_log_path(self) -> Path:
+        return Path(self.file_path).with_suffix('.log')
+
+    def _aplicar_log_atividades(self, refs: dict) -> None:
+        """Aplica sobre refs as atualizações de last_activity registradas após o último snapshot."""
+        log_path = self._activity_log_path()
+        if not log_path.exists():
+            return
+        try:
+            with open(log_path, "rb") as fh:
+                for linha in fh:
+                    try:
+                        entrada = _json_loads(linha)
+                    except ValueError:
+                        continue  # linha truncada por queda no meio do append
+                    ref = refs.get(entrada.get("user_id"))
+                    if isinstance(ref, dict):
+                        ref.setdefault('last_activity', {}).update(id=entrada.get("id"), timestamp=entrada.get("ts"))
+        except OSError as e:
+            logging.error("Erro ao ler log de last_activity: %s", e)
+
+    def record_last_activity(self, user_id: str, activity_id: str) -> None:
+        """
+        Registra o id da última activity enviada ao usuário.
+
+        Com arquivo, a atualização vira uma linha num log append-only em vez de
+        regravar todas as referências; o próximo snapshot (save) o consolida.
+        """
+        existing = self.references.get(user_id)
+        if not isinstance(existing, dict):
+            return
+        now_iso = datetime.utcnow().isoformat()
+        linha = _json_dumps({"user_id": user_id, "id": activity_id, "ts": now_iso}) + b"\n"
+        # Mesmo lock do save(): a linha entra no log antes do snapshot ou depois de ele limpar o log
+        with self._write_lock:
+            existing.setdefault('last_activity', {}).update(id=activity_id, timestamp=now_iso)
+            try:
+                with open(self._activity_log_path(), "ab") as fh:
+                    fh.write(linha)
+                return
+            except OSError as e:
+                logging.warning("Falha ao gravar log de last_activity (%s); agendando snapshot", e)
+        self.mark_dirty()
+
+    def _write(self):
         """Salva referências no arquivo com serialização correta."""
         path = Path(self.file_path)
         os.makedirs(path.parent, exist_ok=True)
         
         try:
-            # Serializa ConversationReference objects para dict antes de salvar
-            serializable_refs = {}
-            for user_id, cref in self.references.items():
-                if hasattr(cref, 'serialize'):
-                    # É um ConversationReference object
-                    serializable_refs[user_id] = cref.serialize()
-                else:
-                    # Já é um dict
-                    serializable_refs[user_id] = cref
-                    
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(serializable_refs, f, indent=2, ensure_ascii=False)
-                
-            logging.info(f"Referências salvas: {len(serializable_refs)} entries em {self.file_path}")
+            # Referências já são armazenadas serializadas (ver add()); grava em
+            # arquivo temporário e troca atomicamente (os.replace) pelo original
+            tmp_path = path.with_suffix('.json.tmp')
+            with open(tmp_path, "wb") as fh:
+                _dump_references(fh, self.references)
+            os.replace(tmp_path, path)
+            # Snapshot já contém as atualizações de last_activity do log
+            self._activity_log_path().unlink(missing_ok=True)
+
+            logging.info("Referências salvas: %d entries em %s", len(self.references), self.file_path)
         except Exception as e:
-            logging.error(f"Erro ao salvar referências: {e}")
+            logging.error("Erro ao salvar referências: %s", e)
             
     def store_conversation_reference(self, user_id: str, conversation_data: dict = None, **kwargs):
         """
@@ -241,13 +489,15 @@ class ConversationReferenceStorage:
             conversation_data: Dados estruturados da conversa (nova API)
             **kwargs: Compatibilidade com API antiga (conversation_id, service_url, etc.)
         """
+        # Um único timestamp para stored_at e last_activity desta chamada
+        now_iso = datetime.utcnow().isoformat()
         try:
             if conversation_data:
                 # Nova API: dados estruturados
                 reference_data = {
                     "user_id": user_id,
                     "conversation_data": conversation_data,
-                    "stored_at": datetime.utcnow().isoformat(),
+                    "stored_at": now_iso,
                     "version": "2.0"
                 }
             else:
@@ -257,7 +507,7 @@ class ConversationReferenceStorage:
                 activity_data = kwargs.get("activity_data", {})
                 
                 if not conversation_id:
-                    logging.warning(f"conversation_id ausente para user_id={user_id}")
+                    logging.warning("conversation_id ausente para user_id=%s", user_id)
                     return
                 
                 # Construir dados estruturados a partir da API antiga
@@ -282,21 +532,22 @@ class ConversationReferenceStorage:
                         "timezone": activity_data.get("timezone", "America/Sao_Paulo"),
                         "last_activity": {
                             "type": activity_data.get("type"),
-                            "timestamp": datetime.utcnow().isoformat(),
+                            "timestamp": now_iso,
                             "id": activity_data.get("id")
                         }
                     },
-                    "stored_at": datetime.utcnow().isoformat(),
+                    "stored_at": now_iso,
                     "version": "2.0"
                 }
             
             # Armazenar usando novo formato
             self.references[user_id] = reference_data
-            self.save()
-            logging.info(f"ConversationReference robusta armazenada para user_id={user_id}")
+            self._invalidar_caches(user_id)
+            self.mark_dirty()
+            logging.info("ConversationReference robusta armazenada para user_id=%s", user_id)
             
         except Exception as e:
-            logging.error(f"Erro ao armazenar ConversationReference para {user_id}: {e}")
+            logging.error("Erro ao armazenar ConversationReference para %s: %s", user_id, e)
 
     def get_conversation_reference(self, user_id: str):
         """
@@ -319,12 +570,41 @@ class ConversationReferenceStorage:
         # Formato antigo ou ConversationReference object
         return ref_data
         
+    def flush(self):
+        """Persiste alterações pendentes, se houver."""
+        if self._dirty:
+            self.save()
+
+    def mark_dirty(self):
+        """Registra alteração pendente e agenda uma gravação agrupada (debounce)."""
+        self._dirty += 1
+        with self._timer_lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DEBOUNCE_SECONDS, self._flush_timer)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _flush_timer(self):
+        with self._timer_lock:
+            self._save_timer = None
+        try:
+            self.flush()
+        except Exception:
+            logging.error("Erro ao gravar referências pendentes", exc_info=True)
+
     def add(self, user_id, reference):
-        """Adiciona/atualiza referência e salva (compatibilidade com API antiga)."""
-        # Armazena a referência original (ConversationReference ou dict)
+        """Adiciona/atualiza referência (compatibilidade com API antiga).
+
+        A gravação é agrupada (ver mark_dirty); chame flush() para forçá-la.
+        """
+        # Serializa uma única vez aqui, para que save() não precise percorrer
+        # e serializar todas as referências a cada gravação
+        if hasattr(reference, 'serialize'):
+            reference = reference.serialize()
         self.references[user_id] = reference
-        self.save()
-        logging.info(f"Referência adicionada para user_id={user_id}")
+        self._invalidar_caches(user_id)
+        self.mark_dirty()
+        logging.info("Referência adicionada para user_id=%s", user_id)
         
     def get(self, user_id):
         """Obtém referência por ID (compatibilidade com API antiga)."""
@@ -334,6 +614,10 @@ class ConversationReferenceStorage:
             
         # Para compatibilidade, retornar dados da conversa se for formato novo
         if isinstance(ref_data, dict) and ref_data.get("version") == "2.0":
+            # Dict montado uma vez por referência (compartilhado: não alterar)
+            cref_dict = self._cref_dict_cache.get(user_id)
+            if cref_dict is not None:
+                return cref_dict
             # Tentar reconstruir ConversationReference a partir dos dados estruturados
             try:
                 conv_data = ref_data["conversation_data"]
@@ -357,14 +641,36 @@ class ConversationReferenceStorage:
                     "serviceUrl": conv_data.get("service_url", ""),
                     "locale": conv_data.get("locale", "pt-BR")
                 }
+                self._cref_dict_cache[user_id] = cref_dict
                 return cref_dict
             except Exception as e:
-                logging.warning(f"Erro ao converter formato novo para antigo: {e}")
+                logging.warning("Erro ao converter formato novo para antigo: %s", e)
                 return ref_data
         
         # Formato antigo
         return ref_data
         
+    def get_cref(self, user_id):
+        """Obtém ConversationReference já desserializada (cacheada por user_id).
+
+        Evita repetir ConversationReference().deserialize() a cada envio; o cache
+        é invalidado quando a referência do usuário é alterada ou removida.
+        """
+        cref = self._deser_cache.get(user_id)
+        if cref is not None:
+            return cref
+        cref_data = self.get(user_id)
+        if not cref_data:
+            return None
+        if isinstance(cref_data, dict):
+            from botbuilder.schema import ConversationReference
+
+            cref = ConversationReference().deserialize(cref_data)
+        else:
+            cref = cref_data  # Já é ConversationReference
+        self._deser_cache[user_id] = cref
+        return cref
+
     def list_users(self):
         """Lista todos os user_ids com referências salvas."""
         return list(self.references.keys())
@@ -373,6 +679,7 @@ class ConversationReferenceStorage:
         """Remove referência de um usuário."""
         if user_id in self.references:
             del self.references[user_id]
-            self.save()
+            self._invalidar_caches(user_id)
+            self.mark_dirty()
             return True
         return False
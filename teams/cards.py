@@ -6,19 +6,51 @@ aos usuários via bot do Teams, oferecendo uma experiência mais rica que mensag
 """
 
 import json
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, date
 
 from utils.gclick_links import montar_link_gclick_obrigacao, EMPRESA_ID_PADRAO
 
+# Trechos fixos dos cards, montados uma única vez no import e reaproveitados
+# por referência em todos os cards (não devem ser alterados pelos chamadores)
+_COLUNA_TITULO_TAREFA = {
+    "type": "Column",
+    "width": "stretch",
+    "items": [
+        {
+            "type": "TextBlock",
+            "text": "Obrigação Fiscal Pendente",
+            "weight": "Bolder",
+            "size": "Medium"
+        }
+    ]
+}
+_ACAO_TOGGLE_DETALHES = {
+    "type": "Action.ToggleVisibility",
+    "title": "📝 Detalhes",
+    "targetElements": ["detalhes_container"]
+}
+_ACOES_RESUMO = [
+    {
+        "type": "Action.OpenUrl",
+        "title": "🔍 Ver Todas no G-Click",
+        "url": "https://app.gclick.com.br/tarefas"
+    }
+]
+_ROTULO_ATIVIDADES = {"type": "TextBlock", "text": "**Atividades:**", "wrap": True, "weight": "Bolder"}
+_ROTULO_OBSERVACOES = {"type": "TextBlock", "text": "**Observações:**", "wrap": True, "weight": "Bolder"}
+_AVISO_SEM_DETALHES = {"type": "TextBlock", "text": "Não foi possível carregar detalhes agora.", "wrap": True}
 
-def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str, Any], detalhes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str, Any], detalhes: Optional[Dict[str, Any]] = None,
+                                  hoje: Optional[date] = None) -> Dict[str, Any]:
     """
     Cria um Adaptive Card para notificação de tarefa/obrigação fiscal.
     
     Args:
         tarefa: Dicionário com dados da tarefa (id, nome, dataVencimento, etc)
         responsavel: Dicionário com dados do responsável (id, nome, apelido, etc)
+        hoje: Data de referência do lote (a mesma da classificação); padrão date.today()
         
     Returns:
         str: JSON do Adaptive Card formatado
@@ -35,47 +67,15 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
     # URL deep-link correto para abrir a obrigação no G-Click
     url_tarefa = montar_link_gclick_obrigacao(id_tarefa, EMPRESA_ID_PADRAO)
     
-    # Determinar cor e ícone baseado na proximidade do vencimento
-    cor_status, icone_status = _determine_urgency_style(data_vencimento)
+    # Cor, ícone e textos do vencimento (memoizados por vencimento e dia)
+    cor_status, icone_status, msg_urgencia, venc_exibicao = _vencimento_para_card(
+        data_vencimento, hoje or date.today())
     
     card = {
         "type": "AdaptiveCard",
         "version": "1.3",
         "body": [
-            {
-                "type": "Container",
-                "style": "emphasis",
-                "items": [
-                    {
-                        "type": "ColumnSet",
-                        "columns": [
-                            {
-                                "type": "Column",
-                                "width": "auto",
-                                "items": [
-                                    {
-                                        "type": "TextBlock",
-                                        "text": icone_status,
-                                        "size": "Large"
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "Column",
-                                "width": "stretch",
-                                "items": [
-                                    {
-                                        "type": "TextBlock",
-                                        "text": "Obrigação Fiscal Pendente",
-                                        "weight": "Bolder",
-                                        "size": "Medium"
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            },
+            _cabecalho_tarefa(icone_status),
             {
                 "type": "TextBlock",
                 "text": nome_tarefa,
@@ -93,7 +93,7 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
                     },
                     {
                         "title": "Vencimento:",
-                        "value": _format_date_for_display(data_vencimento)
+                        "value": venc_exibicao
                     },
                     {
                         "title": "Status:",
@@ -107,7 +107,7 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
             },
             {
                 "type": "TextBlock",
-                "text": _get_urgency_message(data_vencimento),
+                "text": msg_urgencia,
                 "wrap": True,
                 "color": cor_status
             }
@@ -118,11 +118,7 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
                 "title": "📋 Ver no G-Click",
                 "url": url_tarefa
             },
-            {
-                "type": "Action.ToggleVisibility",
-                "title": "📝 Detalhes",
-                "targetElements": ["detalhes_container"]
-            },
+            _ACAO_TOGGLE_DETALHES,
             {
                 "type": "Action.Submit",
                 "title": "✔ Finalizar",
@@ -143,9 +139,10 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
 
             atividades = detalhes.get("atividades_compactas") or []
             if atividades:
-                detalhes_card_body.append({"type": "TextBlock", "text": "**Atividades:**", "wrap": True, "weight": "Bolder"})
-                for linha in atividades:
-                    detalhes_card_body.append({"type": "TextBlock", "text": linha, "wrap": True, "spacing": "None"})
+                detalhes_card_body.append(_ROTULO_ATIVIDADES)
+                detalhes_card_body.extend(
+                    {"type": "TextBlock", "text": linha, "wrap": True, "spacing": "None"} for linha in atividades
+                )
 
             meta = detalhes.get("meta_interna")
             if meta:
@@ -153,7 +150,7 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
 
             obs = detalhes.get("observacoes")
             if obs:
-                detalhes_card_body.append({"type": "TextBlock", "text": "**Observações:**", "wrap": True, "weight": "Bolder"})
+                detalhes_card_body.append(_ROTULO_OBSERVACOES)
                 detalhes_card_body.append({"type": "TextBlock", "text": obs, "wrap": True})
 
             pend = detalhes.get("pendentes_total")
@@ -161,7 +158,7 @@ def create_task_notification_card(tarefa: Dict[str, Any], responsavel: Dict[str,
             if pend is not None or concl is not None:
                 detalhes_card_body.append({"type": "TextBlock", "text": f"Pendentes: {pend} — Concluídas: {concl}", "wrap": True})
         else:
-            detalhes_card_body.append({"type": "TextBlock", "text": "Não foi possível carregar detalhes agora.", "wrap": True})
+            detalhes_card_body.append(_AVISO_SEM_DETALHES)
 
         # adicionar container oculto com id 'detalhes_container'
         detalhes_container = {
@@ -253,13 +250,7 @@ def create_summary_notification_card(resumo: Dict[str, Any], responsavel: str) -
                 "color": cor_principal
             }
         ],
-        "actions": [
-            {
-                "type": "Action.OpenUrl",
-                "title": "🔍 Ver Todas no G-Click",
-                "url": "https://app.gclick.com.br/tarefas"
-            }
-        ]
+        "actions": _ACOES_RESUMO
     }
     
     # Adicionar detalhes se houver tarefas pendentes
@@ -292,88 +283,156 @@ def create_summary_notification_card(resumo: Dict[str, Any], responsavel: str) -
     return json.dumps(card, ensure_ascii=False, indent=2)
 
 
-def _determine_urgency_style(data_vencimento: str) -> tuple[str, str]:
+def _parse_venc(data_vencimento: Any) -> Optional[date]:
+    """
+    Converte a data de vencimento (YYYY-MM-DD) uma única vez por card.
+    
+    Returns:
+        date, ou None se a data estiver vazia ou inválida
+    """
+    if not data_vencimento:
+        return None
+    try:
+        return date.fromisoformat(data_vencimento)
+    except (TypeError, ValueError):
+        pass
+    try:
+        # strptime também aceita dia/mês sem zero à esquerda
+        return datetime.strptime(data_vencimento, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _determine_urgency_style(dt_venc: Optional[date], hoje: date) -> tuple[str, str]:
     """
     Determina a cor e ícone baseado na proximidade do vencimento.
     
     Args:
-        data_vencimento: Data de vencimento no formato YYYY-MM-DD
+        dt_venc: Data de vencimento já convertida (ver _parse_venc)
+        hoje: Data de referência
         
     Returns:
         tuple: (cor, icone) para usar no card
     """
-    if not data_vencimento:
+    if dt_venc is None:
         return "default", "📋"
     
-    try:
-        dt_venc = datetime.strptime(data_vencimento, "%Y-%m-%d").date()
-        hoje = date.today()
-        
-        if dt_venc < hoje:
-            return "attention", "🔴"  # Vencida
-        elif dt_venc == hoje:
-            return "warning", "🟡"   # Vence hoje
+    if dt_venc < hoje:
+        return "attention", "🔴"  # Vencida
+    elif dt_venc == hoje:
+        return "warning", "🟡"   # Vence hoje
+    else:
+        delta = (dt_venc - hoje).days
+        if delta <= 3:
+            return "good", "🟢"  # Vence em breve
         else:
-            delta = (dt_venc - hoje).days
-            if delta <= 3:
-                return "good", "🟢"  # Vence em breve
-            else:
-                return "default", "📅"  # Futuro
-                
-    except Exception:
-        return "default", "📋"
+            return "default", "📅"  # Futuro
 
 
-def _format_date_for_display(data_vencimento: str) -> str:
+def _format_date_for_display(data_vencimento: str, dt_venc: Optional[date]) -> str:
     """
     Formata a data para exibição mais amigável.
     
     Args:
-        data_vencimento: Data no formato YYYY-MM-DD
+        data_vencimento: Data original no formato YYYY-MM-DD
+        dt_venc: A mesma data já convertida (ver _parse_venc)
         
     Returns:
         str: Data formatada para exibição
     """
     if not data_vencimento:
         return "Data não informada"
-    
-    try:
-        dt = datetime.strptime(data_vencimento, "%Y-%m-%d")
-        return dt.strftime("%d/%m/%Y")
-    except Exception:
+    if dt_venc is None:
         return data_vencimento
+    # Campos da data direto no f-string, sem passar pela máquina de formato do strftime
+    return f"{dt_venc.day:02d}/{dt_venc.month:02d}/{dt_venc.year:04d}"
 
 
-def _get_urgency_message(data_vencimento: str) -> str:
+def _get_urgency_message(data_vencimento: str, dt_venc: Optional[date], hoje: date) -> str:
     """
     Gera mensagem de urgência baseada na data de vencimento.
     
     Args:
-        data_vencimento: Data de vencimento no formato YYYY-MM-DD
+        data_vencimento: Data original no formato YYYY-MM-DD
+        dt_venc: A mesma data já convertida (ver _parse_venc)
+        hoje: Data de referência
         
     Returns:
         str: Mensagem de urgência apropriada
     """
     if not data_vencimento:
         return "Verifique o prazo desta obrigação."
+    if dt_venc is None:
+        return "Verifique o prazo desta obrigação no G-Click."
     
-    try:
-        dt_venc = datetime.strptime(data_vencimento, "%Y-%m-%d").date()
-        hoje = date.today()
-        
-        if dt_venc < hoje:
-            dias_atraso = (hoje - dt_venc).days
-            return f"⚠️ Esta obrigação está vencida há {dias_atraso} dia(s). Ação urgente necessária!"
-        elif dt_venc == hoje:
-            return "🕐 Esta obrigação vence HOJE. Ação imediata necessária!"
+    if dt_venc < hoje:
+        dias_atraso = (hoje - dt_venc).days
+        return f"⚠️ Esta obrigação está vencida há {dias_atraso} dia(s). Ação urgente necessária!"
+    elif dt_venc == hoje:
+        return "🕐 Esta obrigação vence HOJE. Ação imediata necessária!"
+    else:
+        delta = (dt_venc - hoje).days
+        if delta == 1:
+            return "📅 Esta obrigação vence AMANHÃ. Prepare-se!"
+        elif delta <= 3:
+            return f"📅 Esta obrigação vence em {delta} dias. Planeje sua execução."
         else:
-            delta = (dt_venc - hoje).days
-            if delta == 1:
-                return "📅 Esta obrigação vence AMANHÃ. Prepare-se!"
-            elif delta <= 3:
-                return f"📅 Esta obrigação vence em {delta} dias. Planeje sua execução."
-            else:
-                return f"📅 Esta obrigação vence em {delta} dias."
-                
-    except Exception:
-        return "Verifique o prazo desta obrigação no G-Click."
+            return f"📅 Esta obrigação vence em {delta} dias."
+
+
+@lru_cache(maxsize=512)
+def _apresentacao_vencimento(data_vencimento: str, hoje: date) -> Tuple[str, str, str, str]:
+    """
+    Parte do card que depende só do vencimento e da data de referência.
+    
+    Muitas obrigações compartilham o mesmo vencimento (ex.: todo dia 20), então
+    no mesmo dia o resultado é idêntico e é calculado uma única vez por par.
+    
+    Returns:
+        tuple: (cor, icone, mensagem de urgência, data formatada)
+    """
+    dt_venc = _parse_venc(data_vencimento)
+    cor, icone = _determine_urgency_style(dt_venc, hoje)
+    return (cor, icone,
+            _get_urgency_message(data_vencimento, dt_venc, hoje),
+            _format_date_for_display(data_vencimento, dt_venc))
+
+
+@lru_cache(maxsize=16)
+def _cabecalho_tarefa(icone: str) -> Dict[str, Any]:
+    """
+    Container de cabeçalho do card de tarefa, que só varia pelo ícone de urgência.
+    
+    Montado uma vez por ícone e compartilhado por referência entre os cards,
+    como os demais trechos fixos (não deve ser alterado pelos chamadores).
+    """
+    return {
+        "type": "Container",
+        "style": "emphasis",
+        "items": [
+            {
+                "type": "ColumnSet",
+                "columns": [
+                    {
+                        "type": "Column",
+                        "width": "auto",
+                        "items": [
+                            {
+                                "type": "TextBlock",
+                                "text": icone,
+                                "size": "Large"
+                            }
+                        ]
+                    },
+                    _COLUNA_TITULO_TAREFA
+                ]
+            }
+        ]
+    }
+
+
+def _vencimento_para_card(data_vencimento: Any, hoje: date) -> Tuple[str, str, str, str]:
+    """Consulta o cache de _apresentacao_vencimento quando a data é hashable."""
+    if data_vencimento is None or isinstance(data_vencimento, str):
+        return _apresentacao_vencimento(data_vencimento, hoje)
+    return _apresentacao_vencimento.__wrapped__(data_vencimento, hoje)
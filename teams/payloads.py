@@ -1,32 +1,45 @@
+from functools import lru_cache
 from typing import List, Dict, Any
 from config.loader import load_config
 
+@lru_cache(maxsize=1)
+def _cfg_notificacoes() -> Dict[str, Any]:
+    """Seção "notificacoes" da config, resolvida no primeiro uso e reaproveitada."""
+    return load_config()["notificacoes"]
+
 def construir_url_tarefa(tid: str) -> str:
-    cfg = load_config()
-    base = cfg["notificacoes"]["links"]["base_tarefa"]
-    return base.format(id=tid)
+    return _cfg_notificacoes()["links"]["base_tarefa"].format(id=tid)
 
 def formatar_tarefa_curta(t: Dict[str, Any]) -> str:
     return f"[{t.get('id')}] {t.get('nome')} (venc: {t.get('dataVencimento')})"
 
 def bloco_detalhado(tarefas: List[Dict[str, Any]]) -> str:
-    linhas = []
-    for t in tarefas:
-        linhas.append(f"- {formatar_tarefa_curta(t)} → {construir_url_tarefa(t.get('id'))}")
-    return "\n".join(linhas)
+    # Mesmo texto de formatar_tarefa_curta + construir_url_tarefa, com o template resolvido uma vez
+    base = _cfg_notificacoes()["links"]["base_tarefa"]
+    if base.count("{") != 1 or base.count("}") != 1 or "{id}" not in base:
+        return "\n".join([
+            f"- [{t.get('id')}] {t.get('nome')} (venc: {t.get('dataVencimento')}) → {base.format(id=t.get('id'))}"
+            for t in tarefas
+        ])
+    # Template com só o campo {id}: URL por concatenação, sem str.format por linha
+    antes, _, depois = base.partition("{id}")
+    return "\n".join([
+        f"- [{tid}] {t.get('nome')} (venc: {t.get('dataVencimento')}) → {antes}{tid}{depois}"
+        for t in tarefas
+        for tid in (t.get("id"),)
+    ])
 
 def bloco_agregado(tarefas: List[Dict[str, Any]], label: str) -> str:
-    cfg = load_config()
-    link_lista = cfg["notificacoes"]["links"]["lista_pendentes"]
+    link_lista = _cfg_notificacoes()["links"]["lista_pendentes"]
     return f"{label}: {len(tarefas)} pendências. Ver todas: {link_lista}"
 
 def payload_individual(responsavel_meta: Dict[str, Any], grupos: Dict[str, List[Dict[str, Any]]]) -> str:
     """
     Retorna texto simples (Markdown) simulando card.
     """
-    cfg = load_config()
-    limite = cfg["notificacoes"]["formato"]["limite_detalhe"]
-    sim = cfg["notificacoes"]["simulacao"]
+    cfg = _cfg_notificacoes()
+    limite = cfg["formato"]["limite_detalhe"]
+    sim = cfg["simulacao"]
     mencao_prefix = ""
     if sim.get("mencao_simulada"):
         mencao_prefix = f"[@{responsavel_meta.get('apelido')}] (SIMULAÇÃO)\n"
@@ -7,11 +7,25 @@ para um usuário específico.
 """
 
 import os
+import re
 import logging
 from typing import Optional, Dict
 
 logger = logging.getLogger(__name__)
 
+# Carrega .env defensivamente antes de ler TEAMS_ID_* / TEST_MODE abaixo: o
+# mapeamento e o modo de teste ficam em cache desde o import e não podem
+# depender de outro módulo ter chamado load_dotenv() primeiro
+try:
+    from dotenv import load_dotenv  # type: ignore
+    load_dotenv()
+except Exception:
+    pass
+
+# IDs do Teams geralmente têm formato: UUID (8-4-4-4-12 hexadecimais) ou 29:UUID / 28:UUID
+_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+_TEAMS_RE = re.compile(r'^2[89]:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
 # Mapeamento de apelidos G-Click para IDs do Teams
 _GCLICK_TO_TEAMS = {
     "neusag.glip": os.getenv("TEAMS_ID_NEUSAG"),
@@ -29,6 +43,64 @@ _GCLICK_TO_TEAMS = {
     "mauricio.bernejo": "4a5a678b-f3c1-4a7d-af41-1b97686a0b6b"
 }
 
+# Apelidos são normalizados para minúsculas com "." trocado por "_", a mesma
+# forma do sufixo das variáveis TEAMS_ID_USUARIO_EMPRESA
+_NORM_TABLE = str.maketrans(".", "_")
+_ENV_PREFIXO = "TEAMS_ID_"
+
+
+def _montar_lookup() -> Dict[str, str]:
+    """
+    Índice apelido normalizado -> Teams ID, montado uma única vez no import.
+
+    Junta as variáveis TEAMS_ID_* (formato dinâmico, ex: TEAMS_ID_MAURICIO_BERNEJ)
+    lidas numa única varredura do ambiente com o mapeamento fixo, que tem
+    precedência quando definido.
+    """
+    lookup = {
+        k[len(_ENV_PREFIXO):].lower(): v
+        for k, v in os.environ.items()
+        if k.startswith(_ENV_PREFIXO) and v
+    }
+    for apelido, teams_id in _GCLICK_TO_TEAMS.items():
+        if teams_id:
+            lookup[apelido.lower().translate(_NORM_TABLE)] = teams_id
+    # Formato validado uma vez aqui (mesmos padrões de validate_teams_id), não a cada consulta
+    for apelido, teams_id in lookup.items():
+        if not (_UUID_RE.match(teams_id) or _TEAMS_RE.match(teams_id)):
+            logger.debug("Teams ID de '%s' fora do formato UUID/29:UUID: %s...", apelido, teams_id[:10])
+    return lookup
+
+
+_LOOKUP = _montar_lookup()
+
+# Configuração do modo de teste, lida uma vez no import (com o .env já carregado
+# acima). BotSender.send_message relê TEST_MODE do ambiente a cada envio: quem
+# alterar essas variáveis em tempo de execução deve chamar reload_test_mode()
+# para que os dois continuem de acordo
+_TEST_USER_ID_PADRAO = "4a5a678b-f3c1-4a7d-af41-1b97686a0b6b"
+_TEST_MODE = False
+_TEST_USER_ID: Optional[str] = None
+_TEST_USER_NAME = "Usuário de Teste"
+
+
+def reload_test_mode() -> None:
+    """
+    Relê TEST_MODE, TEST_USER_TEAMS_ID e TEST_USER_NAME do ambiente.
+    
+    Os valores ficam em cache desde o import; todo ponto de entrada que
+    altere essas variáveis em tempo de execução (ex.: setup de testes em
+    tests/smoke_test_integration.py) deve chamar esta função logo em seguida,
+    senão o engine e o BotSender (que lê o ambiente a cada envio) divergem.
+    """
+    global _TEST_MODE, _TEST_USER_ID, _TEST_USER_NAME
+    _TEST_MODE = os.environ.get("TEST_MODE", "false").lower() in ("true", "1", "yes")
+    _TEST_USER_ID = os.environ.get("TEST_USER_TEAMS_ID")
+    _TEST_USER_NAME = os.environ.get("TEST_USER_NAME", "Usuário de Teste")
+
+
+reload_test_mode()
+
 def mapear_apelido_para_teams_id(apelido: str) -> Optional[str]:
     """
     Mapeia um apelido do G-Click para um ID do Teams.
@@ -56,35 +128,22 @@ def mapear_apelido_para_teams_id(apelido: str) -> Optional[str]:
         logger.warning("Apelido vazio fornecido para mapeamento")
         return None
         
-    # Verificar se estamos em modo de teste/restrição
-    test_mode = os.environ.get("TEST_MODE", "false").lower() in ("true", "1", "yes")
-    test_user_id = os.environ.get("TEST_USER_TEAMS_ID", "")
-    test_user_name = os.environ.get("TEST_USER_NAME", "Usuário de Teste")
-    
     # Se estiver em modo de teste, redirecionar TODAS as notificações para o usuário de teste
-    if test_mode:
-        if test_user_id:
-            logger.info(f"🧪 [TEST_MODE] Redirecionando '{apelido}' para {test_user_name} ({test_user_id})")
-            return test_user_id
+    if _TEST_MODE:
+        if _TEST_USER_ID:
+            logger.info("🧪 [TEST_MODE] Redirecionando '%s' para %s (%s)", apelido, _TEST_USER_NAME, _TEST_USER_ID)
+            return _TEST_USER_ID
         else:
             logger.error(f"❌ [TEST_MODE] Ativo mas TEST_USER_TEAMS_ID não configurado!")
             return None
     
-    # Verificar primeiro no mapeamento fixo
-    result = _GCLICK_TO_TEAMS.get(apelido.lower())
+    # Mapeamento fixo + variáveis TEAMS_ID_* já indexados no import (ver _montar_lookup)
+    result = _LOOKUP.get(apelido.lower().translate(_NORM_TABLE))
     
-    # Se não encontrou, tentar variáveis de ambiente dinâmicas
-    # Formato: TEAMS_ID_USUARIO_EMPRESA (ex: TEAMS_ID_MAURICIO_BERNEJ)
     if not result:
-        env_var = f"TEAMS_ID_{apelido.upper().replace('.', '_')}"
-        result = os.getenv(env_var)
-        if result:
-            logger.debug(f"ID do Teams encontrado via variável de ambiente {env_var}")
-    
-    if not result:
-        logger.warning(f"Usuário '{apelido}' não mapeado para Teams ID")
+        logger.warning("Usuário '%s' não mapeado para Teams ID", apelido)
     else:
-        logger.debug(f"Usuário '{apelido}' mapeado para Teams ID: {result[:10]}...")
+        logger.debug("Usuário '%s' mapeado para Teams ID: %s...", apelido, result[:10])
     
     return result
 
@@ -106,7 +165,7 @@ def is_test_mode() -> bool:
     Returns:
         bool: True se TEST_MODE está ativo, False caso contrário
     """
-    return os.environ.get("TEST_MODE", "false").lower() in ("true", "1", "yes")
+    return _TEST_MODE
 
 def get_test_user_id() -> str:
     """
@@ -115,7 +174,7 @@ def get_test_user_id() -> str:
     Returns:
         str: ID do Teams para o usuário de teste
     """
-    return os.environ.get("TEST_USER_TEAMS_ID", "4a5a678b-f3c1-4a7d-af41-1b97686a0b6b")
+    return _TEST_USER_ID if _TEST_USER_ID is not None else _TEST_USER_ID_PADRAO
 
 def validate_teams_id(teams_id: str) -> bool:
     """
@@ -129,18 +188,7 @@ def validate_teams_id(teams_id: str) -> bool:
     """
     if not teams_id:
         return False
-        
-    # IDs do Teams geralmente têm formato: UUID ou 29:UUID
-    import re
-    
-    # Padrão UUID: 8-4-4-4-12 caracteres hexadecimais
-    uuid_pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
-    
-    # Padrão Teams: 29:UUID ou 28:UUID  
-    teams_pattern = r'^2[89]:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
-    
-    return bool(re.match(uuid_pattern, teams_id, re.IGNORECASE) or 
-                re.match(teams_pattern, teams_id, re.IGNORECASE))
+    return bool(_UUID_RE.match(teams_id) or _TEAMS_RE.match(teams_id))
 
 def log_mapping_status():
     """
@@ -1,24 +1,113 @@
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 WEBHOOK_URL_ENV = "TEAMS_WEBHOOK_URL"
 
-def enviar_teams_mensagem(texto: str, max_retries: int = 3, backoff: float = 1.5):
+# Corpo do POST serializado uma vez por mensagem: orjson quando disponível
+# (C, bytes direto), senão stdlib sem espaços
+try:
+    import orjson  # type: ignore
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:  # pragma: no cover - fallback sem orjson
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+_JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+
+# Sessão keep-alive reaproveitada entre envios: o handshake TLS com o webhook
+# acontece uma vez, não a cada mensagem
+WEBHOOK_POOL_SIZE = int(os.getenv("TEAMS_WEBHOOK_POOL_SIZE", "8"))
+_session: Optional[requests.Session] = None
+
+# Envios simultâneos em enviar_teams_mensagens. Padrão sequencial: há um único
+# TEAMS_WEBHOOK_URL e o Teams limita a taxa por conector
+WEBHOOK_CONCORRENCIA = int(os.getenv("TEAMS_WEBHOOK_CONCURRENCY", "1"))
+
+# Tentativas por mensagem (incluindo a primeira) e fator de backoff entre elas
+WEBHOOK_MAX_TENTATIVAS = int(os.getenv("TEAMS_WEBHOOK_MAX_RETRIES", "3"))
+WEBHOOK_BACKOFF = float(os.getenv("TEAMS_WEBHOOK_BACKOFF", "1.5"))
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        # Retentativas feitas pelo urllib3 no próprio adapter: falhas de conexão,
+        # 429 (respeitando Retry-After) e 5xx; erros 4xx não são repetidos
+        retry = Retry(
+            total=max(0, WEBHOOK_MAX_TENTATIVAS - 1),
+            backoff_factor=WEBHOOK_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        )
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=WEBHOOK_POOL_SIZE, max_retries=retry))
+        _session = session
+    return _session
+
+def is_teams_webhook_configured() -> bool:
+    """Retorna True se a variável de ambiente TEAMS_WEBHOOK_URL estiver configurada."""
+    return bool(os.environ.get(WEBHOOK_URL_ENV))
+
+
+def enviar_teams_mensagem(texto: str, *, raise_on_missing: bool = False):
+    """Envia uma mensagem simples via Incoming Webhook do Teams.
+
+    Se a variável de ambiente `TEAMS_WEBHOOK_URL` não estiver configurada, a função
+    retorna sem exceções (apenas loga) para evitar spam de erros quando o Bot
+    Framework for a fonte de envio preferencial (especialmente em TEST_MODE).
+    Com `raise_on_missing=True` levanta RuntimeError nesse caso.
+
+    As retentativas (WEBHOOK_MAX_TENTATIVAS, WEBHOOK_BACKOFF) ficam a cargo da
+    sessão; um status de erro que persista levanta RuntimeError.
+    """
     url = os.environ.get(WEBHOOK_URL_ENV)
     if not url:
+        if raise_on_missing:
+            raise RuntimeError(f"{WEBHOOK_URL_ENV} não configurado")
+        # Não lançar exceção para não poluir logs; os chamadores devem preferir o Bot
+        # Framework quando disponível. Apenas retornamos None como sinal que nada foi enviado.
         print("[WEBHOOK] TEAMS_WEBHOOK_URL não configurado — salto do envio via webhook.")
         return None
-    payload = {"text": texto}
-    tentativa = 0
-    while True:
-        tentativa += 1
+
+    corpo = _json_dumps({"text": texto})
+    resp = _get_session().post(url, data=corpo, headers=_JSON_HEADERS, timeout=15)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"HTTP {resp.status_code} -> {resp.text[:300]}")
+    return resp.text
+
+
+def enviar_teams_mensagens(textos: List[str], max_workers: Optional[int] = None,
+                           intervalo_ms: int = 0) -> List[Optional[Exception]]:
+    """Envia várias mensagens pelo webhook sobre a mesma sessão keep-alive.
+
+    Sequencial por padrão (TEAMS_WEBHOOK_CONCURRENCY); `intervalo_ms` espaça os
+    envios sequenciais. Retorna uma lista alinhada a `textos`: None para cada envio concluído ou a
+    exceção que o fez falhar (após as retentativas da sessão).
+    """
+    def _enviar(texto: str) -> Optional[Exception]:
         try:
-            resp = requests.post(url, json=payload, timeout=15)
-            if resp.status_code >= 400:
-                raise RuntimeError(f"HTTP {resp.status_code} -> {resp.text[:300]}")
-            return resp.text
+            enviar_teams_mensagem(texto)
+            return None
         except Exception as e:
-            if tentativa >= max_retries:
-                raise
-            time.sleep(backoff * tentativa)
+            return e
+
+    workers = max(1, min(max_workers or WEBHOOK_CONCORRENCIA, len(textos)))
+    if workers == 1:
+        resultados: List[Optional[Exception]] = []
+        for i, texto in enumerate(textos):
+            if i and intervalo_ms > 0:
+                time.sleep(intervalo_ms / 1000.0)
+            resultados.append(_enviar(texto))
+        return resultados
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_enviar, textos))
@@ -23,6 +23,11 @@ def setup_test_environment():
     os.environ["TEST_MODE"] = "true"
     os.environ["SIMULACAO"] = "true"
     os.environ["LOG_LEVEL"] = "WARNING"  # Reduzir logs para o teste
+
+    # user_mapping guarda TEST_MODE/TEST_USER_TEAMS_ID em cache desde o import:
+    # reler para não divergir do BotSender, que consulta o ambiente a cada envio
+    from teams.user_mapping import reload_test_mode
+    reload_test_mode()
     
     # Configurar logging mínimo para o teste
     logging.basicConfig(
@@ -0,0 +1,456 @@
+"""
+Testes focados nas peças de resiliência e persistência:
+
+1. Circuit breaker (transições e limite de chamadas em HALF_OPEN)
+2. breaker_get (falha rápida com circuito aberto)
+3. Rate limiter (token bucket)
+4. Dedup de envios do BotSender (desligado por padrão; None quando suprimido)
+5. Gravação atômica e lock do storage de idempotência
+6. Cache da assinatura do arquivo de chaves enviadas
+7. Sidecar JSON da config YAML (invalidação) e cópia da config em cache
+8. ConversationReferenceStorage (gravação agrupada e backend Table)
+
+Para executar:
+    python -m pytest -q tests/test_resilience_persistence.py
+"""
+
+import os
+import sys
+import json
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+# Ajusta caminho para importar módulos do projeto
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("GCLICK_API_BASE", "http://localhost")
+
+from gclick import circuit_breaker as cb_mod
+from gclick.circuit_breaker import CircuitBreaker, CircuitBreakerConfig, CircuitState
+
+
+class _Relogio:
+    """Substitui o módulo time no circuit breaker: o teste controla o tempo."""
+
+    def __init__(self, agora: float = 1000.0):
+        self.agora = agora
+
+    def time(self) -> float:
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = _Relogio()
+    monkeypatch.setattr(cb_mod, "time", r)
+    return r
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    config = dict(failure_threshold=2, recovery_timeout_seconds=30, half_open_max_calls=2, success_threshold=2)
+    config.update(kwargs)
+    return CircuitBreaker("teste", CircuitBreakerConfig(**config))
+
+
+# ================= Circuit breaker ================
+
+def test_breaker_abre_apos_limite_de_falhas(relogio):
+    cb = _breaker()
+    cb.on_failure()
+    assert cb.state == CircuitState.CLOSED and cb.can_execute()
+    cb.on_failure()
+    assert cb.state == CircuitState.OPEN
+    assert not cb.can_execute()
+
+
+def test_breaker_half_open_limita_chamadas_de_teste(relogio):
+    cb = _breaker()
+    cb.on_failure()
+    cb.on_failure()
+    relogio.agora += 31
+
+    assert cb.can_execute()
+    assert cb.state == CircuitState.HALF_OPEN
+    assert cb.can_execute()
+    # half_open_max_calls=2: a terceira chamada concorrente é barrada
+    assert not cb.can_execute()
+    assert cb.get_stats()["can_execute"] is False
+
+    # Sem resposta das chamadas de teste dentro do cooldown, nova janela é aberta
+    relogio.agora += 31
+    assert cb.can_execute()
+
+
+def test_breaker_half_open_cap_entre_threads(relogio):
+    cb = _breaker(half_open_max_calls=3)
+    cb.on_failure()
+    cb.on_failure()
+    relogio.agora += 31
+
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        liberadas = sum(ex.map(lambda _: cb.can_execute(), range(64)))
+    assert liberadas == 3
+
+
+def test_breaker_fecha_apos_sucessos_em_half_open(relogio):
+    cb = _breaker()
+    cb.on_failure()
+    cb.on_failure()
+    relogio.agora += 31
+    assert cb.can_execute()
+    cb.on_success()
+    assert cb.state == CircuitState.HALF_OPEN
+    cb.on_success()
+    assert cb.state == CircuitState.CLOSED
+    assert cb.failure_count == 0
+
+
+def test_breaker_falha_em_half_open_reabre(relogio):
+    cb = _breaker()
+    cb.on_failure()
+    cb.on_failure()
+    relogio.agora += 31
+    assert cb.can_execute()
+    cb.on_failure()
+    assert cb.state == CircuitState.OPEN
+    assert not cb.can_execute()
+
+
+def test_get_stats_nao_consume_chamadas_de_teste(relogio):
+    cb = _breaker(half_open_max_calls=1)
+    cb.on_failure()
+    cb.on_failure()
+    relogio.agora += 31
+    for _ in range(5):
+        assert cb.get_stats()["can_execute"] is True
+    assert cb.can_execute()
+    assert not cb.can_execute()
+
+
+def test_resilience_reexporta_breaker():
+    from engine import resilience
+
+    assert resilience.CircuitBreaker is CircuitBreaker
+    assert resilience.CircuitState is CircuitState
+
+
+# ================= breaker_get ================
+
+class _SessaoFalha:
+    def __init__(self, exc=None, status=200):
+        self.exc = exc
+        self.status = status
+        self.chamadas = 0
+
+    def get(self, url, **kwargs):
+        self.chamadas += 1
+        if self.exc is not None:
+            raise self.exc
+        return SimpleNamespace(status_code=self.status)
+
+
+def test_breaker_get_falha_rapido_com_circuito_aberto(relogio):
+    requests = pytest.importorskip("requests")
+    from gclick.http import GClickHTTPError, breaker_get
+
+    cb = _breaker()
+    sessao = _SessaoFalha(exc=requests.ConnectionError("fora do ar"))
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            breaker_get("http://api/x", session=sessao, breaker=cb)
+    assert cb.state == CircuitState.OPEN
+
+    with pytest.raises(GClickHTTPError):
+        breaker_get("http://api/x", session=sessao, breaker=cb)
+    assert sessao.chamadas == 2
+
+
+def test_breaker_get_conta_503_mas_nao_500(relogio):
+    pytest.importorskip("requests")
+    from gclick.http import breaker_get
+
+    cb = _breaker()
+    for _ in range(3):
+        breaker_get("http://api/x", session=_SessaoFalha(status=500), breaker=cb)
+    assert cb.state == CircuitState.CLOSED
+
+    for _ in range(2):
+        breaker_get("http://api/x", session=_SessaoFalha(status=503), breaker=cb)
+    assert cb.state == CircuitState.OPEN
+
+
+# ================= Rate limiter (token bucket) ================
+
+def test_rate_limiter_burst_e_reabastecimento(monkeypatch):
+    from engine import resilience
+    from engine.resilience import RateLimitConfig, RateLimiter
+
+    relogio = _Relogio()
+    monkeypatch.setattr(resilience, "time", relogio)
+    limiter = RateLimiter(RateLimitConfig(requests_per_second=2.0, burst_capacity=3))
+
+    assert [limiter.can_proceed() for _ in range(4)] == [True, True, True, False]
+    relogio.agora += 0.5  # 2 req/s -> 1 token
+    assert limiter.can_proceed()
+    assert not limiter.can_proceed()
+    relogio.agora += 60  # reabastece só até burst_capacity
+    assert sum(limiter.can_proceed() for _ in range(10)) == 3
+
+
+# ================= Dedup de envios do BotSender ================
+
+class _StorageFake:
+    def get_cref(self, user_id):
+        return SimpleNamespace(service_url="https://smba.trafficmanager.net/br/")
+
+
+def test_dedup_desligado_por_padrao():
+    from teams import bot_sender
+
+    if "BOT_SEND_DEDUP_SECONDS" in os.environ:
+        pytest.skip("BOT_SEND_DEDUP_SECONDS definido no ambiente")
+    assert bot_sender.SEND_DEDUP_SECONDS == 0
+    assert bot_sender.BotSender._dedup_key("u1", "msg", {"type": "AdaptiveCard"}) is None
+
+
+def test_dedup_suprime_reenvio_e_retorna_none(monkeypatch):
+    from teams import bot_sender
+
+    monkeypatch.setattr(bot_sender, "SEND_DEDUP_SECONDS", 60.0)
+    sender = bot_sender.BotSender(adapter=None, app_id="app", conversation_storage=_StorageFake())
+    card = {"type": "AdaptiveCard", "version": "1.3", "body": []}
+
+    chave = sender._dedup_key("u1", "msg", card)
+    assert chave is not None
+    # Só texto não passa pelo filtro
+    assert sender._dedup_key("u1", "msg", None) is None
+
+    sender._registrar_envio(chave)
+    resultado = asyncio.run(sender.send_message("u1", "msg", card_json=card))
+    assert resultado is None
+    assert resultado is not False
+
+
+def test_dedup_expira(monkeypatch):
+    from teams import bot_sender
+
+    monkeypatch.setattr(bot_sender, "SEND_DEDUP_SECONDS", 0.01)
+    sender = bot_sender.BotSender(adapter=None, app_id="app", conversation_storage=_StorageFake())
+    chave = sender._dedup_key("u1", "msg", {"type": "AdaptiveCard"})
+    sender._registrar_envio(chave)
+    assert sender._envio_recente(chave)
+    time.sleep(0.02)
+    assert not sender._envio_recente(chave)
+
+
+# ================= Storage de idempotência ================
+
+def test_atomic_write_sem_temporarios_concorrentes(tmp_path):
+    from storage.state import _atomic_write_bytes
+
+    destino = tmp_path / "estado.json"
+    payloads = [json.dumps({"n": i}).encode("utf-8") for i in range(64)]
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        list(ex.map(lambda p: _atomic_write_bytes(destino, p), payloads))
+
+    assert destino.read_bytes() in payloads
+    assert [p.name for p in tmp_path.iterdir()] == ["estado.json"]
+
+
+def test_notification_state_storage_marcacoes_concorrentes(tmp_path):
+    from storage.state import NotificationStateStorage
+
+    arquivo = tmp_path / "state_v2.json"
+    st = NotificationStateStorage(str(arquivo))
+    dia = time.strftime("%Y-%m-%d")
+    chaves = [f"{dia}|apelido|{i}" for i in range(200)]
+
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        list(ex.map(st.mark_sent_today, chaves[:100]))
+    st.mark_sent_today_batch(chaves[100:])
+
+    gravado = json.loads(arquivo.read_bytes())
+    assert sorted(gravado["sent_today"][dia]) == sorted(chaves)
+    assert all(st.get_sent_today(c) for c in chaves)
+    # Nova instância lê o mesmo estado do disco
+    assert NotificationStateStorage(str(arquivo)).get_sent_today(chaves[-1])
+
+
+def test_cache_de_chaves_invalida_com_mesmo_mtime(tmp_path, monkeypatch):
+    from storage import state
+
+    monkeypatch.setattr(state, "_STATE_FILE", tmp_path / "notification_state.json")
+    monkeypatch.setattr(state, "_CACHE", None)
+    monkeypatch.setattr(state, "_CACHE_ASSINATURA", None)
+
+    state.register_sent("2026-10-16|a|1")
+    assert state.already_sent("2026-10-16|a|1")
+    assert not state.already_sent("2026-10-16|a|2")
+
+    # Outra gravação com o mesmo mtime (sistema de arquivos de baixa resolução)
+    st = os.stat(state._STATE_FILE)
+    state._STATE_FILE.write_bytes(json.dumps({"entries": ["2026-10-16|a|1", "2026-10-16|a|2"]}).encode())
+    os.utime(state._STATE_FILE, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert state.already_sent("2026-10-16|a|2")
+
+
+# ================= Config YAML (sidecar JSON e cópias) ================
+
+@pytest.fixture
+def engine_mod():
+    pytest.importorskip("yaml")
+    from engine import notification_engine
+
+    notification_engine._ler_yaml_config_cache.cache_clear()
+    yield notification_engine
+    notification_engine._ler_yaml_config_cache.cache_clear()
+
+
+def test_sidecar_json_gravado_e_reaproveitado(tmp_path, engine_mod):
+    yaml_path = tmp_path / "notifications.yaml"
+    yaml_path.write_text("page_size: 10\n", encoding="utf-8")
+
+    assert engine_mod.load_notifications_config(str(yaml_path))["page_size"] == 10
+    sidecar = json.loads((tmp_path / "notifications.yaml.json").read_text(encoding="utf-8"))
+    st = os.stat(yaml_path)
+    assert sidecar == {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "config": {"page_size": 10}}
+    assert engine_mod._ler_sidecar_json(str(tmp_path / "notifications.yaml.json"), st.st_mtime_ns, st.st_size) == {"page_size": 10}
+
+
+def test_sidecar_json_invalidado_quando_yaml_muda(tmp_path, engine_mod):
+    yaml_path = tmp_path / "notifications.yaml"
+    yaml_path.write_text("page_size: 10\n", encoding="utf-8")
+    engine_mod.load_notifications_config(str(yaml_path))
+
+    # Mesmo mtime, tamanho diferente (ex.: restaurado com cp -p): sidecar não vale
+    st = os.stat(yaml_path)
+    yaml_path.write_text("page_size: 250\n", encoding="utf-8")
+    os.utime(yaml_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert engine_mod.load_notifications_config(str(yaml_path))["page_size"] == 250
+
+    # mtime mais antigo que o do sidecar com o mesmo tamanho: também não vale
+    yaml_path.write_text("page_size: 999\n", encoding="utf-8")
+    os.utime(yaml_path, ns=(st.st_atime_ns, st.st_mtime_ns - 10_000_000_000))
+    assert engine_mod.load_notifications_config(str(yaml_path))["page_size"] == 999
+
+
+def test_config_em_cache_nao_e_compartilhada(tmp_path, engine_mod):
+    yaml_path = tmp_path / "notifications.yaml"
+    yaml_path.write_text("lista: [1, 2]\n", encoding="utf-8")
+
+    primeira = engine_mod.load_notifications_config(str(yaml_path))
+    primeira["lista"].append(3)
+    assert engine_mod.load_notifications_config(str(yaml_path))["lista"] == [1, 2]
+
+
+# ================= Referências de conversa ================
+
+def test_referencias_gravacao_agrupada_e_flush(tmp_path, monkeypatch):
+    from teams import bot_sender
+
+    monkeypatch.setattr(bot_sender, "SAVE_DEBOUNCE_SECONDS", 0.05)
+    arquivo = tmp_path / "conversation_references.json"
+    storage = bot_sender.ConversationReferenceStorage(str(arquivo))
+
+    storage.add("u1", {"user": {"id": "u1"}})
+    storage.add("u2", {"user": {"id": "u2"}})
+    # Várias alterações agendam uma única gravação
+    assert storage._save_timer is not None
+
+    prazo = time.monotonic() + 5
+    while not arquivo.exists() and time.monotonic() < prazo:
+        time.sleep(0.01)
+    assert set(json.loads(arquivo.read_bytes())) == {"u1", "u2"}
+
+    storage.add("u3", {"user": {"id": "u3"}})
+    storage.flush()  # força a gravação sem esperar o timer
+    assert set(json.loads(arquivo.read_bytes())) == {"u1", "u2", "u3"}
+    assert storage._dirty == 0
+
+
+class _BackendTableFake:
+    """Imita AzureTableReferenceStore em memória."""
+
+    def __init__(self, dados=None, falhas_load=0):
+        self.dados = dict(dados or {})
+        self.falhas_load = falhas_load
+        self.gets = 0
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        if self.falhas_load:
+            self.falhas_load -= 1
+            raise RuntimeError("Table Storage indisponível")
+        return dict(self.dados)
+
+    def get(self, user_id):
+        with self._lock:
+            self.gets += 1
+        return self.dados.get(user_id)
+
+    def upsert(self, user_id, data):
+        self.dados[user_id] = data
+
+    def delete(self, user_id):
+        self.dados.pop(user_id, None)
+
+
+@pytest.fixture
+def shared_bot_sender(monkeypatch):
+    from azure_functions.shared_code.teams import bot_sender
+
+    monkeypatch.setattr(bot_sender.time, "sleep", lambda _s: None)
+    return bot_sender
+
+
+def _storage_table(bot_sender, monkeypatch, tmp_path, backend):
+    monkeypatch.setattr(bot_sender, "_criar_backend_referencias", lambda: backend)
+    return bot_sender.ConversationReferenceStorage(str(tmp_path / "refs.json"))
+
+
+def test_table_backend_cache_negativo(shared_bot_sender, monkeypatch, tmp_path):
+    backend = _BackendTableFake()
+    storage = _storage_table(shared_bot_sender, monkeypatch, tmp_path, backend)
+
+    for _ in range(5):
+        assert storage.get_conversation_reference("ausente") is None
+    assert backend.gets == 1
+
+    # Expirado o TTL, o backend é consultado de novo (referência criada por outra instância)
+    monkeypatch.setattr(shared_bot_sender, "CONVREF_MISS_TTL_SECONDS", 0)
+    storage._misses.clear()
+    backend.dados["ausente"] = {"user": {"id": "ausente"}}
+    assert storage.get_conversation_reference("ausente") == {"user": {"id": "ausente"}}
+
+
+def test_table_backend_upsert_apenas_dos_alterados(shared_bot_sender, monkeypatch, tmp_path):
+    backend = _BackendTableFake(dados={"u1": {"user": {"id": "u1"}}})
+    storage = _storage_table(shared_bot_sender, monkeypatch, tmp_path, backend)
+
+    storage.add("u2", {"user": {"id": "u2"}})
+    storage.remove("u1")
+    storage.flush()
+    assert set(backend.dados) == {"u2"}
+    assert not (tmp_path / "refs.json").exists()
+
+
+def test_table_backend_falha_no_load_nao_vira_storage_vazio(shared_bot_sender, monkeypatch, tmp_path):
+    monkeypatch.setattr(shared_bot_sender, "CONVREF_LOAD_ATTEMPTS", 2)
+    backend = _BackendTableFake(dados={"u1": {"user": {"id": "u1"}}}, falhas_load=2)
+    storage = _storage_table(shared_bot_sender, monkeypatch, tmp_path, backend)
+
+    with pytest.raises(RuntimeError):
+        storage.references
+    # Próximo acesso tenta de novo (nada ficou em cache)
+    assert "u1" in storage.references
+
+
+def test_table_backend_retenta_load(shared_bot_sender, monkeypatch, tmp_path):
+    monkeypatch.setattr(shared_bot_sender, "CONVREF_LOAD_ATTEMPTS", 3)
+    backend = _BackendTableFake(dados={"u1": {"user": {"id": "u1"}}}, falhas_load=2)
+    storage = _storage_table(shared_bot_sender, monkeypatch, tmp_path, backend)
+    assert "u1" in storage.references